@@ -1,34 +1,215 @@
 import os
+import time
 import hashlib
-from typing import Optional
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+from .logger import Logger
 from .settings import Settings
+from .egress import Egress, EgressPool
+from .profiler import RunProfiler
+from .browser_lifecycle import BrowserLifecycle
+from .browser_server import connect_or_launch
+from .timing_history import ChannelTimeouts, TimingHistory
+from .streaming_parser import DEFAULT_CHUNK_SIZE, iter_file_chunks
+
+# Number of video links on the page, polled while waiting for lazily loaded items
+_COUNT_ITEMS_JS = 'document.querySelectorAll(\'a[href^="/video-"]\').length'
+
+# Harvesting: a MutationObserver records every video link (href -> first non-timestamp title) as cards
+# are rendered and removes each harvested card, so the DOM stays small however long the feed gets.
+# A card is the child of the list container on the way up from a link. The container is the nearest ancestor
+# that held a link to another video when first seen, and is remembered: the last card of a batch is alone in it,
+# and climbing further would remove the feed itself (on VK, the app root). Without a known container, or if it
+# would be <body>, the card is left in place.
+_HARVEST_INSTALL_JS = """
+() => {
+    if (window.__vkHarvest) return window.__vkHarvest.links.size;
+    const selector = 'a[href^="/video-"]';
+    const isTimestamp = (text) => /^\\d+(:\\d+)+$/.test(text);
+    const harvest = { links: new Map(), removed: 0 };
+    const containers = new WeakSet();
+    const cardOf = (anchor) => {
+        const href = anchor.getAttribute('href');
+        let card = anchor;
+        while (card.parentElement && card.parentElement !== document.body) {
+            const parent = card.parentElement;
+            if (containers.has(parent)) return card;
+            for (const other of parent.querySelectorAll(selector)) {
+                if (other.getAttribute('href') !== href) {
+                    containers.add(parent);
+                    return card;
+                }
+            }
+            card = parent;
+        }
+        return null;
+    };
+    const collect = (root) => {
+        const anchors = root.matches && root.matches(selector) ? [root] : Array.from(root.querySelectorAll(selector));
+        for (const anchor of anchors) {
+            const href = anchor.getAttribute('href');
+            const title = anchor.textContent.trim();
+            const known = harvest.links.get(href);
+            if (known === undefined || (!known && title && !isTimestamp(title))) {
+                harvest.links.set(href, isTimestamp(title) ? '' : title);
+            }
+        }
+        for (const anchor of anchors) {
+            if (!anchor.isConnected) continue;
+            const card = cardOf(anchor);
+            if (card !== null && card.isConnected) {
+                card.remove();
+                harvest.removed += 1;
+            }
+        }
+    };
+    window.__vkHarvest = harvest;
+    collect(document.body);
+    new MutationObserver((mutations) => {
+        for (const mutation of mutations) {
+            for (const node of mutation.addedNodes) {
+                if (node.nodeType === Node.ELEMENT_NODE && node.isConnected) collect(node);
+            }
+        }
+    }).observe(document.body, { childList: true, subtree: true });
+    return harvest.links.size;
+}
+"""
+# Scroll to the bottom to trigger loading of the next cards; returns the number of links harvested so far
+_HARVEST_SCROLL_JS = '() => { window.scrollTo(0, document.body.scrollHeight); return window.__vkHarvest.links.size; }'
+_HARVEST_RESULT_JS = '() => Array.from(window.__vkHarvest.links.entries())'
+
+T = TypeVar('T')
 
 class Browser:
     """
     A wrapper class for Playwright browser interactions with record/replay functionality.
+
+    One browser is kept alive across pages and recycled by a BrowserLifecycle; call close() when done.
+    If a browser server is running, pages are loaded in contexts of its Chromium instead. With an
+    egress pool, each page load takes a route from the pool and runs in a browser launched
+    through that route.
     """
+
+    # Interval at which the number of loaded items is polled after scrolling
+    settle_poll_ms = 500
     
-    def __init__(self, settings: Settings, record_replay: bool = False):
+    def __init__(
+        self,
+        settings: Settings,
+        record_replay: bool = False,
+        profiler: Optional[RunProfiler] = None,
+        timing_history: Optional[TimingHistory] = None,
+        egress_pool: Optional[EgressPool] = None,
+        logger: Optional[Logger] = None
+    ):
         """
         Initialize Browser with configuration from Settings.
         
         Args:
             settings (Settings): Application settings for browser configuration.
             record_replay (bool): If True, cache page HTML and use cached versions when available.
+            profiler (Optional[RunProfiler], optional): Run profiler timing page operations. Defaults to an inactive one.
+            timing_history (Optional[TimingHistory], optional): Per-channel durations used to derive timeouts.
+                Defaults to the history file from settings.
+            egress_pool (Optional[EgressPool], optional): Routes page loads are spread over. Defaults to the
+                routes from settings.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
         """
         self.headless = settings.headless
         self.timeout = settings.timeout_browser_sec * 1000  # Convert seconds to milliseconds
         self.scroll_timeout = settings.timeout_browser_scroll_sec * 1000  # Convert seconds to milliseconds
         self.record_replay = record_replay
         self.cache_dir = settings.cache_dir
+        self.settings = settings
+        self.logger = logger or Logger()
+        self.profiler = profiler or RunProfiler(settings)
+        self.timing_history = timing_history or TimingHistory(settings)
+        self.egress_pool = egress_pool or EgressPool(settings)
+        self._lifecycle: Optional[BrowserLifecycle] = None
+        self._egress_lifecycles: Dict[str, BrowserLifecycle] = {}
         
     
+    @property
+    def lifecycle(self) -> BrowserLifecycle:
+        """Lifecycle of the browser used for live pages, created on first use."""
+        if self._lifecycle is None:
+            self._lifecycle = BrowserLifecycle(
+                lambda playwright: connect_or_launch(
+                    playwright,
+                    self.settings,
+                    self._lifecycle.logger,
+                    lambda playwright: playwright.chromium.launch(headless=self.headless)
+                ),
+                self.settings,
+                name='browser',
+                profiler=self.profiler
+            )
+        return self._lifecycle
+
+    def _egress_lifecycle(self, egress: Egress) -> BrowserLifecycle:
+        """Lifecycle of the browser launched through an egress route, created on first use."""
+        lifecycle = self._egress_lifecycles.get(egress.url)
+        if lifecycle is None:
+            proxy = egress.playwright_proxy()
+            # The browser server's Chromium has no proxy, so each route gets a browser of its own
+            lifecycle = BrowserLifecycle(
+                lambda playwright: playwright.chromium.launch(headless=self.headless, proxy=proxy),
+                self.settings,
+                name=f'browser-{self.egress_pool.routes.index(egress)}',
+                profiler=self.profiler
+            )
+            self._egress_lifecycles[egress.url] = lifecycle
+        return lifecycle
+
+    def _run(self, work: Callable[..., T]) -> T:
+        """Run a page load, through the next egress route if the pool has any."""
+        egress = self.egress_pool.acquire()
+        lifecycle = self.lifecycle if egress is None else self._egress_lifecycle(egress)
+        try:
+            result = lifecycle.run(work)
+        except Exception as e:
+            self.egress_pool.report(egress, e)
+            raise
+        self.egress_pool.report(egress)
+        return result
+
+    def close(self) -> None:
+        """Close the browsers, if any were launched."""
+        if self._lifecycle is not None:
+            self._lifecycle.close()
+            self._lifecycle = None
+        for lifecycle in self._egress_lifecycles.values():
+            lifecycle.close()
+        self._egress_lifecycles = {}
+    
     def _get_cache_path(self, url: str) -> str:
         """Generate a cache file path based on the URL hash."""
         url_hash = hashlib.md5(url.encode()).hexdigest()
         return os.path.join(self.cache_dir, f"{url_hash}.html")
     
+    def iter_page_html_chunks(self, url: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        """
+        Retrieve page HTML in chunks.
+        
+        Recorded pages are streamed from disk without loading the whole file; live pages
+        are retrieved with get_page_html and sliced.
+        
+        Args:
+            url (str): URL of the web page to retrieve HTML from.
+            chunk_size (int, optional): Size of each chunk. Defaults to 64 KiB.
+        
+        Yields:
+            str: Consecutive pieces of the page HTML.
+        """
+        cache_path = self._get_cache_path(url)
+        if self.record_replay and os.path.exists(cache_path):
+            yield from iter_file_chunks(cache_path, chunk_size)
+            return
+        
+        full_html = self.get_page_html(url)
+        for start in range(0, len(full_html), chunk_size):
+            yield full_html[start:start + chunk_size]
+    
     def get_page_html(self, url: str) -> str:
         """
         Retrieve full page HTML after scrolling, using cache if enabled.
@@ -54,44 +235,159 @@ class Browser:
             with open(cache_path, "r", encoding="utf-8") as f:
                 return f.read()
         
+        # Playwright is imported lazily so that cached runs and --help stay fast
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+        timeouts = self._timeouts(url)
+
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=self.headless)
-                page = browser.new_page()
-                page.goto(url, timeout=self.timeout, wait_until='load')
-                
-                # Scroll to the bottom to load all content
-                page.evaluate("""
-                    async () => {
-                        await new Promise((resolve) => {
-                            let totalHeight = 0;
-                            const distance = 100;
-                            const timer = setInterval(() => {
-                                const scrollHeight = document.body.scrollHeight;
-                                window.scrollBy(0, distance);
-                                totalHeight += distance;
-                                if (totalHeight >= scrollHeight) {
-                                    clearInterval(timer);
-                                    resolve();
-                                }
-                            }, 100);
-                        });
-                    }
-                """)
-                
-                page.wait_for_timeout(self.scroll_timeout)
-                full_html = page.content()
-                browser.close()
-                
-                # Cache HTML if recording is enabled
-                if self.record_replay:
-                    with open(cache_path, "w", encoding="utf-8") as f:
-                        f.write(full_html)
-                
-                return full_html
+            full_html = self._run(lambda page: self._load_page(page, url, timeouts))
         
         except PlaywrightTimeoutError as e:
             raise TimeoutError(f"Timeout while retrieving page HTML from {url}: {e}")
         
         except Exception as e:
             raise RuntimeError(f"Error retrieving page HTML: {e}")
+        
+        # Cache HTML if recording is enabled
+        if self.record_replay:
+            with open(cache_path, "w", encoding="utf-8") as f:
+                f.write(full_html)
+        
+        return full_html
+    
+    def _timeouts(self, url: str) -> ChannelTimeouts:
+        if self.settings.adaptive_timeouts:
+            return self.timing_history.timeouts(url)
+        return ChannelTimeouts(url, self.settings.timeout_browser_sec, self.settings.timeout_browser_scroll_sec)
+
+    def harvest_links(self, url: str) -> List[Tuple[str, str]]:
+        """
+        Collect video links while scrolling the page, dropping each card from the DOM once harvested.
+
+        Unlike get_page_html, which snapshots the DOM after scrolling the whole feed, memory and
+        layout cost stay flat for long feeds, and links of virtualized lists are not lost.
+
+        Args:
+            url (str): URL of the web page to harvest.
+
+        Returns:
+            List[Tuple[str, str]]: href and title of each video link, in the order they appeared;
+                the title is empty if no card showed one.
+
+        Raises:
+            TimeoutError: If the page load times out.
+            Exception: For other unexpected errors during harvesting.
+        """
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+        timeouts = self._timeouts(url)
+        try:
+            return self._run(lambda page: self._harvest_page(page, url, timeouts))
+        except PlaywrightTimeoutError as e:
+            raise TimeoutError(f"Timeout while harvesting links from {url}: {e}")
+        except Exception as e:
+            raise RuntimeError(f"Error harvesting links: {e}")
+
+    def _harvest_page(self, page, url: str, timeouts: ChannelTimeouts) -> List[Tuple[str, str]]:
+        """
+        Load a page, install the harvesting observer and scroll until no new link appeared for the scroll budget.
+
+        Stops early at settings.harvest_max_links, so that an endless feed ends. The longest wait
+        for a new link is recorded as the channel's scroll time, as that is what the budget bounds.
+        """
+        load_started = time.monotonic()
+        with self.profiler.operation('goto', url):
+            page.goto(url, timeout=timeouts.load_timeout_sec * 1000, wait_until='load')
+        load_sec = time.monotonic() - load_started
+
+        max_links = self.settings.harvest_max_links
+        longest_wait = 0.0
+        with self.profiler.operation('harvest', url):
+            items = page.evaluate(_HARVEST_INSTALL_JS)
+            last_item_at = time.monotonic()
+            while not (max_links and items >= max_links):
+                count = page.evaluate(_HARVEST_SCROLL_JS)
+                if count != items:
+                    items = count
+                    now = time.monotonic()
+                    longest_wait = max(longest_wait, now - last_item_at)
+                    last_item_at = now
+                remaining_ms = int((last_item_at + timeouts.scroll_budget_sec - time.monotonic()) * 1000)
+                if remaining_ms <= 0:
+                    break
+                page.wait_for_timeout(min(self.settle_poll_ms, remaining_ms))
+            links = [(href, title) for href, title in page.evaluate(_HARVEST_RESULT_JS)]
+
+        if self.settings.adaptive_timeouts:
+            try:
+                self.timing_history.record(url, load_sec, longest_wait, len(links))
+            except OSError as e:
+                self.logger.warning(f'Failed to record page timings for {url}: {e}')
+        return links[:max_links] if max_links else links
+
+    def _load_page(self, page, url: str, timeouts: ChannelTimeouts) -> str:
+        """
+        Load a page, scroll to the bottom so that all content is loaded, and return its HTML.
+
+        Waits for lazily loaded items for the channel's scroll budget and records how long
+        loading took and how long into that wait the last item appeared, the time the budget
+        has to cover.
+        """
+        load_started = time.monotonic()
+        with self.profiler.operation('goto', url):
+            page.goto(url, timeout=timeouts.load_timeout_sec * 1000, wait_until='load')
+        load_sec = time.monotonic() - load_started
+        
+        # Scroll to the bottom to load all content
+        with self.profiler.operation('scroll', url):
+            page.evaluate("""
+                async () => {
+                    await new Promise((resolve) => {
+                        let totalHeight = 0;
+                        const distance = 100;
+                        const timer = setInterval(() => {
+                            const scrollHeight = document.body.scrollHeight;
+                            window.scrollBy(0, distance);
+                            totalHeight += distance;
+                            if (totalHeight >= scrollHeight) {
+                                clearInterval(timer);
+                                resolve();
+                            }
+                        }, 100);
+                    });
+                }
+            """)
+        
+        settle_started = time.monotonic()
+        with self.profiler.operation('settle', url):
+            items, last_item_at = self._wait_for_items(page, timeouts.scroll_budget_sec)
+        with self.profiler.operation('content', url):
+            full_html = page.content()
+        
+        if self.settings.adaptive_timeouts:
+            try:
+                self.timing_history.record(url, load_sec, last_item_at - settle_started, items)
+            except OSError as e:
+                self.logger.warning(f'Failed to record page timings for {url}: {e}')
+        return full_html
+    
+    def _wait_for_items(self, page, budget_sec: float):
+        """
+        Wait for the scroll budget while counting video links.
+
+        Returns:
+            Tuple[int, float]: Final number of items and the monotonic time the count last grew.
+        """
+        deadline = time.monotonic() + budget_sec
+        items = page.evaluate(_COUNT_ITEMS_JS)
+        last_item_at = time.monotonic()
+        while True:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                return items, last_item_at
+            page.wait_for_timeout(min(self.settle_poll_ms, remaining_ms))
+            count = page.evaluate(_COUNT_ITEMS_JS)
+            if count != items:
+                items = count
+                last_item_at = time.monotonic()
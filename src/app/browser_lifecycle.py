@@ -0,0 +1,310 @@
+import os
+import threading
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, List, Optional, Set, TypeVar
+
+from .logger import Logger
+from .settings import Settings
+from .profiler import RunProfiler
+
+T = TypeVar('T')
+
+# Recycle and restart events kept per lifecycle; a long run recycles thousands of times
+_MAX_EVENTS = 100
+
+# Starting Playwright spawns its driver process; starts are serialized so the new child can be identified
+_START_LOCK = threading.Lock()
+
+
+def _children_by_parent() -> Dict[int, List[int]]:
+    """Map each process id to its children, read from /proc in one pass."""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return children
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces and parentheses; the fields after it are fixed
+        fields = stat[stat.rfind(b')') + 2:].split()
+        if len(fields) > 1:
+            children.setdefault(int(fields[1]), []).append(int(entry))
+    return children
+
+
+def child_pids(pid: int) -> Set[int]:
+    """
+    Return the direct children of a process.
+
+    Args:
+        pid (int): Parent process id
+
+    Returns:
+        Set[int]: Child process ids; empty where /proc is not available
+    """
+    return set(_children_by_parent().get(pid, []))
+
+
+def process_tree_rss(pid: int, include_root: bool = True) -> int:
+    """
+    Return the resident memory of a process and all its descendants.
+
+    Args:
+        pid (int): Root process id
+        include_root (bool, optional): Count the root process itself. Defaults to True.
+
+    Returns:
+        int: Resident set size in bytes; 0 where /proc is not available
+    """
+    page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+    children = _children_by_parent()
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        if current != pid or include_root:
+            try:
+                with open(f'/proc/{current}/statm', 'rb') as f:
+                    total += int(f.read().split()[1]) * page_size
+            except (OSError, IndexError, ValueError):
+                pass
+        stack.extend(children.get(current, []))
+    return total
+
+
+def _start_playwright():
+    # Playwright is imported lazily so that cached runs and --help stay fast
+    from playwright.sync_api import sync_playwright
+    return sync_playwright().start()
+
+
+class BrowserLifecycle:
+    """
+    Keeps one Chromium alive across many page loads while bounding its memory.
+
+    Work is run one unit at a time on a fresh page. Between units, the context is replaced
+    after ``browser_max_navigations_per_context`` units, and the whole browser is relaunched
+    after ``browser_max_navigations`` units or once the RSS of its process tree exceeds
+    ``browser_max_rss_mb``. Recycling never interrupts a unit in progress. If the browser or
+    the page crashes during a unit, the browser is relaunched and the unit retried up to
+    ``browser_restart_attempts`` times.
+
+    A lifecycle belongs to the thread that created it, as Playwright's sync API requires.
+    """
+
+    def __init__(
+        self,
+        launch: Callable[[Any], Any],
+        settings: Optional[Settings] = None,
+        logger: Optional[Logger] = None,
+        persistent: bool = False,
+        name: str = 'browser',
+        profiler: Optional[RunProfiler] = None,
+        start_playwright: Optional[Callable[[], Any]] = None,
+        rss_probe: Optional[Callable[[], int]] = None
+    ):
+        """
+        Initialize BrowserLifecycle.
+
+        Args:
+            launch (Callable[[Any], Any]): Called with the Playwright instance; returns a Browser, or a
+                BrowserContext if persistent is set.
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            persistent (bool, optional): Whether launch returns a persistent context, which can only be
+                recycled together with its browser. Defaults to False.
+            name (str, optional): Name used in log messages and trace files. Defaults to 'browser'.
+            profiler (Optional[RunProfiler], optional): Run profiler tracing each context. Defaults to an inactive one.
+            start_playwright (Optional[Callable[[], Any]], optional): Starts Playwright. Defaults to sync_playwright().start.
+            rss_probe (Optional[Callable[[], int]], optional): Returns the browser's RSS in bytes.
+                Defaults to the RSS of the Playwright driver's process tree.
+        """
+        self.launch = launch
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.persistent = persistent
+        self.name = name
+        self.profiler = profiler or RunProfiler(self.settings, self.logger)
+        self.start_playwright = start_playwright or _start_playwright
+        self.rss_probe = rss_probe or self._driver_rss
+        # Units run since the browser or the context was (re)created
+        self.navigations = 0
+        self.context_navigations = 0
+        # Latest recycle and restart events, as (kind, reason) pairs
+        self.events: List[tuple] = []
+        self._playwright = None
+        self._driver_pid: Optional[int] = None
+        self._browser = None
+        self._context = None
+        self._context_stack: Optional[ExitStack] = None
+        self._crashed = False
+        self._closing = False
+
+    @property
+    def is_running(self) -> bool:
+        """Whether a browser is currently launched."""
+        return self._browser is not None
+
+    def _driver_rss(self) -> int:
+        if self._driver_pid is None:
+            return process_tree_rss(os.getpid(), include_root=False)
+        return process_tree_rss(self._driver_pid)
+
+    def _mark_crashed(self, *_):
+        if not self._closing:
+            self._crashed = True
+
+    def _watch(self, target, event: str) -> None:
+        # Only the current browser or context counts; events of closed ones may arrive late
+        target.on(event, lambda *_: (target is self._browser or target is self._context) and self._mark_crashed())
+
+    def _ensure_playwright(self):
+        if self._playwright is None:
+            with _START_LOCK:
+                before = child_pids(os.getpid())
+                self._playwright = self.start_playwright()
+                started = child_pids(os.getpid()) - before
+            self._driver_pid = min(started) if started else None
+        return self._playwright
+
+    def _open_context(self) -> None:
+        if self.persistent:
+            context = self._browser
+        else:
+            context = self._browser.new_context()
+            self._watch(context, 'close')
+        self._context_stack = ExitStack()
+        self._context_stack.enter_context(self.profiler.trace(context, self.name))
+        self._context = context
+        self.context_navigations = 0
+
+    def _close_context(self) -> None:
+        if self._context is None:
+            return
+        self._closing = True
+        try:
+            self._context_stack.close()
+            if not self.persistent:
+                self._context.close()
+        except Exception as e:
+            self.logger.warning(f"Failed to close {self.name} context cleanly: {e}")
+        finally:
+            self._closing = False
+            self._context = None
+            self._context_stack = None
+
+    def _launch(self) -> None:
+        playwright = self._ensure_playwright()
+        with self.profiler.operation('launch'):
+            self._browser = self.launch(playwright)
+        self._watch(self._browser, 'close' if self.persistent else 'disconnected')
+        self._crashed = False
+        self.navigations = 0
+        self._open_context()
+
+    def _close_browser(self) -> None:
+        self._close_context()
+        if self._browser is None:
+            return
+        self._closing = True
+        try:
+            self._browser.close()
+        except Exception as e:
+            self.logger.warning(f"Failed to close {self.name} cleanly: {e}")
+        finally:
+            self._closing = False
+            self._browser = None
+
+    def _record(self, kind: str, reason: str) -> None:
+        self.events.append((kind, reason))
+        del self.events[:-_MAX_EVENTS]
+        action = {'recycle': 'Recycling', 'recycle context': 'Recycling the context of', 'restart': 'Restarting'}[kind]
+        self.logger.info(f"{action} {self.name}: {reason}")
+
+    def recycle_reason(self) -> Optional[str]:
+        """
+        Return why the browser has to be relaunched before the next unit, if it has to.
+
+        Returns:
+            Optional[str]: Reason, or None if the browser can be reused
+        """
+        limit = self.settings.browser_max_navigations
+        if limit and self.navigations >= limit:
+            return f"{self.navigations} navigations reached the limit of {limit}"
+        max_rss_mb = self.settings.browser_max_rss_mb
+        if max_rss_mb:
+            rss = self.rss_probe()
+            if rss > max_rss_mb * 1024 * 1024:
+                return f"RSS of {rss // (1024 * 1024)} MB exceeds {max_rss_mb} MB"
+        return None
+
+    def _prepare(self) -> None:
+        """Restart, recycle or launch the browser so the next unit starts on a healthy one."""
+        if self._browser is not None and self._crashed:
+            self._record('restart', 'browser crashed')
+            self._close_browser()
+        elif self._browser is not None:
+            reason = self.recycle_reason()
+            if reason:
+                self._record('recycle', reason)
+                self._close_browser()
+            else:
+                limit = self.settings.browser_max_navigations_per_context
+                if limit and self.context_navigations >= limit:
+                    if self.persistent:
+                        self._record('recycle', f"{self.context_navigations} navigations in the persistent context")
+                        self._close_browser()
+                    else:
+                        self._record('recycle context', f"{self.context_navigations} navigations reached the limit of {limit}")
+                        self._close_context()
+                        self._open_context()
+        if self._browser is None:
+            self._launch()
+
+    def run(self, work: Callable[[Any], T]) -> T:
+        """
+        Run one unit of work on a fresh page, restarting the browser and retrying if it crashes.
+
+        Args:
+            work (Callable[[Any], T]): Called with a Playwright Page
+
+        Returns:
+            T: The result of work
+
+        Raises:
+            Exception: Whatever work raises, unless the browser crashed and a retry succeeded
+        """
+        attempts = max(0, self.settings.browser_restart_attempts)
+        for attempt in range(attempts + 1):
+            self._prepare()
+            page = self._context.new_page()
+            page.on('crash', self._mark_crashed)
+            try:
+                return work(page)
+            except Exception as e:
+                if not self._crashed or attempt == attempts:
+                    raise
+                self.logger.warning(f"{self.name.capitalize()} crashed ({e}); retrying on a new browser")
+            finally:
+                self.navigations += 1
+                self.context_navigations += 1
+                try:
+                    page.close()
+                except Exception:
+                    pass
+
+    def close(self) -> None:
+        """Close the browser and stop Playwright."""
+        self._close_browser()
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            finally:
+                self._playwright = None
+                self._driver_pid = None
@@ -0,0 +1,294 @@
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import threading
+import time
+from typing import Any, Callable, List, Optional
+from urllib.parse import urlparse
+
+from .logger import Logger
+from .settings import Settings
+
+# Chromium features and background services a scraping and download session never needs
+TUNED_ARGS = [
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-breakpad',
+    '--disable-domain-reliability',
+    '--disable-client-side-phishing-detection',
+    '--disable-renderer-backgrounding',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-dev-shm-usage',
+    '--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication,'
+    'CalculateNativeWinOcclusion,InterestFeedContentSuggestions,CertificateTransparencyComponentUpdater',
+    '--metrics-recording-only',
+    '--password-store=basic',
+    '--use-mock-keychain',
+    '--mute-audio',
+    '--hide-scrollbars',
+]
+
+_ENDPOINT_PATTERN = re.compile(r'DevTools listening on (ws://\S+)')
+
+
+class BrowserServerError(Exception):
+    """Raised when the browser server cannot be started"""
+    pass
+
+
+def _port_open(endpoint: str, timeout: float = 0.5) -> bool:
+    parts = urlparse(endpoint)
+    try:
+        with socket.create_connection((parts.hostname, parts.port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_info(settings: Settings) -> Optional[dict]:
+    path = os.path.expanduser(settings.browser_server_endpoint_path)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not info.get('endpoint') or not _pid_alive(info.get('pid', -1)):
+        return None
+    return info
+
+
+def browser_server_pid(settings: Settings) -> Optional[int]:
+    """Return the pid of the running browser server's Chromium, if there is one."""
+    info = _read_info(settings)
+    return info['pid'] if info else None
+
+
+def available_endpoint(settings: Settings) -> Optional[str]:
+    """
+    Return the CDP endpoint of a running browser server, if there is one.
+
+    Args:
+        settings (Settings): Application settings
+
+    Returns:
+        Optional[str]: WebSocket endpoint, or None if no server is running or its use is disabled
+    """
+    if not settings.use_browser_server:
+        return None
+    info = _read_info(settings)
+    if info is None or not _port_open(info['endpoint']):
+        return None
+    return info['endpoint']
+
+
+def connect_or_launch(playwright, settings: Settings, logger: Logger, launch: Callable[[Any], Any]):
+    """
+    Connect to the browser server over CDP, or launch a browser if no server is reachable.
+
+    Args:
+        playwright: Playwright instance
+        settings (Settings): Application settings
+        logger (Logger): Logger
+        launch (Callable[[Any], Any]): Launches an own browser; called with the Playwright instance
+
+    Returns:
+        The connected or launched Browser
+    """
+    endpoint = available_endpoint(settings)
+    if endpoint:
+        try:
+            return playwright.chromium.connect_over_cdp(endpoint, timeout=settings.timeout_browser_sec * 1000)
+        except Exception as e:
+            logger.warning(f"Cannot connect to the browser server at {endpoint}, launching a browser: {e}")
+    return launch(playwright)
+
+
+class SharedContext:
+    """
+    The default context of a browser reached over CDP, which holds the server's profile and extension.
+
+    Behaves like the persistent context Downloader launches, except that closing it only
+    disconnects, so the server keeps running for the next invocation.
+    """
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.context = browser.contexts[0]
+
+    def __getattr__(self, name):
+        return getattr(self.context, name)
+
+    def on(self, event: str, handler) -> None:
+        # The shared context goes away only with the connection
+        self.browser.on('disconnected' if event == 'close' else event, handler)
+
+    def close(self) -> None:
+        self.browser.close()
+
+
+class BrowserServer:
+    """
+    Runs one tuned Chromium that later vkvideo invocations connect to instead of launching their own.
+
+    Chromium is started with the logged-in profile and the download extension, so Browser
+    opens its own contexts in it and Downloader uses its default context. The CDP endpoint
+    and pid are written to ``browser_server_endpoint_path``; Chromium is restarted if it exits.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None):
+        """
+        Initialize BrowserServer.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.endpoint_path = os.path.expanduser(self.settings.browser_server_endpoint_path)
+        self.endpoint: Optional[str] = None
+        self.process: Optional[subprocess.Popen] = None
+        self._stopping = threading.Event()
+
+    def executable(self) -> str:
+        """Chromium binary: the configured one, or the Chromium installed by Playwright."""
+        if self.settings.browser_server_executable:
+            return os.path.expanduser(self.settings.browser_server_executable)
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as playwright:
+            return playwright.chromium.executable_path
+
+    def command(self, executable: str) -> List[str]:
+        """
+        Build the Chromium command line.
+
+        Args:
+            executable (str): Chromium binary
+
+        Returns:
+            List[str]: Command and arguments
+        """
+        extension = self.settings.extension_path
+        command = [
+            executable,
+            f'--remote-debugging-port={self.settings.browser_server_port}',
+            '--remote-debugging-address=127.0.0.1',
+            f'--user-data-dir={os.path.expanduser(self.settings.chromium_profile_dir)}',
+            f'--disable-extensions-except={extension}',
+            f'--load-extension={extension}',
+        ] + TUNED_ARGS
+        if self.settings.headless:
+            # Extensions need the new headless mode of full Chromium; the headless shell ignores the flag
+            command.append('--headless=new')
+        return command + ['about:blank']
+
+    def start(self, executable: Optional[str] = None) -> str:
+        """
+        Launch Chromium and publish its endpoint.
+
+        Args:
+            executable (Optional[str], optional): Chromium binary. Defaults to executable().
+
+        Returns:
+            str: CDP WebSocket endpoint
+
+        Raises:
+            BrowserServerError: If Chromium exits or prints no endpoint in time
+        """
+        if browser_server_pid(self.settings) is not None:
+            raise BrowserServerError(f"A browser server is already running (see {self.endpoint_path})")
+        command = self.command(executable or self.executable())
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        endpoint = self._read_endpoint(self.process, time.monotonic() + self.settings.timeout_browser_sec)
+        if endpoint is None:
+            self._terminate()
+            raise BrowserServerError(f"Chromium printed no DevTools endpoint: {' '.join(command)}")
+        self.endpoint = endpoint
+        self._write_endpoint()
+        self.logger.info(f"Browser server listening on {endpoint} (pid {self.process.pid})")
+        return endpoint
+
+    @staticmethod
+    def _read_endpoint(process: subprocess.Popen, deadline: float) -> Optional[str]:
+        found = []
+
+        def read() -> None:
+            for line in process.stderr:
+                match = _ENDPOINT_PATTERN.search(line)
+                if match:
+                    found.append(match.group(1))
+                    break
+            # Keep draining stderr so Chromium never blocks on a full pipe
+            for _ in process.stderr:
+                pass
+
+        threading.Thread(target=read, daemon=True).start()
+        while not found and process.poll() is None and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return found[0] if found else None
+
+    def _write_endpoint(self) -> None:
+        directory = os.path.dirname(self.endpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        staging = self.endpoint_path + '.tmp'
+        with open(staging, 'w', encoding='utf-8') as f:
+            json.dump({'endpoint': self.endpoint, 'pid': self.process.pid, 'started_at': int(time.time())}, f)
+        os.replace(staging, self.endpoint_path)
+
+    def _terminate(self) -> None:
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def stop(self) -> None:
+        """Stop Chromium and remove the endpoint file."""
+        self._stopping.set()
+        self._terminate()
+        if os.path.exists(self.endpoint_path):
+            os.remove(self.endpoint_path)
+        self.endpoint = None
+
+    def serve(self) -> None:
+        """
+        Run until interrupted or terminated, restarting Chromium whenever it exits.
+        """
+        previous = signal.signal(signal.SIGTERM, lambda signum, frame: self._stopping.set())
+        executable = self.executable()
+        try:
+            while not self._stopping.is_set():
+                self.start(executable)
+                while self.process.poll() is None and not self._stopping.wait(0.5):
+                    pass
+                if not self._stopping.is_set():
+                    self.logger.warning(f"Browser server Chromium exited with code {self.process.returncode}; restarting")
+                    time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+            self.stop()
+            self.logger.info("Browser server stopped")
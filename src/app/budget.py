@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .extractor import VideoDTO
+from .logger import Logger
+from .settings import Settings
+
+
+class RunBudget:
+    """
+    Limits a run by wall time, downloaded bytes and number of videos.
+
+    Downloads ask ``admit`` before they start. Once a limit is reached (or a stop was
+    requested) no further video is admitted; downloads already in progress are not
+    interrupted. Videos that were not admitted are collected in ``deferred`` and written to
+    the deferred report, which the next run reads.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize RunBudget.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            clock (Callable[[], float], optional): Monotonic clock in seconds. Defaults to time.monotonic.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.clock = clock
+        self.started_at: Optional[float] = None
+        self.admitted = 0
+        self.bytes = 0
+        self.deferred: List[VideoDTO] = []
+        self.stop_reason: Optional[str] = None
+        self._stop_requested: Optional[str] = None
+        self._deferred_urls = set()
+        self._lock = threading.Lock()
+
+    @property
+    def is_limited(self) -> bool:
+        """Whether any limit is configured."""
+        return any(limit is not None for limit in (
+            self.settings.max_run_sec, self.settings.max_run_bytes, self.settings.max_run_videos
+        ))
+
+    def start(self) -> None:
+        """Start the wall clock of the run."""
+        if self.started_at is None:
+            self.started_at = self.clock()
+
+    def elapsed(self) -> float:
+        """Seconds since the run started."""
+        return 0.0 if self.started_at is None else self.clock() - self.started_at
+
+    def request_stop(self, reason: str) -> None:
+        """Stop admitting videos, e.g. when the scheduler asks the run to end."""
+        self._stop_requested = reason
+
+    def exhausted_reason(self) -> Optional[str]:
+        """
+        Return why no further video may start, if a limit is reached.
+
+        Returns:
+            Optional[str]: Reason, or None while the budget lasts
+        """
+        if self._stop_requested:
+            return self._stop_requested
+        settings = self.settings
+        if settings.max_run_videos is not None and self.admitted >= settings.max_run_videos:
+            return f"video limit of {settings.max_run_videos} reached"
+        if settings.max_run_bytes is not None and self.bytes >= settings.max_run_bytes:
+            return f"byte limit of {settings.max_run_bytes} reached ({self.bytes} bytes downloaded)"
+        if settings.max_run_sec is not None and self.elapsed() >= settings.max_run_sec:
+            return f"time limit of {settings.max_run_sec:g}s reached"
+        return None
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether no further video may start."""
+        return self.exhausted_reason() is not None
+
+    def admit(self, video: VideoDTO) -> bool:
+        """
+        Decide whether a video may start downloading now.
+
+        Args:
+            video (VideoDTO): Video about to be downloaded
+
+        Returns:
+            bool: True if it may start; otherwise it is added to the deferred videos
+        """
+        with self._lock:
+            self.start()
+            reason = self.exhausted_reason()
+            if reason is None:
+                self.admitted += 1
+                return True
+            if self.stop_reason is None:
+                self.stop_reason = reason
+                self.logger.warning(f"Run budget exhausted: {reason}. No further downloads are started")
+            self.defer(video)
+            return False
+
+    def defer(self, video: VideoDTO) -> None:
+        """Add a video to the deferred videos, once."""
+        if video.url not in self._deferred_urls:
+            self._deferred_urls.add(video.url)
+            self.deferred.append(video)
+
+    def record(self, path: Optional[str], size: Optional[int] = None) -> None:
+        """
+        Account for a finished download.
+
+        Args:
+            path (Optional[str]): Downloaded file, or None if nothing was downloaded
+            size (Optional[int], optional): Size of the file, if it is not at path yet (e.g. still staged).
+                Defaults to the size of the file at path.
+        """
+        if path is None:
+            return
+        if size is None:
+            if not os.path.exists(path):
+                return
+            size = os.path.getsize(path)
+        with self._lock:
+            self.bytes += size
+
+    def write_report(self, path: Optional[str] = None) -> str:
+        """
+        Write the deferred videos for the next run.
+
+        Args:
+            path (Optional[str], optional): Report file. Defaults to settings.deferred_report_path.
+
+        Returns:
+            str: Path of the report
+        """
+        path = os.path.expanduser(path or self.settings.deferred_report_path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        report = {
+            'finished_at': int(time.time()),
+            'reason': self.stop_reason,
+            'elapsed_sec': round(self.elapsed(), 1),
+            'downloaded_videos': self.admitted,
+            'downloaded_bytes': self.bytes,
+            'deferred': [{'url': video.url, 'title': video.title} for video in self.deferred],
+        }
+        staging = path + '.tmp'
+        with open(staging, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        os.replace(staging, path)
+        if self.deferred:
+            self.logger.info(f"Deferred {len(self.deferred)} videos to the next run; see {path}")
+        return path
+
+    def load_report(self, path: Optional[str] = None) -> Optional[Dict]:
+        """
+        Read the deferred report of the previous run.
+
+        Args:
+            path (Optional[str], optional): Report file. Defaults to settings.deferred_report_path.
+
+        Returns:
+            Optional[Dict]: The report, or None if there is none
+        """
+        path = os.path.expanduser(path or self.settings.deferred_report_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable deferred report {path}: {e}")
+            return None
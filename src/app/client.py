@@ -0,0 +1,184 @@
+import asyncio
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Callable, List, Optional
+
+from .downloader import Downloader, DownloadCancelled
+from .extractor import Extractor, VideoDTO
+from .logger import Logger
+from .settings import Settings
+
+
+@dataclass
+class DownloadProgress:
+    """
+    Progress event of one download.
+
+    ``stage`` is 'started', 'progress' (``detail`` holds the browser's progress text) or 'completed'.
+    """
+    video: VideoDTO
+    stage: str
+    detail: str = ''
+
+
+class AsyncClient:
+    """
+    Asyncio API for listing channels and downloading videos.
+
+    Playwright's sync API blocks and is bound to the thread that started it, so all browser
+    work runs on dedicated threads owned by the client: one for listing and one per download
+    slot (``download_concurrency``). Each thread keeps its browser alive across calls until
+    ``aclose``; the event loop only awaits results. A cancelled download is aborted at its
+    next progress check; a cancelled listing lets the page load finish in the background.
+
+    Example:
+        async with AsyncClient() as client:
+            async for video in client.list_channel('https://vkvideo.ru/@club1/all'):
+                await client.download(video, '/videos', progress=print)
+    """
+
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        logger: Optional[Logger] = None,
+        extractor: Optional[Extractor] = None,
+        downloader: Optional[Downloader] = None
+    ):
+        """
+        Initialize AsyncClient.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            extractor (Optional[Extractor], optional): Channel extractor. Defaults to a new Extractor.
+            downloader (Optional[Downloader], optional): Video downloader. Defaults to a new Downloader.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.extractor = extractor or Extractor(self.settings, self.logger)
+        self.downloader = downloader or Downloader(self.logger, self.settings)
+        self._list_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vkvideo-list')
+        self._download_threads = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'vkvideo-download-{i}')
+            for i in range(max(1, self.settings.download_concurrency))
+        ]
+        self._pending = [0] * len(self._download_threads)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    async def __aenter__(self) -> 'AsyncClient':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise RuntimeError('AsyncClient is closed')
+
+    async def list_channel(self, url: str) -> AsyncIterator[VideoDTO]:
+        """
+        Yield the videos of a channel page, from the link cache if available.
+
+        Args:
+            url (str): VK video page URL
+
+        Yields:
+            VideoDTO: Videos in page order
+        """
+        self._check_open()
+        loop = asyncio.get_running_loop()
+        videos = await loop.run_in_executor(self._list_thread, self.extractor.extract_video_links_cached, url)
+        for video in videos:
+            yield video
+
+    async def list_channels(self, urls: List[str]) -> AsyncIterator[VideoDTO]:
+        """
+        Yield the videos of several channel pages, one page after the other.
+
+        Args:
+            urls (List[str]): VK video page URLs
+
+        Yields:
+            VideoDTO: Videos in page order
+        """
+        for url in urls:
+            async for video in self.list_channel(url):
+                yield video
+
+    async def download(
+        self,
+        video: VideoDTO,
+        destination_folder: Optional[str] = None,
+        progress: Optional[Callable[[DownloadProgress], None]] = None,
+        low_res: bool = False
+    ) -> Optional[Path]:
+        """
+        Download a video on the least busy download thread.
+
+        Args:
+            video (VideoDTO): Video to download
+            destination_folder (Optional[str], optional): Folder to save the video. Defaults to the current directory.
+            progress (Optional[Callable[[DownloadProgress], None]], optional): Called on the event loop with progress events.
+            low_res (bool, optional): Pick the lowest variant. Defaults to False.
+
+        Returns:
+            Optional[Path]: Path of the video, or None if no variant was acceptable
+
+        Raises:
+            asyncio.CancelledError: If the call was cancelled; the download is aborted in the background
+        """
+        self._check_open()
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
+
+        def report(stage: str, detail: str = '') -> None:
+            if progress is not None:
+                loop.call_soon_threadsafe(progress, DownloadProgress(video, stage, detail))
+
+        def run() -> Optional[Path]:
+            if cancelled.is_set():
+                raise DownloadCancelled(f'Download of {video.title} was cancelled')
+            report('started')
+            path = self.downloader.download_video(
+                video.url,
+                video.title,
+                low_res=low_res,
+                destination_folder=destination_folder,
+                progress=lambda text: report('progress', text),
+                cancelled=cancelled
+            )
+            report('completed', str(path) if path else '')
+            return path
+
+        with self._lock:
+            slot = min(range(len(self._download_threads)), key=self._pending.__getitem__)
+            self._pending[slot] += 1
+        try:
+            return await loop.run_in_executor(self._download_threads[slot], run)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        finally:
+            with self._lock:
+                self._pending[slot] -= 1
+
+    async def aclose(self) -> None:
+        """Close the browsers on their own threads, wait for staged downloads to be stored and stop the threads."""
+        if self._closed:
+            return
+        self._closed = True
+        loop = asyncio.get_running_loop()
+        closing = [loop.run_in_executor(self._list_thread, self.extractor.close)]
+        closing += [loop.run_in_executor(thread, self.downloader.close) for thread in self._download_threads]
+        results = await asyncio.gather(*closing, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                self.logger.warning(f"Failed to close a browser cleanly: {result}")
+        # Downloads still on the scratch disk are moved to their folder before the client is closed
+        await loop.run_in_executor(None, self.downloader.staging.wait)
+        for thread in itertools.chain([self._list_thread], self._download_threads):
+            thread.shutdown(wait=False)
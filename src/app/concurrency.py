@@ -0,0 +1,210 @@
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+from .logger import Logger
+from .settings import Settings
+
+
+class ThrottledError(Exception):
+    """Raised by a download when the server throttles or fails it (HTTP 429 or 5xx)"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def is_backoff_error(error: BaseException) -> bool:
+    """
+    Whether a failed download signals overload, so concurrency should back off.
+
+    Timeouts (including Playwright's) and errors carrying an HTTP status of 429 or 5xx qualify.
+
+    Args:
+        error (BaseException): Exception raised by a download
+
+    Returns:
+        bool: True for timeouts and throttling responses
+    """
+    if isinstance(error, TimeoutError) or type(error).__name__ == 'TimeoutError':
+        return True
+    status = getattr(error, 'status', None)
+    return isinstance(status, int) and (status == 429 or 500 <= status < 600)
+
+
+@dataclass
+class Decision:
+    """
+    One change (or deliberate non-change) of the concurrency limit.
+    """
+    at: float
+    action: str
+    limit: int
+    reason: str
+    throughput_bps: float
+    error_rate: float
+
+
+class AimdController:
+    """
+    Adapts download concurrency with additive increase, multiplicative decrease.
+
+    Workers call ``acquire`` before starting a download and ``release`` with its outcome.
+    Every ``aimd_window_sec`` the window's aggregate throughput and error rate are compared
+    with the previous window: the limit grows by ``aimd_increase`` while throughput keeps
+    rising, errors stay below ``aimd_max_error_rate`` and the current limit was actually used.
+    It is multiplied by ``aimd_decrease_factor`` on a timeout or throttling response (at most
+    once per window) and when throughput falls below ``aimd_collapse_ratio`` of the best window.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize AimdController.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            clock (Callable[[], float], optional): Monotonic clock in seconds. Defaults to time.monotonic.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.clock = clock
+        self.min_limit = max(1, self.settings.concurrency_min)
+        self.max_limit = max(self.min_limit, self.settings.concurrency_max)
+        self.limit = min(self.max_limit, max(self.min_limit, self.settings.download_concurrency))
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.bytes = 0
+        self.decisions: List[Decision] = []
+        self._condition = threading.Condition()
+        self._window_started = clock()
+        self._window_bytes = 0
+        self._window_done = 0
+        self._window_errors = 0
+        self._window_peak = 0
+        self._last_throughput: Optional[float] = None
+        self._best_throughput = 0.0
+        self._last_backoff = float('-inf')
+
+    def acquire(self, cancelled: Optional[threading.Event] = None) -> bool:
+        """
+        Block until a download may start under the current limit.
+
+        Args:
+            cancelled (Optional[threading.Event], optional): Stops waiting once set.
+
+        Returns:
+            bool: True if a slot was taken, False if cancelled
+        """
+        with self._condition:
+            while self.in_flight >= self.limit:
+                if cancelled is not None and cancelled.is_set():
+                    return False
+                self._condition.wait(0.1)
+            self.in_flight += 1
+            self._window_peak = max(self._window_peak, self.in_flight)
+            return True
+
+    def release(self, size: int = 0, error: Optional[BaseException] = None, started: bool = True) -> None:
+        """
+        Return a slot and account for the download's outcome.
+
+        Args:
+            size (int, optional): Bytes downloaded. Defaults to 0.
+            error (Optional[BaseException], optional): Exception the download raised, if any.
+            started (bool, optional): False if the slot was not used for a download. Defaults to True.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if started:
+                if error is None:
+                    self.completed += 1
+                    self.bytes += size
+                    self._window_bytes += size
+                else:
+                    self.failed += 1
+                    self._window_errors += 1
+                self._window_done += 1
+                if error is not None and is_backoff_error(error):
+                    self._back_off(f"{type(error).__name__}: {error}")
+                self._maybe_adjust()
+            self._condition.notify_all()
+
+    def _window_error_rate(self) -> float:
+        return self._window_errors / self._window_done if self._window_done else 0.0
+
+    def _decide(self, action: str, limit: int, reason: str, throughput: float) -> None:
+        previous, self.limit = self.limit, limit
+        decision = Decision(round(self.clock(), 3), action, limit, reason, round(throughput, 1), round(self._window_error_rate(), 3))
+        self.decisions.append(decision)
+        if action != 'hold':
+            self.logger.info(f"Download concurrency {previous} -> {limit} ({action}: {reason})")
+        path = self.settings.concurrency_metrics_path
+        if path:
+            path = os.path.expanduser(path)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(dict(asdict(decision), in_flight=self.in_flight, completed=self.completed, failed=self.failed)) + '\n')
+
+    def _back_off(self, reason: str) -> None:
+        now = self.clock()
+        # One overload burst fails several in-flight downloads at once; count it once per window
+        if now - self._last_backoff < self.settings.aimd_window_sec:
+            return
+        self._last_backoff = now
+        limit = max(self.min_limit, int(self.limit * self.settings.aimd_decrease_factor))
+        self._decide('decrease', limit, reason, self._last_throughput or 0.0)
+
+    def _maybe_adjust(self) -> None:
+        now = self.clock()
+        elapsed = now - self._window_started
+        if elapsed < self.settings.aimd_window_sec:
+            return
+        throughput = self._window_bytes / elapsed
+        error_rate = self._window_error_rate()
+        saturated = self._window_peak >= self.limit
+        previous = self._last_throughput
+        if self._best_throughput and throughput < self._best_throughput * self.settings.aimd_collapse_ratio:
+            if now - self._last_backoff >= self.settings.aimd_window_sec:
+                self._last_backoff = now
+                self._decide('decrease', max(self.min_limit, int(self.limit * self.settings.aimd_decrease_factor)),
+                             f"throughput collapsed to {throughput:.0f} B/s from {self._best_throughput:.0f} B/s", throughput)
+            # The best window is forgotten slowly, so a permanently slower network is not treated as a collapse forever
+            self._best_throughput *= 0.9
+        elif error_rate > self.settings.aimd_max_error_rate:
+            self._decide('hold', self.limit, f"error rate {error_rate:.0%}", throughput)
+        elif saturated and self.limit < self.max_limit and (previous is None or throughput > previous):
+            self._decide('increase', min(self.max_limit, self.limit + self.settings.aimd_increase), "throughput rising", throughput)
+        else:
+            self._decide('hold', self.limit, "throughput flat" if saturated else "limit not used", throughput)
+        self._best_throughput = max(self._best_throughput, throughput)
+        self._last_throughput = throughput
+        self._window_started = now
+        self._window_bytes = self._window_done = self._window_errors = 0
+        self._window_peak = self.in_flight
+
+    def metrics(self) -> Dict:
+        """
+        Snapshot of the controller's state.
+
+        Returns:
+            Dict: Current limit, in-flight downloads, totals, last window throughput and decision counts
+        """
+        with self._condition:
+            counts = {}
+            for decision in self.decisions:
+                counts[decision.action] = counts.get(decision.action, 0) + 1
+            return {
+                'limit': self.limit,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'failed': self.failed,
+                'bytes': self.bytes,
+                'throughput_bps': self._last_throughput,
+                'increases': counts.get('increase', 0),
+                'decreases': counts.get('decrease', 0),
+                'holds': counts.get('hold', 0),
+            }
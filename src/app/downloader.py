@@ -1,18 +1,105 @@
-from playwright.sync_api import sync_playwright, Playwright
-import os, time
-from typing import Optional, List
+import os, sys, time, queue, threading, itertools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, List, Tuple
 from pathlib import Path
 from .logger import Logger
 from .settings import Settings
+from .quality import QualityStrategy, QualityError, SizeProbe, VideoVariant
+from .profile_pool import ProfilePool
+from .profiler import RunProfiler
+from .browser_lifecycle import BrowserLifecycle
+from .browser_server import SharedContext, available_endpoint
+from .har import HAR_RECORD, HarArchive
+from .budget import RunBudget
+from .postprocess import PostProcessor
+from .concurrency import AimdController, is_backoff_error
+from .media_resolver import MEDIA_MP4, HttpDownloadEngine, MediaExpiredError, MediaStream, NetworkMediaResolver, media_expiry
+from .egress import Egress, EgressPool
+from .staging import StagingArea
+
+class DownloadCancelled(Exception):
+    """Raised when a download was cancelled through its cancellation event"""
+    pass
+
+
+def target_path(desired_filename: str, destination_folder: Optional[str] = None) -> str:
+    """
+    Return the path a video with the given title is saved to.
+
+    Args:
+        desired_filename (str): Base filename for the video, with or without the .mp4 extension
+        destination_folder (Optional[str], optional): Folder to save the video. Defaults to the current directory.
+
+    Returns:
+        str: Full path of the video file
+    """
+    if not desired_filename.endswith('.mp4'):
+        desired_filename += '.mp4'
+    return os.path.join(destination_folder or os.getcwd(), desired_filename)
+
+
+@dataclass
+class ResolvedVideo:
+    """
+    A video whose media URL was resolved ahead of its transfer.
+
+    ``expires_at`` is the Unix time the URL stops being accepted; ``resolves`` counts the
+    resolutions so far, including the one that gave ``stream``.
+    """
+    video: Any
+    path: str
+    stream: MediaStream
+    headers: Dict[str, str] = field(default_factory=dict)
+    expires_at: float = 0.0
+    egress: Optional[Egress] = None
+    resolves: int = 1
+
 
 class Downloader:
+    """
+    Downloads videos through the download extension in the logged-in Chromium profile.
+
+    Each thread keeps its own browser, in its own profile slot, across downloads; the browser is
+    recycled and restarted by a BrowserLifecycle. Call close() from the same thread when done.
+    If a browser server is running, threads use its default context instead of launching a browser.
+    With an egress pool, each thread's browser is launched through a route that stays with its
+    profile slot while the route is up, as the logged-in session's cookies go with the address. With a staging
+    directory, videos are saved to the scratch disk and moved to their folder in the background.
+    """
     def __init__(self,
                  logger: Optional[Logger] = None,
-                 settings: Optional[Settings] = None):
+                 settings: Optional[Settings] = None,
+                 size_probe: Optional[SizeProbe] = None,
+                 profile_pool: Optional[ProfilePool] = None,
+                 profiler: Optional[RunProfiler] = None,
+                 har_archive: Optional[HarArchive] = None,
+                 budget: Optional[RunBudget] = None,
+                 post_processor: Optional[PostProcessor] = None,
+                 concurrency: Optional[AimdController] = None,
+                 media_resolver: Optional[NetworkMediaResolver] = None,
+                 download_engine: Optional[HttpDownloadEngine] = None,
+                 egress_pool: Optional[EgressPool] = None,
+                 staging: Optional[StagingArea] = None):
         self.logger = logger or Logger()
         self.settings = settings or Settings()
+        self.size_probe = size_probe or SizeProbe(logger=self.logger)
+        self.profile_pool = profile_pool or ProfilePool(self.settings, self.logger)
+        self.profiler = profiler or RunProfiler(self.settings, self.logger)
+        self.har_archive = har_archive or HarArchive(self.settings, self.logger)
+        self.budget = budget or RunBudget(self.settings, self.logger)
+        self.post_processor = post_processor or PostProcessor(self.settings, self.logger)
+        self.concurrency = concurrency
+        self.media_resolver = media_resolver or NetworkMediaResolver(self.settings, self.logger)
+        self.download_engine = download_engine or HttpDownloadEngine(self.settings, self.logger)
+        self.egress_pool = egress_pool or EgressPool(self.settings, self.logger)
+        # Staged files are post-processed once stored at their destination
+        self.staging = staging or StagingArea(self.settings, self.logger, on_stored=self.post_processor.submit)
         self.download_link_selector = '#vkVideoDownloaderPanel > a:last-of-type'
         self.low_res_selector = '#vkVideoDownloaderPanel > a:first-of-type'
+        self.variant_selector = '#vkVideoDownloaderPanel > a'
+        self._local = threading.local()
 
     def wait_for_element(self, page, selector, timeout=20, interval=1):
         end_time = time.time() + timeout
@@ -23,62 +110,460 @@ class Downloader:
         time.sleep(interval)
         raise Exception('Element not found')
 
-    def download_video(self, url: str, desired_filename: str, low_res: bool = False, destination_folder: Optional[str] = None):
+    def save_storage_state(self, context) -> None:
+        """
+        Save the cookies of the logged-in session so that browser-free components can reuse them.
+
+        Args:
+            context: Playwright browser context of the logged-in profile.
+        """
+        state_path = os.path.expanduser(self.settings.storage_state_path)
+        try:
+            os.makedirs(os.path.dirname(state_path), exist_ok=True)
+            context.storage_state(path=state_path)
+        except Exception as e:
+            self.logger.warning(f"Failed to save session storage state: {e}")
+
+    def list_variants(self, page) -> List[VideoVariant]:
+        """
+        List the download links offered by the extension panel.
+
+        Args:
+            page: Playwright page with the rendered download panel.
+
+        Returns:
+            List[VideoVariant]: Variants in panel order, without sizes.
+        """
+        anchors = page.eval_on_selector_all(
+            self.variant_selector,
+            'els => els.map(el => ({href: el.href, label: el.innerText || ""}))'
+        )
+        return [
+            VideoVariant(index=index, url=anchor['href'], label=anchor['label'].strip())
+            for index, anchor in enumerate(anchors)
+            if anchor['href']
+        ]
+
+    def select_variant(self, variants: List[VideoVariant], low_res: bool = False) -> VideoVariant:
+        """
+        Pick the variant to download according to the configured quality strategy.
+
+        Sizes are estimated with HEAD/Range probes only when the strategy needs them.
+
+        Args:
+            variants (List[VideoVariant]): Variants offered by the download panel.
+            low_res (bool, optional): Force the lowest resolution variant. Defaults to False.
+
+        Returns:
+            VideoVariant: The chosen variant.
+
+        Raises:
+            QualityError: If no variant satisfies the strategy.
+        """
+        if not variants:
+            raise QualityError('No video variants available')
+        if low_res:
+            return min(variants, key=VideoVariant.rank)
+
+        strategy = QualityStrategy.from_settings(self.settings)
+        if strategy.needs_sizes:
+            for variant in variants:
+                variant.size = self.size_probe.probe(variant.url)
+                self.logger.info(f"Variant {variant.label or variant.index}: {variant.size or 'unknown'} bytes")
+        variant = strategy.select(variants)
+        self.logger.info(f"Selected variant {variant.label or variant.index} using '{strategy.name}' strategy")
+        return variant
+
+    def download_video(
+        self,
+        url: str,
+        desired_filename: str,
+        low_res: bool = False,
+        destination_folder: Optional[str] = None,
+        progress: Optional[Callable[[str], None]] = None,
+        cancelled: Optional[threading.Event] = None
+    ):
+        """
+        Download one video through the extension's download panel.
+
+        Args:
+            url (str): Video page URL
+            desired_filename (str): Title to save the video under
+            low_res (bool, optional): Pick the lowest variant. Defaults to False.
+            destination_folder (Optional[str], optional): Folder to save the video. Defaults to the current directory.
+            progress (Optional[Callable[[str], None]], optional): Called with the transfer progress text.
+            cancelled (Optional[threading.Event], optional): Aborts the download once set.
+
+        Returns:
+            Optional[Path]: Path of the video, or None if no variant was acceptable. A staged video
+                reaches this path once the staging area's movers stored it.
+
+        Raises:
+            DownloadCancelled: If cancelled was set before the download completed
+            StagingError: If the scratch disk stays full
+        """
         download_path = destination_folder or os.getcwd()
-        path_to_extension = '/home/illiam/Downloads/VK-Video-Downloader-main/chromium'
-        user_data_dir = os.path.expanduser("~/.config/chromium/")
         download_link_selector = self.low_res_selector if low_res else self.download_link_selector
-        if not desired_filename.endswith('.mp4'):
-            desired_filename += '.mp4'
-        filename_with_path = os.path.join(download_path, desired_filename)
+        filename_with_path = target_path(desired_filename, download_path)
+        desired_filename = os.path.basename(filename_with_path)
 
-        if os.path.exists(filename_with_path):
-            print(f'File already exists: {filename_with_path}')
+        if self._exists(filename_with_path):
+            self.logger.info(f'File already exists: {filename_with_path}')
             return Path(filename_with_path)
 
-        with sync_playwright() as playwright:
-            context = playwright.chromium.launch_persistent_context(
-                user_data_dir,
-                channel="chromium",
-                args=[
-                    f"--disable-extensions-except={path_to_extension}",
-                    f"--load-extension={path_to_extension}",
-                    f'--download-default-directory={download_path}'
-                ],
-                accept_downloads=True,
-                headless=self.settings.headless
+        save_path = self._save_path(filename_with_path)
+        try:
+            lifecycle = self.lifecycle(download_path)
+            egress = self._thread_egress()
+            try:
+                if self.settings.download_engine == 'network':
+                    result = self._download_via_network(lifecycle, url, save_path, progress, cancelled, egress)
+                else:
+                    result = lifecycle.run(
+                        lambda page: self._download_on_page(
+                            page, url, desired_filename, save_path, download_link_selector, low_res, progress, cancelled
+                        )
+                    )
+            except DownloadCancelled:
+                raise
+            except Exception as e:
+                self.egress_pool.report(egress, e)
+                raise
+            self.egress_pool.report(egress)
+            if result is not None and save_path != filename_with_path:
+                self.staging.submit(save_path, filename_with_path)
+                result = Path(filename_with_path)
+        finally:
+            # Whatever was not submitted gives its scratch space back
+            self.staging.release(save_path)
+        if self.har_archive.mode == HAR_RECORD:
+            self._finish_recording(url)
+        return result
+
+    def resolve_video(self, video, destination_folder: Optional[str] = None, low_res: bool = False) -> Optional[ResolvedVideo]:
+        """
+        Find the media URL of a video without transferring it.
+
+        With the extension engine the URL is the panel's link to the chosen variant, which
+        transfer_video then fetches over HTTP instead of through the browser.
+
+        Args:
+            video: Video with url and title attributes
+            destination_folder (Optional[str], optional): Folder to save the video. Defaults to the current directory.
+            low_res (bool, optional): Pick the lowest variant. Defaults to False.
+
+        Returns:
+            Optional[ResolvedVideo]: The resolved video, or None if no variant was acceptable
+        """
+        download_path = destination_folder or os.getcwd()
+        lifecycle = self.lifecycle(download_path)
+        egress = self._thread_egress()
+        try:
+            if self.settings.download_engine == 'network':
+                http_client = self.egress_pool.http_client(egress) if egress is not None else None
+                stream, headers = self._resolve_via_network(lifecycle, video.url, http_client)
+            else:
+                selector = self.low_res_selector if low_res else self.download_link_selector
+                stream, headers = lifecycle.run(lambda page: self._resolve_on_page(page, video.url, selector, low_res))
+        except Exception as e:
+            self.egress_pool.report(egress, e)
+            raise
+        self.egress_pool.report(egress)
+        if self.har_archive.mode == HAR_RECORD:
+            self._finish_recording(video.url)
+        if stream is None:
+            return None
+        expires_at = media_expiry(stream.url, time.time(), self.settings.pipeline_url_ttl_sec)
+        return ResolvedVideo(video, target_path(video.title, download_path), stream, headers, expires_at, egress)
+
+    def transfer_video(
+        self,
+        resolved: ResolvedVideo,
+        progress: Optional[Callable[[str], None]] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> Path:
+        """
+        Transfer a resolved video over HTTP, through the egress route it was resolved on.
+
+        Args:
+            resolved (ResolvedVideo): Video returned by resolve_video
+            progress (Optional[Callable[[str], None]], optional): Called with the transfer progress text.
+            cancelled (Optional[threading.Event], optional): Aborts the transfer once set.
+
+        Returns:
+            Path: Path of the video. A staged video reaches it once the staging area's movers stored it.
+
+        Raises:
+            MediaExpiredError: If the media URL expired; resolving the video again gives a fresh one
+            StagingError: If the scratch disk stays full
+        """
+        save_path = self._save_path(resolved.path, resolved.stream.size)
+        http_client = self.egress_pool.http_client(resolved.egress) if resolved.egress is not None else None
+        try:
+            with self.profiler.operation('transfer', resolved.video.url):
+                self.download_engine.download(
+                    resolved.stream, save_path, headers=resolved.headers, progress=progress, cancelled=cancelled,
+                    http_client=http_client
+                )
+        except (DownloadCancelled, MediaExpiredError):
+            self.staging.release(save_path)
+            raise
+        except Exception as e:
+            self.staging.release(save_path)
+            self.egress_pool.report(resolved.egress, e)
+            raise
+        self.logger.info(f'Download completed: {os.path.basename(resolved.path)}')
+        if save_path != resolved.path:
+            self.staging.submit(save_path, resolved.path)
+        return Path(resolved.path)
+
+    def lifecycle(self, download_path: str) -> BrowserLifecycle:
+        """
+        Return the calling thread's browser lifecycle, creating it on first use.
+
+        The lifecycle holds a profile slot until close() is called, so concurrent threads never
+        share a profile. A different download folder needs a relaunch, since Chromium takes it
+        as a launch argument.
+
+        Args:
+            download_path (str): Folder downloads are saved to
+
+        Returns:
+            BrowserLifecycle: Lifecycle of this thread's persistent browser context
+        """
+        if getattr(self._local, 'download_path', None) not in (None, download_path):
+            self.close()
+        if getattr(self._local, 'lifecycle', None) is None:
+            stack = ExitStack()
+            # The browser server's Chromium has no proxy, so routed threads launch their own, and a
+            # recording is only written when its context closes, which a shared context never does
+            recording = self.har_archive.mode == HAR_RECORD
+            endpoint = None if self.egress_pool.enabled or recording else available_endpoint(self.settings)
+            if endpoint:
+                # The server's Chromium already runs the logged-in profile with the extension
+                launch = lambda playwright: self._connect(playwright, endpoint)
+            else:
+                # Each concurrent download thread runs in its own clone of the logged-in profile
+                user_data_dir = stack.enter_context(self.profile_pool.acquire())
+                # The profile's cookies are tied to its egress route until the slot is released
+                stack.callback(self.egress_pool.release, user_data_dir)
+                self._local.profile = user_data_dir
+                launch = lambda playwright: self._launch(playwright, user_data_dir, download_path)
+            lifecycle = BrowserLifecycle(
+                launch,
+                self.settings,
+                self.logger,
+                persistent=True,
+                name='downloader',
+                profiler=self.profiler
             )
-            context.set_default_timeout(self.settings.timeout_browser_sec * 1000)
-            page = context.new_page()
-            page.goto(url)
-            
-            # Check for logged-in status
-            if page.locator('text=Зарегистрируйтесь, чтобы смотреть видео без ограничений').is_visible():
-                raise Exception('User is not logged in. Please log in to continue.')
-            
-            self.wait_for_element(page, download_link_selector)
-            download_link = page.locator(download_link_selector)
-            if not download_link:
-                raise Exception('Download link not found.')
-            download_link_href = download_link.get_attribute('href')
-            print(f'Found download link: {download_link_href}')
+            stack.callback(lifecycle.close)
+            self._local.stack = stack
+            self._local.lifecycle = lifecycle
+            self._local.download_path = download_path
+        return self._local.lifecycle
+
+    def close(self) -> None:
+        """Close the calling thread's browser and release its profile slot."""
+        stack = getattr(self._local, 'stack', None)
+        self._local.stack = self._local.lifecycle = self._local.download_path = None
+        self._local.profile = self._local.egress = None
+        if stack is not None:
+            stack.close()
 
-            # remove video player from page, so that it doesn't consume extra traffic
-            page.locator('#video_player').evaluate('node => node.remove()')
+    def _finish_recording(self, url: str) -> None:
+        """Close the calling thread's browser, so Playwright writes the page's recording, and stub its media bodies."""
+        self.close()
+        path = self.har_archive.path_for(url)
+        if not os.path.exists(path):
+            self.logger.warning(f"No HAR recording was written for {url}")
+            return
+        self.har_archive.stub_media(path)
 
+    def _thread_egress(self) -> Optional[Egress]:
+        """Take a request slot on the egress route of the calling thread's profile slot; call lifecycle() first."""
+        egress = self.egress_pool.acquire(session=getattr(self._local, 'profile', None))
+        previous = getattr(self._local, 'egress', None)
+        self._local.egress = egress
+        if previous is not None and egress is not previous:
+            # The browser was launched through another route; the next page relaunches it through this one
+            self._local.lifecycle.close()
+        return egress
+
+    def _save_path(self, filename_with_path: str, expected_size: Optional[int] = None) -> str:
+        """Return where a video is written: its final path, or its place on the scratch disk once there is room."""
+        if not self.staging.enabled:
+            return filename_with_path
+        save_path = self.staging.path_for(filename_with_path)
+        self.staging.reserve(save_path, expected_size)
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        return save_path
+
+    def _launch(self, playwright, user_data_dir: str, download_path: str):
+        args = [f'--download-default-directory={download_path}']
+        if self.settings.download_engine == 'extension':
+            path_to_extension = self.settings.extension_path
+            args = [
+                f"--disable-extensions-except={path_to_extension}",
+                f"--load-extension={path_to_extension}",
+            ] + args
+        egress: Optional[Egress] = getattr(self._local, 'egress', None)
+        context = playwright.chromium.launch_persistent_context(
+            user_data_dir,
+            channel="chromium",
+            args=args,
+            accept_downloads=True,
+            headless=self.settings.headless,
+            proxy=egress.playwright_proxy() if egress is not None else None
+        )
+        context.set_default_timeout(self.settings.timeout_browser_sec * 1000)
+        self.save_storage_state(context)
+        return context
+
+    def _download_via_network(
+        self,
+        lifecycle: BrowserLifecycle,
+        url: str,
+        filename_with_path: str,
+        progress: Optional[Callable[[str], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        egress: Optional[Egress] = None
+    ) -> Optional[Path]:
+        """
+        Resolve the media URL from the player's requests, then transfer it without holding the page.
+
+        Manifests and media are fetched through the page's egress route, as media URLs may be signed
+        for its address.
+        """
+        http_client = self.egress_pool.http_client(egress) if egress is not None else None
+        stream, headers = self._resolve_via_network(lifecycle, url, http_client)
+        if stream is None:
+            return None
+        with self.profiler.operation('transfer', url):
+            self.download_engine.download(
+                stream, filename_with_path, headers=headers, progress=progress, cancelled=cancelled, http_client=http_client
+            )
+        self.logger.info(f'Download completed: {os.path.basename(filename_with_path)}')
+        return Path(filename_with_path)
+
+    def _resolve_via_network(
+        self,
+        lifecycle: BrowserLifecycle,
+        url: str,
+        http_client=None
+    ) -> Tuple[Optional[MediaStream], Dict[str, str]]:
+        """Capture the player's streams and pick one; the stream is None if none was acceptable."""
+        def resolve(page):
+            self.har_archive.attach(page, url)
+            with self.profiler.operation('resolve', url):
+                streams = self.media_resolver.resolve(page, url, http_client=http_client)
+            headers = {'Referer': url, 'User-Agent': page.evaluate('navigator.userAgent')}
+            return streams, headers
+
+        streams, headers = lifecycle.run(resolve)
+        try:
+            return self.media_resolver.select(streams), headers
+        except QualityError as e:
+            self.logger.warning(f'Skipping {url}: {e}')
+            return None, headers
+
+    def _connect(self, playwright, endpoint: str):
+        browser = playwright.chromium.connect_over_cdp(endpoint, timeout=self.settings.timeout_browser_sec * 1000)
+        context = SharedContext(browser)
+        context.set_default_timeout(self.settings.timeout_browser_sec * 1000)
+        self.save_storage_state(context)
+        return context
+
+    def _download_on_page(
+        self,
+        page,
+        url: str,
+        desired_filename: str,
+        filename_with_path: str,
+        download_link_selector: str,
+        low_res: bool,
+        progress: Optional[Callable[[str], None]] = None,
+        cancelled: Optional[threading.Event] = None
+    ):
+        def check_cancelled(download=None) -> None:
+            if cancelled is not None and cancelled.is_set():
+                if download is not None:
+                    download.cancel()
+                raise DownloadCancelled(f'Download of {desired_filename} was cancelled')
+
+        report_progress = progress
+        check_cancelled()
+        variant = self._select_on_page(page, url, download_link_selector, low_res)
+        if variant is None:
+            return None
+        download_link = page.locator(self.variant_selector).nth(variant.index)
+        if not download_link:
+            raise Exception('Download link not found.')
+        download_link_href = download_link.get_attribute('href')
+        self.logger.info(f'Found download link: {download_link_href}')
+
+        # remove video player from page, so that it doesn't consume extra traffic
+        page.locator('#video_player').evaluate('node => node.remove()')
+        check_cancelled()
+
+        with self.profiler.operation('start-download', url):
             with page.expect_download() as download_info:
                 # Perform the action that initiates download
                 download_link.click()
             download = download_info.value
-            if not download:
-                raise Exception('Download failed.')
-            print(f"Downloading of file {desired_filename} started ...")
+        if not download:
+            raise Exception('Download failed.')
+        self.logger.info(f"Downloading of file {desired_filename} started ...")
+
+        # watch progress on a second page, closed with the download so long runs don't accumulate pages
+        downloads_page = page.context.new_page()
+        try:
+            self._watch_download(downloads_page, url, download, report_progress, check_cancelled)
+            # This is a blocking call and will make sure the download is completed before proceeding further
+            download.save_as(filename_with_path)
+        finally:
+            downloads_page.close()
+
+        self.logger.info(f'Download completed: {desired_filename}')
+        return Path(filename_with_path)
+
+    def _select_on_page(self, page, url: str, download_link_selector: str, low_res: bool) -> Optional[VideoVariant]:
+        """Open the video page and pick a variant from the extension panel; None if none was acceptable."""
+        self.har_archive.attach(page, url)
+        with self.profiler.operation('goto', url):
+            page.goto(url)
+        
+        # Check for logged-in status
+        if page.locator('text=Зарегистрируйтесь, чтобы смотреть видео без ограничений').is_visible():
+            raise Exception('User is not logged in. Please log in to continue.')
+        
+        with self.profiler.operation('wait-panel', url):
+            self.wait_for_element(page, download_link_selector)
+        try:
+            with self.profiler.operation('select-variant', url):
+                return self.select_variant(self.list_variants(page), low_res=low_res)
+        except QualityError as e:
+            self.logger.warning(f'Skipping {url}: {e}')
+            return None
 
-            # watch progress
-            page = context.new_page()
-            page.goto("chrome://downloads/")
+    def _resolve_on_page(
+        self,
+        page,
+        url: str,
+        download_link_selector: str,
+        low_res: bool
+    ) -> Tuple[Optional[MediaStream], Dict[str, str]]:
+        """Take the panel's link to the chosen variant as a progressive stream."""
+        variant = self._select_on_page(page, url, download_link_selector, low_res)
+        headers = {'Referer': url, 'User-Agent': page.evaluate('navigator.userAgent')}
+        if variant is None:
+            return None, headers
+        return MediaStream(variant.url, MEDIA_MP4, size=variant.size), headers
 
-            progress = None
+    def _watch_download(self, page, url: str, download, report_progress, check_cancelled) -> None:
+        """Follow the transfer on chrome://downloads until the browser no longer shows progress."""
+        page.goto("chrome://downloads/")
+        with self.profiler.operation('transfer', url):
             while True:
                 progress = page.evaluate("""[
                             ...document.querySelectorAll('*')
@@ -93,18 +578,15 @@ class Downloader:
                                 ] : [])
                             )
                             .filter(el => el.id === 'details')[0].children[2].innerText""")
-                print(f'Current progress: {progress.strip()}          ', end='\r')
+                # stdout may carry the export stream (-o -), so the progress line goes to stderr
+                print(f'Current progress: {progress.strip()}          ', end='\r', file=sys.stderr)
                 if progress.strip() == '':
                     break
+                if report_progress is not None:
+                    report_progress(progress.strip())
+                check_cancelled(download)
                 time.sleep(1)
 
-            # This is a blocking call and will make sure the download is completed before proceeding further
-            download.save_as(filename_with_path)
-            
-            print(f'Download completed: {desired_filename}')
-            time.sleep(100)
-            return Path(filename_with_path)
-
 
     def download_videos(self, videos: List, destination_folder: Optional[str] = None, skip: List = []) -> None:
         """
@@ -117,19 +599,268 @@ class Downloader:
         """
         self.logger.info(f"Downloading {len(videos)} videos ...")
         
+        pending = []
         for video in videos:
             # Skip video if it's in the skip collection
             if video in skip:
                 self.logger.info(f"Skipping video {video.title} as it is in the skip collection...")
                 continue
+            pending.append(video)
+
+        if self.settings.download_pipeline:
+            self._download_pipelined(pending, destination_folder)
+            return
 
+        if self.settings.adaptive_concurrency:
+            self._download_adaptive(pending, destination_folder)
+            return
+
+        if self.settings.download_concurrency <= 1:
+            for video in pending:
+                if self._admit(video, destination_folder):
+                    self._download_one(video, destination_folder)
+            return
+
+        # Every worker thread keeps one browser for all its downloads and closes it when the work runs out
+        work = queue.Queue()
+        for video in pending:
+            work.put(video)
+        failed = threading.Event()
+
+        def worker() -> None:
             try:
-                self.logger.info(f"Downloading {video.title} via {video.url}...")
-                self.download_video(
-                    video.url, 
-                    video.title, 
-                    destination_folder=destination_folder
-                )
+                while not failed.is_set():
+                    try:
+                        video = work.get_nowait()
+                    except queue.Empty:
+                        return
+                    if not self._admit(video, destination_folder):
+                        continue
+                    try:
+                        self._download_one(video, destination_folder)
+                    except Exception:
+                        failed.set()
+                        raise
+            finally:
+                self.close()
+
+        workers = max(1, min(self.settings.download_concurrency, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(worker) for _ in range(workers)]
+            for future in futures:
+                future.result()
+
+    def _download_adaptive(self, pending: List, destination_folder: Optional[str]) -> None:
+        """
+        Download with a concurrency limit adapted by an AimdController.
+
+        Up to concurrency_max worker threads run, but only as many downloads as the controller's
+        current limit at a time. Videos that failed with a timeout or a throttling response are
+        put back for up to aimd_retries more attempts; any other failure stops the run.
+        """
+        controller = self.concurrency = self.concurrency or AimdController(self.settings, self.logger)
+        work = queue.Queue()
+        for video in pending:
+            work.put(video)
+        retries = {}
+        failed = threading.Event()
+
+        def worker() -> None:
+            try:
+                while controller.acquire(failed):
+                    try:
+                        video = work.get_nowait()
+                    except queue.Empty:
+                        controller.release(started=False)
+                        return
+                    # A retried video was admitted on its first attempt
+                    if video.url not in retries and not self._admit(video, destination_folder):
+                        controller.release(started=False)
+                        continue
+                    path = target_path(video.title, destination_folder)
+                    if self._exists(path):
+                        # Nothing is transferred, which must not read as a throughput collapse
+                        controller.release(started=False)
+                        self._download_one(video, destination_folder)
+                        continue
+                    try:
+                        self._download_one(video, destination_folder)
+                    except Exception as e:
+                        controller.release(error=e)
+                        if is_backoff_error(e) and retries.get(video.url, 0) < self.settings.aimd_retries:
+                            retries[video.url] = retries.get(video.url, 0) + 1
+                            work.put(video)
+                            continue
+                        failed.set()
+                        raise
+                    controller.release(size=self._size(path) if self._exists(path) else 0)
+            finally:
+                self.close()
+
+        workers = max(1, min(controller.max_limit, len(pending)))
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(worker) for _ in range(workers)]
+                for future in futures:
+                    future.result()
+        finally:
+            self.logger.info(f"Download concurrency metrics: {controller.metrics()}")
+
+    def _download_pipelined(self, pending: List, destination_folder: Optional[str]) -> None:
+        """
+        Download with link resolution and byte transfer in separate stages.
+
+        pipeline_resolvers threads, each with its own browser, resolve up to pipeline_lookahead
+        videos ahead of download_concurrency transfer threads, which need no browser, so the link
+        never idles while the next video's page loads. A URL with less than pipeline_url_margin_sec
+        left, or rejected as expired during its transfer, goes back to the resolvers ahead of new
+        videos, up to pipeline_max_resolves resolutions per video. Any other failure stops the run.
+        """
+        # Entries are (priority, sequence, video, resolves so far); videos to resolve again come first
+        to_resolve = queue.PriorityQueue()
+        sequence = itertools.count()
+        for video in pending:
+            to_resolve.put((1, next(sequence), video, 0))
+        ready = queue.Queue(maxsize=max(1, self.settings.pipeline_lookahead))
+        remaining = [len(pending)]
+        lock = threading.Lock()
+        failed = threading.Event()
+
+        def running() -> bool:
+            return not failed.is_set() and remaining[0] > 0
+
+        def finish() -> None:
+            with lock:
+                remaining[0] -= 1
+
+        def resolve_again(resolved: ResolvedVideo, reason: str) -> None:
+            video = resolved.video
+            if resolved.resolves >= self.settings.pipeline_max_resolves:
+                raise MediaExpiredError(f"Media URL of {video.title} expired after {resolved.resolves} resolutions: {reason}")
+            self.logger.info(f"Resolving {video.title} again: {reason}")
+            to_resolve.put((0, next(sequence), video, resolved.resolves))
+
+        def resolver() -> None:
+            try:
+                while running():
+                    try:
+                        _, _, video, resolves = to_resolve.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    # A video resolved again was admitted the first time
+                    if resolves == 0 and not self._admit(video, destination_folder):
+                        finish()
+                        continue
+                    path = target_path(video.title, destination_folder)
+                    if resolves == 0 and self._exists(path):
+                        self.logger.info(f'File already exists: {path}')
+                        finish()
+                        continue
+                    resolved = self.resolve_video(video, destination_folder)
+                    if resolved is None:
+                        finish()
+                        continue
+                    resolved.resolves = resolves + 1
+                    while running():
+                        try:
+                            ready.put(resolved, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
             except Exception as e:
-                self.logger.error(f"Failed to download video {video.title} from {video.url}: {e}")
-                raise
\ No newline at end of file
+                self.logger.error(f"Failed to resolve video {video.title} from {video.url}: {e}")
+                failed.set()
+                raise
+            finally:
+                self.close()
+
+        def transfer() -> None:
+            while running():
+                try:
+                    resolved = ready.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                video = resolved.video
+                try:
+                    left = resolved.expires_at - time.time()
+                    if left < self.settings.pipeline_url_margin_sec:
+                        resolve_again(resolved, f"its URL expires in {max(left, 0):.0f}s")
+                        continue
+                    self.logger.info(f"Downloading {video.title} via {video.url}...")
+                    try:
+                        path = self.transfer_video(resolved)
+                    except MediaExpiredError as e:
+                        resolve_again(resolved, str(e))
+                        continue
+                except Exception as e:
+                    self.logger.error(f"Failed to download video {video.title} from {video.url}: {e}")
+                    failed.set()
+                    raise
+                self.budget.record(str(path), size=self._size(str(path)))
+                if not self.staging.enabled:
+                    self.post_processor.submit(str(path))
+                finish()
+
+        resolvers = max(1, min(self.settings.pipeline_resolvers, len(pending)))
+        transfers = max(1, min(self.settings.download_concurrency, len(pending)))
+        with ThreadPoolExecutor(max_workers=resolvers + transfers) as executor:
+            futures = [executor.submit(resolver) for _ in range(resolvers)]
+            futures += [executor.submit(transfer) for _ in range(transfers)]
+            for future in futures:
+                future.result()
+
+    def _exists(self, path: str) -> bool:
+        """Whether a video is in its folder or staged on its way there."""
+        return os.path.exists(path) or self.staging.pending(path) is not None
+
+    def _size(self, path: str) -> int:
+        """Size of a downloaded video, wherever the staging area moved it so far."""
+        size = self.staging.size(path)
+        if size is None:
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+        return size
+
+    def _admit(self, video, destination_folder: Optional[str]) -> bool:
+        # Videos already on disk are not downloaded again, so they cost no budget
+        if self._exists(target_path(video.title, destination_folder)):
+            return True
+        return self.budget.admit(video)
+
+    def download_admitted(self, video, destination_folder: Optional[str] = None, cancelled: Optional[threading.Event] = None) -> bool:
+        """
+        Download one video if the run budget admits it, accounting for it like download_videos.
+
+        Args:
+            video: Video with url and title attributes
+            destination_folder (Optional[str], optional): Folder to save the video. Defaults to the current directory.
+            cancelled (Optional[threading.Event], optional): Aborts the download once set.
+
+        Returns:
+            bool: False if the budget deferred the video
+
+        Raises:
+            DownloadCancelled: If cancelled was set before the download completed
+        """
+        if not self._admit(video, destination_folder):
+            return False
+        self._download_one(video, destination_folder, cancelled)
+        return True
+
+    def _download_one(self, video, destination_folder: Optional[str], cancelled: Optional[threading.Event] = None) -> None:
+        try:
+            self.logger.info(f"Downloading {video.title} via {video.url}...")
+            existed = self._exists(target_path(video.title, destination_folder))
+            path = self.download_video(
+                video.url, 
+                video.title, 
+                destination_folder=destination_folder,
+                cancelled=cancelled
+            )
+            if not existed and path:
+                self.budget.record(str(path), size=self._size(str(path)))
+                if not self.staging.enabled:
+                    # Runs in a worker process while this thread moves on to the next download
+                    self.post_processor.submit(str(path))
+        except Exception as e:
+            self.logger.error(f"Failed to download video {video.title} from {video.url}: {e}")
+            raise
@@ -0,0 +1,303 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+from urllib.parse import unquote, urlsplit, urlunsplit
+
+from .logger import Logger
+from .settings import Settings
+
+if TYPE_CHECKING:
+    from .http_client import HttpClient
+
+EGRESS_SCHEMES = ('http', 'socks5', 'socks5h', 'source')
+
+
+class EgressUnavailableError(RuntimeError):
+    """Raised when every egress route is down"""
+    pass
+
+
+@dataclass(eq=False)
+class Egress:
+    """
+    One egress route: a proxy, or a local source address (source://192.0.2.10).
+
+    ``healthy`` is None until the first health check.
+    """
+    url: str
+    healthy: Optional[bool] = None
+    failures: int = 0
+    next_check: float = 0.0
+    next_slot: float = 0.0
+    requests: int = 0
+
+    @property
+    def scheme(self) -> str:
+        return urlsplit(self.url).scheme
+
+    @property
+    def name(self) -> str:
+        """The URL without credentials, for logs."""
+        parts = urlsplit(self.url)
+        netloc = parts.hostname + (f':{parts.port}' if parts.port else '')
+        return urlunsplit((parts.scheme, netloc, '', '', ''))
+
+    @property
+    def proxy(self) -> Optional[str]:
+        return None if self.scheme == 'source' else self.url
+
+    @property
+    def source_address(self) -> Optional[str]:
+        return urlsplit(self.url).hostname if self.scheme == 'source' else None
+
+    def playwright_proxy(self) -> Optional[Dict[str, str]]:
+        """
+        Return the proxy option for launching Chromium through this route.
+
+        Chromium cannot bind to a source address, so source routes load pages directly.
+
+        Returns:
+            Optional[Dict[str, str]]: Playwright proxy settings, or None for a source route
+        """
+        if self.proxy is None:
+            return None
+        parts = urlsplit(self.url)
+        # Chromium speaks SOCKS5 with remote resolution but takes no SOCKS credentials (see EgressPool.validate)
+        scheme = 'socks5' if parts.scheme == 'socks5h' else parts.scheme
+        proxy = {'server': f'{scheme}://{parts.hostname}:{parts.port}'}
+        if parts.username and scheme == 'http':
+            proxy['username'] = unquote(parts.username)
+            proxy['password'] = unquote(parts.password or '')
+        return proxy
+
+
+class EgressPool:
+    """
+    Spreads page loads and transfers over several egress routes to scale past per-IP rate limits.
+
+    Each acquire takes one request slot of a healthy route; with ``egress_requests_per_min``
+    the slots of a route are spaced evenly and acquire sleeps until the next free one. Routes
+    are health checked by fetching ``egress_health_url`` through them before first use and,
+    once down, every ``egress_health_interval_sec``. A route goes down on HTTP 429 or after
+    ``egress_max_failures`` consecutive failures. A session (a logged-in browser profile whose
+    cookies are tied to an address) stays on the route it was first given while that route is up.
+
+    With no routes configured the pool is disabled and acquire returns None: requests go direct.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        logger: Optional[Logger] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Initialize EgressPool.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            clock (Callable[[], float], optional): Monotonic clock. Defaults to time.monotonic.
+            sleep (Callable[[float], None], optional): Sleeps while waiting for a slot. Defaults to time.sleep.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.clock = clock
+        self.sleep = sleep
+        self._routes: Optional[List[Egress]] = None
+        self._sessions: Dict[str, Egress] = {}
+        self._clients: Dict[str, 'HttpClient'] = {}
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+
+    @property
+    def routes(self) -> List[Egress]:
+        """The configured routes, read from settings on first use so command line overrides apply."""
+        if self._routes is None:
+            self._routes = [Egress(url) for url in self.settings.egress]
+        return self._routes
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any egress route is configured."""
+        return bool(self.routes)
+
+    def validate(self) -> None:
+        """
+        Check the configured routes.
+
+        Raises:
+            ValueError: If a route is not an http://, socks5:// or source:// URL with a host, or is a
+                SOCKS5 proxy with credentials, which the browsers launched through the routes cannot use
+        """
+        for route in self.routes:
+            parts = urlsplit(route.url)
+            if parts.scheme not in EGRESS_SCHEMES or not parts.hostname:
+                raise ValueError(f"Invalid egress route '{route.url}': expected {', '.join(EGRESS_SCHEMES)} URL with a host")
+            if parts.scheme != 'source' and not parts.port:
+                raise ValueError(f"Egress proxy '{route.name}' needs a port")
+            if parts.scheme.startswith('socks5') and parts.username:
+                raise ValueError(
+                    f"Egress proxy '{route.name}': Chromium cannot authenticate to SOCKS5 proxies; "
+                    f"use an http:// proxy or a SOCKS5 proxy without credentials"
+                )
+
+    def http_client(self, egress: Optional[Egress]) -> 'HttpClient':
+        """
+        Return the HTTP client of a route; its connections are pooled per route.
+
+        Args:
+            egress (Optional[Egress]): Route, or None for direct connections
+
+        Returns:
+            HttpClient: Client sending every request through the route
+        """
+        from .http_client import HttpClient
+        key = egress.url if egress is not None else ''
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = HttpClient(
+                    self.settings,
+                    pool_size=max(4, self.settings.segment_workers),
+                    proxy=egress.proxy if egress is not None else None,
+                    source_address=egress.source_address if egress is not None else None
+                )
+                self._clients[key] = client
+            return client
+
+    def check(self, egress: Egress) -> bool:
+        """
+        Health check a route by fetching egress_health_url through it.
+
+        Any answer but HTTP 429 or 5xx counts as healthy.
+
+        Args:
+            egress (Egress): Route to check
+
+        Returns:
+            bool: Whether the route is up
+        """
+        try:
+            status = self.http_client(egress).get(self.settings.egress_health_url).status
+            healthy, reason = status != 429 and status < 500, f'HTTP {status}'
+        except Exception as e:
+            healthy, reason = False, str(e) or type(e).__name__
+        with self._lock:
+            self._set_health(egress, healthy, reason)
+        return healthy
+
+    def _set_health(self, egress: Egress, healthy: bool, reason: str) -> None:
+        if healthy and egress.healthy is not True:
+            self.logger.info(f"Egress {egress.name} is up")
+        elif not healthy and egress.healthy is not False:
+            self.logger.warning(f"Egress {egress.name} is down: {reason}")
+        egress.healthy = healthy
+        egress.failures = 0
+        if not healthy:
+            egress.next_check = self.clock() + self.settings.egress_health_interval_sec
+
+    def _check_due(self) -> None:
+        # Checks are serialized, so a thread arriving during a check waits for its result
+        with self._check_lock:
+            now = self.clock()
+            for route in self.routes:
+                if route.healthy is not True and route.next_check <= now:
+                    self.check(route)
+
+    def _choose(self, session: Optional[str]) -> Optional[Egress]:
+        sticky = self._sessions.get(session) if session is not None else None
+        if sticky is not None and sticky.healthy:
+            return sticky
+        now = self.clock()
+        healthy = [route for route in self.routes if route.healthy]
+        # The route with the earliest free slot, then the least used one
+        return min(healthy, key=lambda route: (max(route.next_slot, now), route.requests), default=None)
+
+    def acquire(self, session: Optional[str] = None) -> Optional[Egress]:
+        """
+        Take a request slot on a healthy route, waiting for the route's rate limit.
+
+        Args:
+            session (Optional[str], optional): Key of a session that must keep its route, e.g. a
+                browser profile. Defaults to None, which picks the least busy route.
+
+        Returns:
+            Optional[Egress]: The route to use, or None if the pool is disabled
+
+        Raises:
+            EgressUnavailableError: If every route is down and stays down at its next check
+        """
+        if not self.enabled:
+            return None
+        for attempt in range(2):
+            self._check_due()
+            with self._lock:
+                egress = self._choose(session)
+                if egress is not None:
+                    now = self.clock()
+                    start = max(now, egress.next_slot)
+                    rate = self.settings.egress_requests_per_min
+                    egress.next_slot = start + (60 / rate if rate else 0)
+                    egress.requests += 1
+                    if session is not None:
+                        previous = self._sessions.get(session)
+                        if previous is not None and previous is not egress:
+                            self.logger.info(f"Moving session {session} from egress {previous.name} to {egress.name}")
+                        self._sessions[session] = egress
+                    break
+                wait = min(route.next_check for route in self.routes) - self.clock()
+            if attempt == 0 and wait > 0:
+                self.sleep(wait)
+        else:
+            raise EgressUnavailableError(f"All {len(self.routes)} egress routes are down")
+        if start > now:
+            self.sleep(start - now)
+        return egress
+
+    def release(self, session: str) -> None:
+        """
+        Forget the route of a session that ended, e.g. a browser profile whose slot was released.
+
+        Args:
+            session (str): Key the session acquired its routes with
+        """
+        with self._lock:
+            self._sessions.pop(session, None)
+
+    def report(self, egress: Optional[Egress], error: Optional[BaseException] = None) -> None:
+        """
+        Record the outcome of a request made through a route.
+
+        Args:
+            egress (Optional[Egress]): Route the request used; None is ignored
+            error (Optional[BaseException], optional): Why the request failed. Defaults to None (success).
+        """
+        if egress is None:
+            return
+        with self._lock:
+            if error is None:
+                egress.failures = 0
+                return
+            egress.failures += 1
+            throttled = getattr(error, 'status', None) == 429
+            if egress.healthy and (throttled or egress.failures >= self.settings.egress_max_failures):
+                reason = 'throttled' if throttled else f'{egress.failures} consecutive failures, last: {error}'
+                self._set_health(egress, False, reason)
+
+    def stats(self) -> List[dict]:
+        """Return the state and number of requests of each route."""
+        with self._lock:
+            return [
+                {'egress': route.name, 'healthy': route.healthy, 'requests': route.requests, 'failures': route.failures}
+                for route in self.routes
+            ]
+
+    def close(self) -> None:
+        """Close the pooled connections of all routes."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            client.close()
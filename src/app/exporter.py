@@ -0,0 +1,82 @@
+import csv
+import json
+import os
+import sys
+from typing import Optional, TextIO
+
+from .extractor import VideoDTO
+
+EXPORT_NDJSON = 'ndjson'
+EXPORT_CSV = 'csv'
+EXPORT_FORMATS = [EXPORT_NDJSON, EXPORT_CSV]
+EXPORT_FIELDS = ['url', 'title', 'source']
+
+
+class CatalogExporter:
+    """
+    Writes extracted videos to a file one record at a time.
+
+    Every record is flushed as soon as it is written, so memory use does not grow with
+    the catalog and downstream tools can read the file while extraction is still running.
+    """
+
+    def __init__(self, path: str, format: Optional[str] = None):
+        """
+        Initialize CatalogExporter.
+
+        Args:
+            path (str): Output file path, or '-' for stdout.
+            format (Optional[str], optional): 'ndjson' or 'csv'. Defaults to csv for *.csv paths, ndjson otherwise.
+
+        Raises:
+            ValueError: If the format is unknown.
+        """
+        self.path = path
+        self.format = format or (EXPORT_CSV if path.lower().endswith('.csv') else EXPORT_NDJSON)
+        if self.format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {self.format}. Expected one of {EXPORT_FORMATS}")
+        self.count = 0
+        self._file: Optional[TextIO] = None
+        self._csv = None
+
+    def open(self) -> 'CatalogExporter':
+        """Open the output file and write the CSV header if needed."""
+        if self.path == '-':
+            self._file = sys.stdout
+        else:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'w', encoding='utf-8', newline='')
+        if self.format == EXPORT_CSV:
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(EXPORT_FIELDS)
+            self._file.flush()
+        return self
+
+    def write(self, video: VideoDTO, source: str = '') -> None:
+        """
+        Write one video and flush it to the output.
+
+        Args:
+            video (VideoDTO): Extracted video
+            source (str, optional): URL of the page the video was extracted from. Defaults to ''.
+        """
+        if self.format == EXPORT_CSV:
+            self._csv.writerow([video.url, video.title, source])
+        else:
+            record = {'url': video.url, 'title': video.title, 'source': source}
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        """Close the output file."""
+        if self._file is not None and self._file is not sys.stdout:
+            self._file.close()
+        self._file = None
+
+    def __enter__(self) -> 'CatalogExporter':
+        return self.open()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
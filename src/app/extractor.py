@@ -1,15 +1,19 @@
 import os
 import sys
 import logging
-from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
+from typing import TYPE_CHECKING, Iterator, List, Dict, Optional, Tuple
 import re
-import yaml
 
 # Import Logger class
 from .logger import Logger
 from .browser import Browser
 from .settings import Settings
+from .profiler import RunProfiler
+from .egress import EgressPool
+from .streaming_parser import iter_video_links_from_chunks
+
+if TYPE_CHECKING:
+    from .feed_client import ChannelFeedClient
 
 class VideoDTO:
     def __init__(self, url: str, title: str):
@@ -35,7 +39,10 @@ class Extractor:
         self, 
         settings: Optional[Settings] = None,
         logger: Optional[Logger] = None,
-        browser: Optional[Browser] = None
+        browser: Optional[Browser] = None,
+        feed_client: Optional['ChannelFeedClient'] = None,
+        profiler: Optional[RunProfiler] = None,
+        egress_pool: Optional[EgressPool] = None
     ):
         """
         Initialize Extractor with configuration options
@@ -46,12 +53,66 @@ class Extractor:
                 Defaults to a new Logger instance.
             browser (Optional[Browser], optional): Browser instance to use for HTML retrieval.
                 If not provided, a new Browser will be created with default settings.
+            feed_client (Optional[ChannelFeedClient], optional): Client for the http extraction backend.
+                If not provided, one is created on first use.
+            profiler (Optional[RunProfiler], optional): Run profiler passed to the browser created on first use.
+                Defaults to an inactive one.
+            egress_pool (Optional[EgressPool], optional): Routes the browser created on first use spreads page
+                loads over. Defaults to the routes from settings.
         """
         self.settings = settings or Settings()
         self.logger = logger or Logger()
-        self.browser = browser or Browser(self.settings)
-        self.cache_dir = os.path.expanduser('~/.cache/vkvideo')
-        os.makedirs(self.cache_dir, exist_ok=True)
+        self._browser = browser
+        self._feed_client = feed_client
+        self.profiler = profiler or RunProfiler(self.settings, self.logger)
+        self.egress_pool = egress_pool or EgressPool(self.settings, self.logger)
+        self.cache_dir = os.path.expanduser(self.settings.link_cache_dir)
+
+    @property
+    def browser(self) -> Browser:
+        """Browser used for HTML retrieval, created on first use."""
+        if self._browser is None:
+            self._browser = Browser(self.settings, profiler=self.profiler, egress_pool=self.egress_pool, logger=self.logger)
+        return self._browser
+
+    @property
+    def feed_client(self) -> 'ChannelFeedClient':
+        """Client for the http extraction backend, created on first use."""
+        if self._feed_client is None:
+            from .feed_client import ChannelFeedClient
+            self._feed_client = ChannelFeedClient(self.settings, self.logger)
+        return self._feed_client
+
+
+    def close(self) -> None:
+        """Close the browser, if one was created."""
+        if self._browser is not None:
+            self._browser.close()
+
+    def _get_cache_path(self, url: str) -> str:
+        """Generate a link cache file path based on the URL hash."""
+        import hashlib
+        return os.path.join(self.cache_dir, hashlib.md5(url.encode()).hexdigest() + '.yaml')
+
+
+    def load_cached_links(self, url: str) -> Optional[List[VideoDTO]]:
+        """
+        Load video links for a VK video page from the link cache only, never launching a browser.
+        
+        Args:
+            url (str): URL of the VK video page
+        
+        Returns:
+            Optional[List[VideoDTO]]: Cached video links, or None if the page is not cached
+        """
+        cache_filename = self._get_cache_path(url)
+        if not os.path.exists(cache_filename):
+            return None
+
+        import yaml
+        with open(cache_filename, 'r') as f:
+            cached_videos = yaml.safe_load(f) or []
+        return [VideoDTO(video['url'], video['title']) for video in cached_videos]
 
 
     def extract_video_links_cached(self, url: str) -> List[VideoDTO]:
@@ -68,18 +129,10 @@ class Extractor:
             TimeoutError: If page load or video extraction times out
             Exception: For other unexpected errors during extraction
         """
-        # Create cache filename based on URL hash
-        import hashlib
-        cache_filename = os.path.join(self.cache_dir, hashlib.md5(url.encode()).hexdigest() + '.yaml')
-        
         # Check if cache file exists
-        if os.path.exists(cache_filename):
+        video_links = self.load_cached_links(url)
+        if video_links is not None:
             self.logger.info(f"Using cached links for {url}")
-            with open(cache_filename, 'r') as f:
-                cached_videos = yaml.safe_load(f)
-            
-            # Convert cached data to VideoDTO
-            video_links = [VideoDTO(video['url'], video['title']) for video in cached_videos]
             self.logger.info(f"Found {len(video_links)} videos in cache")
             return video_links
         
@@ -88,8 +141,10 @@ class Extractor:
         
         # Cache the extracted links
         if video_links:
+            import yaml
+            os.makedirs(self.cache_dir, exist_ok=True)
             cached_data = [{'url': video.url, 'title': video.title} for video in video_links]
-            with open(cache_filename, 'w') as f:
+            with open(self._get_cache_path(url), 'w') as f:
                 yaml.safe_dump(cached_data, f)
             self.logger.info(f"Cached {len(video_links)} video links for {url}")
         else:
@@ -112,49 +167,26 @@ class Extractor:
             TimeoutError: If page load or video extraction times out
             Exception: For other unexpected errors during extraction
         """
-        self.logger.info("Launching browser")
-        
         try:
-            # Get full page HTML
-            full_html = self.browser.get_page_html(url)
-            
-            # Parse HTML with BeautifulSoup
-            soup = BeautifulSoup(full_html, 'html.parser')
-            
-            # Find all video links
-            video_links = []
-            extracted_videos = []
-            for link in soup.find_all('a', href=re.compile(r'^/video-')):
-                href = link.get('href')
-                title = link.get_text(strip=True) or 'Untitled Video'
-                
-                # Check if the title is a timestamp
-                if is_timestamp(title):
-                    self.logger.warning(f"Detected timestamp instead of title: {title}")
-                    continue  # Skip this link if it's a timestamp
-                
-                # Convert to full URL
-                full_url = f'https://vkvideo.ru{href}'
-                
-                extracted_videos.append({'url': full_url, 'title': title})
-            
-            for video in extracted_videos:
-                url = video['url']
-                title = video['title']
-                video_links.append(VideoDTO(url, title))
+            if self.settings.extraction_backend == 'http':
+                video_links = self._extract_video_links_http(url)
+            elif self.settings.extraction_backend == 'harvest':
+                video_links = self._extract_video_links_harvest(url)
+            else:
+                video_links = self._extract_video_links_browser(url)
             
             self.logger.info(f"Extracted {len(video_links)} unique video links")
 
             # Cache the extracted links
-            # Create cache filename based on URL hash
-            import hashlib
-            cache_filename = os.path.join(self.cache_dir, hashlib.md5(url.encode()).hexdigest() + '.yaml')
+            cache_filename = self._get_cache_path(url)
 
             if os.path.exists(cache_filename):
                 # remove cache file if old cache exists
                 os.remove(cache_filename)
 
             if video_links:
+                import yaml
+                os.makedirs(self.cache_dir, exist_ok=True)
                 cached_data = [{'url': video.url, 'title': video.title} for video in video_links]
                 with open(cache_filename, 'w') as f:
                     yaml.safe_dump(cached_data, f)
@@ -173,6 +205,82 @@ class Extractor:
             raise
 
 
+    def iter_video_links(self, url: str) -> Iterator[VideoDTO]:
+        """
+        Yield video links of a page as the HTML is parsed, without building a document tree.
+        
+        Peak memory is bounded by the chunk size and the currently open anchors, not by the
+        page size, which matters for recordings of very large channels.
+        
+        Args:
+            url (str): URL of the VK video page
+        
+        Yields:
+            VideoDTO: Video links in document order
+        """
+        self.logger.info("Launching browser")
+        for href, title in iter_video_links_from_chunks(self.browser.iter_page_html_chunks(url)):
+            title = title or 'Untitled Video'
+            if is_timestamp(title):
+                self.logger.warning(f"Detected timestamp instead of title: {title}")
+                continue
+            yield VideoDTO(f'https://vkvideo.ru{href}', title)
+
+
+    def _extract_video_links_browser(self, url: str) -> List[VideoDTO]:
+        """Extract video links by scrolling the page in the browser and parsing its HTML."""
+        if self.settings.html_parser == 'streaming':
+            return list(self.iter_video_links(url))
+
+        self.logger.info("Launching browser")
+        from bs4 import BeautifulSoup
+
+        # Get full page HTML
+        full_html = self.browser.get_page_html(url)
+        
+        # Parse HTML with BeautifulSoup
+        soup = BeautifulSoup(full_html, 'html.parser')
+        
+        # Find all video links
+        video_links = []
+        for link in soup.find_all('a', href=re.compile(r'^/video-')):
+            href = link.get('href')
+            title = link.get_text(strip=True) or 'Untitled Video'
+            
+            # Check if the title is a timestamp
+            if is_timestamp(title):
+                self.logger.warning(f"Detected timestamp instead of title: {title}")
+                continue  # Skip this link if it's a timestamp
+            
+            # Convert to full URL
+            video_links.append(VideoDTO(f'https://vkvideo.ru{href}', title))
+        return video_links
+
+
+    def _extract_video_links_harvest(self, url: str) -> List[VideoDTO]:
+        """Extract video links collected by the browser while scrolling, without a final page snapshot."""
+        self.logger.info("Launching browser")
+        video_links = []
+        for href, title in self.browser.harvest_links(url):
+            title = title or 'Untitled Video'
+            if is_timestamp(title):
+                self.logger.warning(f"Detected timestamp instead of title: {title}")
+                continue
+            video_links.append(VideoDTO(f'https://vkvideo.ru{href}', title))
+        return video_links
+
+
+    def _extract_video_links_http(self, url: str) -> List[VideoDTO]:
+        """Extract video links through the paginated feed endpoint, falling back to the browser on failure."""
+        from .feed_client import FeedError
+        self.logger.info(f"Listing {url} through the feed endpoint")
+        try:
+            return self.feed_client.list_videos(url)
+        except (FeedError, OSError) as e:
+            self.logger.warning(f"Feed listing failed for {url}, falling back to browser: {e}")
+            return self._extract_video_links_browser(url)
+
+
     def extract_videos_from_urls_cached(self, urls: List[str]) -> List[VideoDTO]:
         """
         Extract video links from multiple URLs using cached extraction method.
@@ -198,6 +306,65 @@ class Extractor:
         return all_videos
 
 
+    def iter_videos_from_urls_cached(self, urls: List[str]) -> Iterator[Tuple[str, VideoDTO]]:
+        """
+        Yield video links page by page, using cached links where available.
+        
+        Only one page's links are held at a time, so consumers can stream large
+        multi-channel extractions.
+        
+        Args:
+            urls (List[str]): List of URLs to extract videos from
+        
+        Yields:
+            Tuple[str, VideoDTO]: The page URL and one of its videos
+        """
+        for url in urls:
+            self.logger.info(f"Processing URL: {url}")
+            for video in self.extract_video_links_cached(url):
+                yield url, video
+
+
+    def iter_videos_from_urls(self, urls: List[str]) -> Iterator[Tuple[str, VideoDTO]]:
+        """
+        Yield freshly extracted video links page by page, bypassing the link cache.
+        
+        Args:
+            urls (List[str]): List of URLs to extract videos from
+        
+        Yields:
+            Tuple[str, VideoDTO]: The page URL and one of its videos
+        """
+        for url in urls:
+            self.logger.info(f"Processing URL: {url}")
+            for video in self.extract_video_links(url):
+                yield url, video
+
+
+    def extract_videos_from_urls_offline(self, urls: List[str]) -> Tuple[List[VideoDTO], List[str]]:
+        """
+        Collect video links for multiple URLs from the link cache only, never launching a browser.
+        
+        Args:
+            urls (List[str]): List of URLs to look up
+        
+        Returns:
+            Tuple[List[VideoDTO], List[str]]: Cached video links and the URLs that have no cache entry
+        """
+        all_videos = []
+        uncached_urls = []
+        for url in urls:
+            videos = self.load_cached_links(url)
+            if videos is None:
+                self.logger.warning(f"No cached links for {url}")
+                uncached_urls.append(url)
+                continue
+            all_videos.extend(videos)
+        
+        self.logger.info(f"Found {len(all_videos)} cached video links")
+        return all_videos, uncached_urls
+
+
     def extract_videos_from_urls(self, urls: List[str]) -> List[VideoDTO]:
         """
         Extract video links from multiple URLs using cached extraction method.
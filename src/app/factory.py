@@ -5,6 +5,12 @@ from .extractor import Extractor
 from .downloader import Downloader
 from .settings import Settings
 from .cli_app import CLIApp
+from .lazy import Lazy
+from .profiler import RunProfiler
+from .budget import RunBudget
+from .postprocess import PostProcessor
+from .egress import EgressPool
+from .staging import StagingArea
 
 class Factory:
     @staticmethod
@@ -15,12 +21,27 @@ class Factory:
         logger: Optional[Logger] = None,
     ) -> CLIApp:
         logger = logger or Logger()
-        extractor = extractor or Extractor(logger=logger)
-        downloader = downloader or Downloader(logger=logger)
         settings = settings or Settings()
+        # One profiler is shared by all components; it stays inactive unless --profile is given
+        profiler = RunProfiler(settings, logger)
+        # The run budget is started by the CLI and consumed by the downloader
+        budget = RunBudget(settings, logger)
+        # Downloaded files are post-processed by the downloader; the CLI waits for the pool at the end
+        post_processor = PostProcessor(settings, logger)
+        # Staged downloads are moved to their folder in the background and post-processed once stored
+        staging = StagingArea(settings, logger, on_stored=post_processor.submit)
+        # Page loads and downloads share the egress routes, their health and rate limits
+        egress_pool = EgressPool(settings, logger)
+        # Components are built on first use, so that commands which never reach a stage don't pay for it
+        extractor = extractor or Lazy(lambda: Extractor(settings=settings, logger=logger, profiler=profiler, egress_pool=egress_pool))
+        downloader = downloader or Lazy(lambda: Downloader(logger=logger, settings=settings, profiler=profiler, budget=budget, post_processor=post_processor, egress_pool=egress_pool, staging=staging))
         return CLIApp(
             extractor=extractor,
             downloader=downloader,
             logger=logger,
             settings=settings,
+            profiler=profiler,
+            budget=budget,
+            post_processor=post_processor,
+            staging=staging,
         )
@@ -0,0 +1,228 @@
+import html
+import json
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlencode
+
+from .extractor import VideoDTO
+from .http_client import HttpClient
+from .logger import Logger
+from .settings import Settings
+
+# Canonical video URLs, identical to those produced by the browser backend
+VIDEO_URL_BASE = 'https://vkvideo.ru'
+
+# Endpoint used by the channel page's own infinite scroll
+FEED_ENDPOINT = '/al_video.php?act=load_videos_silent'
+
+_SESSION_DOMAINS = ('vkvideo.ru', 'vk.com', 'vk.ru')
+_COMMUNITY_PATTERN = re.compile(r'/@(?:public|club|event)(\d+)(?:/|$)')
+_USER_PATTERN = re.compile(r'/@id(\d+)(?:/|$)')
+_VIDEOS_PATTERN = re.compile(r'/videos(-?\d+)(?:/|$|\?)')
+_PAGE_OID_PATTERN = re.compile(r'"oid":\s*(-?\d+)')
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+class FeedError(Exception):
+    """Raised when a channel cannot be listed through the feed endpoints"""
+    pass
+
+
+def load_session_cookies(settings: Settings, logger: Optional[Logger] = None) -> Dict[str, str]:
+    """
+    Load the cookies of the logged-in VK session.
+
+    The Playwright storage state saved by the downloader is used when present; otherwise
+    cookies are read from the Chromium profile through yt-dlp. Without either, an empty
+    session is returned and only public channels can be listed.
+
+    Args:
+        settings (Settings): Application settings
+        logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+
+    Returns:
+        Dict[str, str]: Cookie values by name
+    """
+    logger = logger or Logger()
+    state_path = os.path.expanduser(settings.storage_state_path)
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return {
+            cookie['name']: cookie['value']
+            for cookie in state.get('cookies', [])
+            if cookie.get('domain', '').lstrip('.').endswith(_SESSION_DOMAINS)
+        }
+
+    try:
+        from yt_dlp.cookies import extract_cookies_from_browser
+        jar = extract_cookies_from_browser('chromium', os.path.expanduser(settings.chromium_profile_dir))
+        return {cookie.name: cookie.value for cookie in jar if cookie.domain.lstrip('.').endswith(_SESSION_DOMAINS)}
+    except Exception as e:
+        logger.warning(f"Could not load session cookies, continuing anonymously: {e}")
+        return {}
+
+
+def _find_video_list(data: Any) -> Optional[Dict]:
+    """Find the first {"list": [...]} block in a decoded response, descending into JSON-encoded strings."""
+    if isinstance(data, str):
+        stripped = data.strip()
+        if stripped[:1] in ('{', '['):
+            try:
+                return _find_video_list(json.loads(stripped))
+            except ValueError:
+                return None
+        return None
+    if isinstance(data, dict):
+        if isinstance(data.get('list'), list):
+            return data
+        values = data.values()
+    elif isinstance(data, list):
+        values = data
+    else:
+        return None
+    for value in values:
+        found = _find_video_list(value)
+        if found is not None:
+            return found
+    return None
+
+
+def _to_video(item: Any) -> Optional[VideoDTO]:
+    """Convert one feed item ([owner_id, video_id, thumb, title, ...] or a dict) to a VideoDTO."""
+    if isinstance(item, list) and len(item) > 3:
+        owner_id, video_id, title = item[0], item[1], item[3]
+    elif isinstance(item, dict) and 'owner_id' in item and 'id' in item:
+        owner_id, video_id, title = item['owner_id'], item['id'], item.get('title', '')
+    else:
+        return None
+    title = html.unescape(_TAG_PATTERN.sub('', str(title or ''))).strip() or 'Untitled Video'
+    return VideoDTO(f'{VIDEO_URL_BASE}/video{owner_id}_{video_id}', title)
+
+
+class ChannelFeedClient:
+    """
+    Lists the videos of a channel through VK's paginated feed endpoint, without a browser.
+
+    Requests go through one keep-alive HttpClient carrying the logged-in session's cookies,
+    so paging through a large channel costs one round trip per page on a single connection.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        logger: Optional[Logger] = None,
+        http_client: Optional[HttpClient] = None
+    ):
+        """
+        Initialize ChannelFeedClient.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            http_client (Optional[HttpClient], optional): HTTP client. Defaults to a client with the session cookies.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.http_client = http_client or HttpClient(self.settings, cookies=load_session_cookies(self.settings, self.logger))
+        self.base_url = self.settings.vk_base_url.rstrip('/')
+
+    def _page_url(self, url: str) -> str:
+        """Map a channel URL onto the configured base URL."""
+        path = re.sub(r'^https?://[^/]+', '', url)
+        return self.base_url + path
+
+    def resolve_owner_id(self, url: str) -> int:
+        """
+        Return the owner id of a channel URL, fetching the channel page for named channels.
+
+        Args:
+            url (str): Channel URL, e.g. https://vkvideo.ru/@club180058315/all
+
+        Returns:
+            int: Owner id; negative for communities
+
+        Raises:
+            FeedError: If the owner id cannot be determined
+        """
+        for pattern, sign in ((_COMMUNITY_PATTERN, -1), (_USER_PATTERN, 1), (_VIDEOS_PATTERN, 1)):
+            match = pattern.search(url)
+            if match:
+                return sign * int(match.group(1))
+
+        response = self.http_client.get(self._page_url(url))
+        if response.status != 200:
+            raise FeedError(f"Failed to load channel page {url}: HTTP {response.status}")
+        match = _PAGE_OID_PATTERN.search(response.body.decode('utf-8', errors='replace'))
+        if not match:
+            raise FeedError(f"Owner id not found on channel page {url}")
+        return int(match.group(1))
+
+    def _fetch_page(self, owner_id: int, offset: int) -> Dict:
+        body = urlencode({
+            'al': 1,
+            'oid': owner_id,
+            'offset': offset,
+            'section': 'all',
+            'need_albums': 0,
+        }).encode()
+        response = self.http_client.request(
+            'POST',
+            self.base_url + FEED_ENDPOINT,
+            headers={
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'X-Requested-With': 'XMLHttpRequest',
+            },
+            body=body
+        )
+        if response.status != 200:
+            raise FeedError(f"Feed request for owner {owner_id} at offset {offset} failed: HTTP {response.status}")
+        try:
+            text = response.body.decode('utf-8')
+        except UnicodeDecodeError:
+            text = response.body.decode('cp1251')
+        try:
+            # Legacy al responses may be prefixed with an HTML comment opener
+            block = _find_video_list(json.loads(re.sub(r'^\s*<!--', '', text)))
+        except ValueError as e:
+            raise FeedError(f"Unexpected feed response for owner {owner_id}: {e}")
+        if block is None:
+            raise FeedError(f"No video list in feed response for owner {owner_id}")
+        return block
+
+    def iter_videos(self, url: str) -> Iterator[VideoDTO]:
+        """
+        Yield the videos of a channel page by page.
+
+        Args:
+            url (str): Channel URL
+
+        Yields:
+            VideoDTO: Videos in feed order, without duplicates
+
+        Raises:
+            FeedError: If a feed request fails
+        """
+        owner_id = self.resolve_owner_id(url)
+        seen = set()
+        offset = 0
+        for _ in range(self.settings.feed_max_pages):
+            block = self._fetch_page(owner_id, offset)
+            items = block['list']
+            if not items:
+                return
+            for item in items:
+                video = _to_video(item)
+                if video is not None and video.url not in seen:
+                    seen.add(video.url)
+                    yield video
+            offset += len(items)
+            total = block.get('count')
+            if isinstance(total, int) and offset >= total:
+                return
+        self.logger.warning(f"Stopped listing {url} after {self.settings.feed_max_pages} pages")
+
+    def list_videos(self, url: str) -> List[VideoDTO]:
+        """Return all videos of a channel. See iter_videos."""
+        return list(self.iter_videos(url))
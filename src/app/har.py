@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+from .logger import Logger
+from .settings import Settings
+
+HAR_RECORD = 'record'
+HAR_REPLAY = 'replay'
+HAR_MODES = [HAR_RECORD, HAR_REPLAY]
+
+# Name of the shared stub that replaces recorded media bodies
+MEDIA_STUB_FILE = 'media-stub.bin'
+
+_MEDIA_MIME_PREFIXES = ('video/', 'audio/')
+_MEDIA_EXTENSIONS = ('.mp4', '.m4s', '.m4v', '.m4a', '.ts', '.webm', '.mkv', '.aac')
+
+
+class HarError(Exception):
+    """Raised when a download cannot be replayed from a HAR recording"""
+    pass
+
+
+def is_media_entry(entry: Dict) -> bool:
+    """
+    Whether a HAR entry carries a media body (as opposed to pages, scripts and playlists).
+
+    Args:
+        entry (Dict): HAR log entry
+
+    Returns:
+        bool: True for video and audio responses
+    """
+    mime_type = entry.get('response', {}).get('content', {}).get('mimeType', '') or ''
+    if mime_type.lower().startswith(_MEDIA_MIME_PREFIXES):
+        return True
+    path = entry.get('request', {}).get('url', '').split('?', 1)[0].lower()
+    return path.endswith(_MEDIA_EXTENSIONS)
+
+
+class HarArchive:
+    """
+    Records and replays the network traffic of video pages as HAR files, one per video URL.
+
+    In record mode each video page is routed through Playwright's route_from_har with
+    ``update=True``; once its browser context is closed, media bodies in the recording are
+    replaced by one small stub file, so recordings stay small and replay never transfers real
+    video. In replay mode the page is served from the recording only and unknown requests are
+    aborted, which makes download runs offline and deterministic.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None):
+        """
+        Initialize HarArchive.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.directory = os.path.expanduser(self.settings.har_dir)
+
+    @property
+    def mode(self) -> Optional[str]:
+        """'record', 'replay' or None when HAR routing is off."""
+        return self.settings.har_mode
+
+    def path_for(self, url: str) -> str:
+        """HAR file of a video URL."""
+        return os.path.join(self.directory, hashlib.md5(url.encode()).hexdigest() + '.har')
+
+    def attach(self, page, url: str) -> Optional[str]:
+        """
+        Route a page through the HAR recording of a video URL.
+
+        Args:
+            page: Playwright page, before it navigates to the video
+            url (str): Video URL
+
+        Returns:
+            Optional[str]: Path of the HAR file, or None when HAR routing is off
+
+        Raises:
+            HarError: In replay mode, if the video was never recorded
+        """
+        if self.mode is None:
+            return None
+        path = self.path_for(url)
+        if self.mode == HAR_RECORD:
+            os.makedirs(self.directory, exist_ok=True)
+            page.route_from_har(path, update=True, update_content='attach', update_mode='minimal')
+        else:
+            if not os.path.exists(path):
+                raise HarError(f"No HAR recording for {url} in {self.directory}")
+            page.route_from_har(path, not_found='abort')
+        return path
+
+    def stub_media(self, path: str) -> int:
+        """
+        Replace the media bodies of a recording by the shared stub file.
+
+        Args:
+            path (str): HAR file written in record mode
+
+        Returns:
+            int: Number of entries stubbed
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            har = json.load(f)
+
+        stub_size = self.settings.har_stub_bytes
+        stub_path = os.path.join(os.path.dirname(path), MEDIA_STUB_FILE)
+        if not os.path.exists(stub_path) or os.path.getsize(stub_path) != stub_size:
+            with open(stub_path, 'wb') as f:
+                f.write(b'\0' * stub_size)
+
+        stubbed = 0
+        replaced_files = set()
+        kept_files = set()
+        for entry in har.get('log', {}).get('entries', []):
+            content = entry.get('response', {}).get('content', {})
+            if not is_media_entry(entry):
+                if content.get('_file'):
+                    kept_files.add(content['_file'])
+                continue
+            if content.get('_file') and content['_file'] != MEDIA_STUB_FILE:
+                replaced_files.add(content['_file'])
+            content.pop('text', None)
+            content.pop('encoding', None)
+            content['_file'] = MEDIA_STUB_FILE
+            content['size'] = stub_size
+            for header in entry['response'].get('headers', []):
+                if header.get('name', '').lower() == 'content-length':
+                    header['value'] = str(stub_size)
+            stubbed += 1
+
+        staging = path + '.tmp'
+        with open(staging, 'w', encoding='utf-8') as f:
+            json.dump(har, f)
+        os.replace(staging, path)
+
+        # Body files of other recordings may be shared, since attached bodies are named by content hash
+        for name in replaced_files - kept_files:
+            body_path = os.path.join(os.path.dirname(path), name)
+            if os.path.exists(body_path) and not self._is_referenced(name, exclude=path):
+                os.remove(body_path)
+        if stubbed:
+            self.logger.info(f"Replaced {stubbed} media bodies in {path} with a {stub_size} byte stub")
+        return stubbed
+
+    def _is_referenced(self, name: str, exclude: str) -> bool:
+        directory = os.path.dirname(exclude)
+        for other in os.listdir(directory):
+            other_path = os.path.join(directory, other)
+            if other.endswith('.har') and other_path != exclude:
+                with open(other_path, 'r', encoding='utf-8') as f:
+                    if f'"{name}"' in f.read():
+                        return True
+        return False
@@ -0,0 +1,42 @@
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class Lazy(Generic[T]):
+    """
+    A transparent proxy that constructs its target on first attribute access.
+
+    Used by the factory to defer building components (and importing their heavy
+    dependencies) until a stage of the application actually needs them.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        """
+        Initialize Lazy.
+
+        Args:
+            factory (Callable[[], T]): Callable creating the target instance.
+        """
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_instance', None)
+
+    @property
+    def is_created(self) -> bool:
+        """Whether the target has been constructed."""
+        return self._instance is not None
+
+    def get(self) -> T:
+        """Return the target, constructing it if needed."""
+        if self._instance is None:
+            object.__setattr__(self, '_instance', self._factory())
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
+
+    def __repr__(self):
+        return f"Lazy({self._instance!r})" if self.is_created else "Lazy(<not created>)"
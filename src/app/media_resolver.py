@@ -0,0 +1,420 @@
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, urljoin, urlsplit
+
+from .concurrency import ThrottledError
+from .logger import Logger
+from .quality import QualityStrategy, VideoVariant
+from .settings import Settings
+
+if TYPE_CHECKING:
+    from .http_client import HttpClient
+    from .segments import SegmentDownloader
+
+MEDIA_MP4 = 'mp4'
+MEDIA_HLS = 'hls'
+MEDIA_DASH = 'dash'
+
+# At the same height a progressive file wins over manifests, as it is fetched in one request
+_KIND_ORDER = {MEDIA_DASH: 0, MEDIA_HLS: 1, MEDIA_MP4: 2}
+_HEIGHT_IN_URL = re.compile(r'(?<!\d)(144|240|360|480|720|1080|1440|2160)p?(?!\d)')
+_STREAM_INF = re.compile(r'#EXT-X-STREAM-INF:(.*)')
+_ATTRIBUTE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+_CONTENT_RANGE_TOTAL = re.compile(r'/\s*(\d+)\s*$')
+_CHUNK_SIZE = 1024 * 1024
+# Answers of a CDN to a signed media URL that expired; resolving the page again gives a fresh one
+_EXPIRED_STATUSES = (403, 410)
+_EXPIRY_PARAMS = ('expires', 'expire', 'exp')
+
+
+class MediaResolveError(Exception):
+    """Raised when the video page does not request any playable media"""
+    pass
+
+
+class MediaExpiredError(OSError):
+    """Raised when the server no longer accepts a resolved media URL (HTTP 403 or 410)"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def check_expired(status: int, url: str) -> None:
+    """Raise MediaExpiredError if a response status means the media URL expired."""
+    if status in _EXPIRED_STATUSES:
+        raise MediaExpiredError(f"HTTP {status} for {url}: the media URL expired", status=status)
+
+
+def media_expiry(url: str, resolved_at: float, ttl_sec: float) -> float:
+    """
+    Return when a resolved media URL stops being valid.
+
+    Signed CDN URLs carry their expiry as a Unix time in an ``expires`` parameter, in seconds or
+    milliseconds; other URLs are assumed to stay valid for ttl_sec after they were resolved.
+
+    Args:
+        url (str): Media URL
+        resolved_at (float): Unix time the URL was resolved
+        ttl_sec (float): Assumed lifetime of a URL without an expiry
+
+    Returns:
+        float: Unix time of expiry
+    """
+    for name, value in parse_qsl(urlsplit(url).query):
+        if name.lower() in _EXPIRY_PARAMS and value.isdigit():
+            expires = int(value)
+            return expires / 1000 if expires > 10**11 else float(expires)
+    return resolved_at + ttl_sec
+
+
+@dataclass
+class MediaStream:
+    """
+    A playable rendition captured from the player's network traffic.
+    """
+    url: str
+    kind: str
+    height: Optional[int] = None
+    size: Optional[int] = None
+    bandwidth: Optional[int] = None
+
+    @property
+    def label(self) -> str:
+        return f'{self.height}p' if self.height else ''
+
+
+def classify(url: str, content_type: str = '') -> Optional[str]:
+    """
+    Return the media kind of a response, or None if it is not media the player plays.
+
+    Args:
+        url (str): Response URL
+        content_type (str, optional): Content-Type header. Defaults to ''.
+
+    Returns:
+        Optional[str]: MEDIA_MP4, MEDIA_HLS, MEDIA_DASH or None
+    """
+    content_type = content_type.lower()
+    path = urlsplit(url).path.lower()
+    if 'mpegurl' in content_type or path.endswith('.m3u8'):
+        return MEDIA_HLS
+    if 'dash+xml' in content_type or path.endswith('.mpd'):
+        return MEDIA_DASH
+    if content_type.startswith('video/mp4') or path.endswith('.mp4'):
+        return MEDIA_MP4
+    return None
+
+
+def parse_hls_master(text: str, base_url: str) -> List[MediaStream]:
+    """
+    List the variants of an HLS master playlist; a media playlist is returned as a single stream.
+
+    Args:
+        text (str): Playlist text
+        base_url (str): Playlist URL, for relative variant URIs
+
+    Returns:
+        List[MediaStream]: One stream per variant
+    """
+    streams = []
+    attributes = None
+    for line in text.splitlines():
+        line = line.strip()
+        match = _STREAM_INF.match(line)
+        if match:
+            attributes = {name: value.strip('"') for name, value in _ATTRIBUTE.findall(match.group(1))}
+        elif attributes is not None and line and not line.startswith('#'):
+            resolution = attributes.get('RESOLUTION', '')
+            height = int(resolution.split('x')[1]) if 'x' in resolution else None
+            bandwidth = int(attributes['BANDWIDTH']) if attributes.get('BANDWIDTH', '').isdigit() else None
+            streams.append(MediaStream(urljoin(base_url, line), MEDIA_HLS, height=height, bandwidth=bandwidth))
+            attributes = None
+    return streams or [MediaStream(base_url, MEDIA_HLS)]
+
+
+def parse_dash_heights(text: str) -> List[int]:
+    """
+    Return the heights of the video representations in a DASH manifest.
+
+    Args:
+        text (str): MPD document
+
+    Returns:
+        List[int]: Heights, highest first
+    """
+    return sorted({int(height) for height in re.findall(r'<Representation\b[^>]*\bheight="(\d+)"', text)}, reverse=True)
+
+
+class NetworkMediaResolver:
+    """
+    Finds the media URLs of a video by watching the requests its player makes.
+
+    Progressive MP4 files and HLS/DASH manifests are captured from ``page.on('response')``.
+    Manifests are expanded into their variants, and the best stream is chosen with the
+    configured QualityStrategy, so no download extension and no panel wait are needed.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None, http_client: Optional['HttpClient'] = None):
+        """
+        Initialize NetworkMediaResolver.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            http_client (Optional[HttpClient], optional): Client used to read manifests. Defaults to a new HttpClient.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self._http_client = http_client
+
+    @property
+    def http_client(self) -> 'HttpClient':
+        if self._http_client is None:
+            from .http_client import HttpClient
+            self._http_client = HttpClient(self.settings)
+        return self._http_client
+
+    def resolve(self, page, url: str, http_client: Optional['HttpClient'] = None) -> List[MediaStream]:
+        """
+        Load a video page and capture the media its player requests.
+
+        Waits until media was seen and nothing new arrived for resolver_settle_sec, or until
+        resolver_timeout_sec passed.
+
+        Args:
+            page: Playwright Page
+            url (str): Video page URL
+            http_client (Optional[HttpClient], optional): Client reading manifests instead of the resolver's,
+                e.g. the page's egress route. Defaults to None.
+
+        Returns:
+            List[MediaStream]: Captured streams, manifests expanded into their variants
+
+        Raises:
+            MediaResolveError: If no media was requested in time
+        """
+        captured: Dict[str, MediaStream] = {}
+        last_capture = [time.monotonic()]
+
+        def on_response(response) -> None:
+            headers = response.headers
+            kind = classify(response.url, headers.get('content-type', ''))
+            if kind is None or response.url in captured:
+                return
+            stream = MediaStream(response.url, kind)
+            if kind == MEDIA_MP4:
+                stream.size = self._total_size(headers)
+                match = _HEIGHT_IN_URL.search(urlsplit(response.url).path)
+                stream.height = int(match.group(1)) if match else None
+            captured[response.url] = stream
+            last_capture[0] = time.monotonic()
+
+        page.on('response', on_response)
+        page.goto(url)
+        if self.settings.resolver_play_selector:
+            try:
+                # Some players only request media once playback starts
+                page.click(self.settings.resolver_play_selector, timeout=2000)
+            except Exception:
+                pass
+
+        deadline = time.monotonic() + self.settings.resolver_timeout_sec
+        while time.monotonic() < deadline:
+            if captured and time.monotonic() - last_capture[0] >= self.settings.resolver_settle_sec:
+                break
+            page.wait_for_timeout(100)
+        if not captured:
+            raise MediaResolveError(f"The player of {url} requested no media within {self.settings.resolver_timeout_sec:g}s")
+        streams = list(captured.values())
+        if any(stream.kind != MEDIA_MP4 for stream in streams):
+            # With a manifest loaded, MP4 responses are its (fragmented) segments rather than whole files
+            streams = [stream for stream in streams if stream.kind != MEDIA_MP4]
+        return self.expand(streams, referer=url, http_client=http_client)
+
+    @staticmethod
+    def _total_size(headers: Dict[str, str]) -> Optional[int]:
+        content_range = headers.get('content-range')
+        if content_range:
+            match = _CONTENT_RANGE_TOTAL.search(content_range)
+            return int(match.group(1)) if match else None
+        length = headers.get('content-length')
+        return int(length) if length and length.isdigit() else None
+
+    def expand(
+        self,
+        streams: List[MediaStream],
+        referer: Optional[str] = None,
+        http_client: Optional['HttpClient'] = None
+    ) -> List[MediaStream]:
+        """
+        Replace HLS master playlists by their variants and DASH manifests by one stream per video height.
+
+        Args:
+            streams (List[MediaStream]): Captured streams
+            referer (Optional[str], optional): Page URL sent as Referer. Defaults to None.
+            http_client (Optional[HttpClient], optional): Client to use instead of the resolver's. Defaults to None.
+
+        Returns:
+            List[MediaStream]: Expanded streams
+        """
+        headers = {'Referer': referer} if referer else None
+        expanded = []
+        for stream in streams:
+            if stream.kind == MEDIA_MP4:
+                expanded.append(stream)
+                continue
+            try:
+                text = (http_client or self.http_client).get(stream.url, headers=headers).body.decode('utf-8', errors='replace')
+            except OSError as e:
+                self.logger.warning(f"Cannot read manifest {stream.url}: {e}")
+                continue
+            if stream.kind == MEDIA_HLS:
+                expanded.extend(parse_hls_master(text, stream.url))
+            else:
+                # One stream per height, so the quality strategy chooses among them as among HLS variants
+                heights = parse_dash_heights(text) or [None]
+                expanded.extend(MediaStream(stream.url, MEDIA_DASH, height=height) for height in heights)
+        return expanded
+
+    def select(self, streams: List[MediaStream]) -> MediaStream:
+        """
+        Choose the stream to download with the configured quality strategy.
+
+        Args:
+            streams (List[MediaStream]): Candidate streams
+
+        Returns:
+            MediaStream: The chosen stream
+
+        Raises:
+            QualityError: If no stream satisfies the strategy
+        """
+        ordered = sorted(streams, key=lambda s: (s.height or 0, _KIND_ORDER[s.kind], s.size or s.bandwidth or 0))
+        variants = [VideoVariant(index, stream.url, stream.label, stream.size) for index, stream in enumerate(ordered)]
+        chosen = QualityStrategy.from_settings(self.settings).select(variants)
+        stream = ordered[chosen.index]
+        self.logger.info(f"Selected {stream.kind} stream {stream.label or 'of unknown height'} of {len(streams)} captured")
+        return stream
+
+
+class HttpDownloadEngine:
+    """
+    Downloads a resolved stream: progressive files over HTTP, HLS/DASH with the SegmentDownloader.
+
+    Progressive files are written to a .part file that is renamed when complete. Manifests the
+    segment downloader cannot assemble (encrypted HLS, unsupported DASH addressing) fall back to ffmpeg.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None, http_client: Optional['HttpClient'] = None):
+        """
+        Initialize HttpDownloadEngine.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            http_client (Optional[HttpClient], optional): Client used for transfers. Defaults to a new HttpClient.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self._http_client = http_client
+        self._segment_downloader = None
+
+    @property
+    def http_client(self) -> 'HttpClient':
+        if self._http_client is None:
+            from .http_client import HttpClient
+            self._http_client = HttpClient(self.settings)
+        return self._http_client
+
+    @property
+    def segment_downloader(self) -> 'SegmentDownloader':
+        if self._segment_downloader is None:
+            from .segments import SegmentDownloader
+            self._segment_downloader = SegmentDownloader(self.settings, self.logger, self._http_client)
+        return self._segment_downloader
+
+    def download(
+        self,
+        stream: MediaStream,
+        path: str,
+        headers: Optional[Dict[str, str]] = None,
+        progress: Optional[Callable[[str], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        http_client: Optional['HttpClient'] = None
+    ) -> str:
+        """
+        Download a stream to a file.
+
+        Args:
+            stream (MediaStream): Stream to download
+            path (str): Target file
+            headers (Optional[Dict[str, str]], optional): Request headers, e.g. Referer and User-Agent.
+            progress (Optional[Callable[[str], None]], optional): Called with progress text.
+            cancelled (Optional[threading.Event], optional): Aborts the transfer once set.
+            http_client (Optional[HttpClient], optional): Client to use instead of the engine's, e.g. an egress
+                route's. Defaults to None.
+
+        Returns:
+            str: Path of the downloaded file
+
+        Raises:
+            ThrottledError: If the server answers with HTTP 429 or 5xx
+            MediaExpiredError: If the server no longer accepts the stream's URL
+            OSError: If the transfer fails
+        """
+        if stream.kind != MEDIA_MP4:
+            from .segments import SegmentError
+            try:
+                return self.segment_downloader.download(stream, path, headers, progress, cancelled, http_client)
+            except SegmentError as e:
+                self.logger.info(f"Falling back to ffmpeg: {e}")
+                return self._download_manifest(stream, path, headers)
+        from .downloader import DownloadCancelled
+
+        staging = path + '.part'
+        try:
+            with (http_client or self.http_client).stream('GET', stream.url, headers=headers) as response:
+                if response.status == 429 or response.status >= 500:
+                    raise ThrottledError(f"HTTP {response.status} for {stream.url}", status=response.status)
+                check_expired(response.status, stream.url)
+                if response.status != 200:
+                    raise OSError(f"HTTP {response.status} for {stream.url}")
+                total = int(response.getheader('Content-Length') or 0)
+                done = 0
+                with open(staging, 'wb') as f:
+                    while True:
+                        if cancelled is not None and cancelled.is_set():
+                            raise DownloadCancelled(f"Download of {os.path.basename(path)} was cancelled")
+                        chunk = response.read(_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        done += len(chunk)
+                        if progress is not None:
+                            progress(f"{done / 2**20:.1f} MB of {total / 2**20:.1f} MB" if total else f"{done / 2**20:.1f} MB")
+            if total and done != total:
+                raise OSError(f"Transfer of {stream.url} ended after {done} of {total} bytes")
+            os.replace(staging, path)
+            return path
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+
+    def _download_manifest(self, stream: MediaStream, path: str, headers: Optional[Dict[str, str]]) -> str:
+        from .postprocess import run_ffmpeg
+        args = []
+        if headers:
+            args += ['-headers', ''.join(f'{name}: {value}\r\n' for name, value in headers.items())]
+        staging = path + '.part.mp4'
+        try:
+            run_ffmpeg(self.settings, args + ['-i', stream.url, '-c', 'copy', '-movflags', '+faststart', staging])
+            os.replace(staging, path)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+        return path
@@ -0,0 +1,80 @@
+import os
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+from .downloader import target_path
+from .extractor import Extractor, VideoDTO
+from .logger import Logger
+
+
+@dataclass
+class DownloadPlan:
+    """
+    What a run would do, computed from the link cache and the files on disk.
+    """
+    destination: str
+    pending: List[VideoDTO] = field(default_factory=list)
+    present: List[VideoDTO] = field(default_factory=list)
+    skipped: List[VideoDTO] = field(default_factory=list)
+    uncached_urls: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        """One-line summary of the plan."""
+        return (f"{len(self.pending)} to download, {len(self.present)} already present, "
+                f"{len(self.skipped)} skipped, {len(self.uncached_urls)} pages not cached")
+
+    def render(self) -> str:
+        """Human readable plan."""
+        lines = [f"Plan for {self.destination}:"]
+        lines += [f"  download  {video.title} ({video.url})" for video in self.pending]
+        lines += [f"  present   {video.title} ({video.url})" for video in self.present]
+        lines += [f"  skip      {video.title} ({video.url})" for video in self.skipped]
+        lines += [f"  uncached  {url}" for url in self.uncached_urls]
+        lines.append(f"Summary: {self.summary()}")
+        return '\n'.join(lines)
+
+
+class Planner:
+    """
+    Builds download plans without launching a browser.
+    """
+
+    def __init__(self, extractor: Extractor, logger: Logger, is_skipped: Callable[[VideoDTO], bool]):
+        """
+        Initialize Planner.
+
+        Args:
+            extractor (Extractor): Extractor whose link cache is used
+            logger (Logger): Logging utility
+            is_skipped (Callable[[VideoDTO], bool]): Predicate telling whether a video is skiplisted
+        """
+        self.extractor = extractor
+        self.logger = logger
+        self.is_skipped = is_skipped
+
+    def plan(self, urls: List[str], destination: str) -> DownloadPlan:
+        """
+        Compute what would be downloaded for the given pages into the destination.
+
+        Args:
+            urls (List[str]): VK video page URLs
+            destination (str): Destination folder for downloaded videos
+
+        Returns:
+            DownloadPlan: The plan
+        """
+        videos, uncached_urls = self.extractor.extract_videos_from_urls_offline(urls)
+        plan = DownloadPlan(destination=destination, uncached_urls=uncached_urls)
+        seen = set()
+        for video in videos:
+            if video.url in seen:
+                continue
+            seen.add(video.url)
+            if self.is_skipped(video):
+                plan.skipped.append(video)
+            elif os.path.exists(target_path(video.title, destination)):
+                plan.present.append(video)
+            else:
+                plan.pending.append(video)
+        self.logger.info(f"Plan: {plan.summary()}")
+        return plan
@@ -0,0 +1,269 @@
+import hashlib
+import importlib
+import multiprocessing
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from .logger import Logger
+from .settings import Settings
+
+# A step takes the video path and the settings and returns the path of the processed video
+# (None if the video file is unchanged). Steps run in worker processes and must be importable.
+PostStep = Callable[[str, Settings], Optional[str]]
+
+
+class PostProcessingError(Exception):
+    """Raised when a post-processing step cannot be run"""
+    pass
+
+
+@dataclass
+class StepReport:
+    """
+    Outcome of one post-processing step on one file.
+    """
+    path: str
+    step: str
+    seconds: float
+    size_before: int
+    size_after: int
+    error: Optional[str] = None
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.size_before - self.size_after
+
+
+def run_ffmpeg(settings: Settings, args: List[str]) -> None:
+    """Run ffmpeg quietly, raising PostProcessingError if it is missing or fails."""
+    command = [settings.ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-y'] + args
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+    except FileNotFoundError:
+        raise PostProcessingError(f"ffmpeg not found: {settings.ffmpeg_path}")
+    except subprocess.CalledProcessError as e:
+        raise PostProcessingError(f"ffmpeg failed: {e.stderr.decode(errors='replace').strip()}")
+
+
+def _replace_with(path: str, produce: Callable[[str], None], keep_if_larger: bool = False) -> Optional[str]:
+    """Write a processed copy next to the file and swap it in."""
+    staging = path + '.processing.mp4'
+    try:
+        produce(staging)
+        if keep_if_larger and os.path.getsize(staging) >= os.path.getsize(path):
+            return None
+        os.replace(staging, path)
+        return path
+    finally:
+        if os.path.exists(staging):
+            os.remove(staging)
+
+
+def remux(path: str, settings: Settings) -> Optional[str]:
+    """Remux without re-encoding and move the index to the front, so the file starts playing while streaming."""
+    return _replace_with(path, lambda out: run_ffmpeg(settings, ['-i', path, '-c', 'copy', '-movflags', '+faststart', out]))
+
+
+def transcode(path: str, settings: Settings) -> Optional[str]:
+    """Re-encode to HEVC at the configured quality; the original is kept if the result is not smaller."""
+    return _replace_with(
+        path,
+        lambda out: run_ffmpeg(settings, [
+            '-i', path, '-c:v', 'libx265', '-crf', str(settings.transcode_crf), '-preset', 'medium',
+            '-c:a', 'copy', '-movflags', '+faststart', out
+        ]),
+        keep_if_larger=True
+    )
+
+
+def thumbnail(path: str, settings: Settings) -> Optional[str]:
+    """Write a JPEG frame from the first seconds of the video next to it."""
+    run_ffmpeg(settings, ['-ss', '5', '-i', path, '-frames:v', '1', '-q:v', '3', os.path.splitext(path)[0] + '.jpg'])
+    return None
+
+
+def sha256(path: str, settings: Settings) -> Optional[str]:
+    """Write the SHA-256 of the video to a .sha256 file next to it."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    with open(path + '.sha256', 'w') as f:
+        f.write(f'{digest.hexdigest()}  {os.path.basename(path)}\n')
+    return None
+
+
+BUILTIN_STEPS: Dict[str, PostStep] = {
+    'remux': remux,
+    'transcode': transcode,
+    'thumbnail': thumbnail,
+    'hash': sha256,
+}
+
+
+def resolve_step(name: str) -> PostStep:
+    """
+    Return the step function for a built-in step name or a 'package.module:function' plug-in.
+
+    Args:
+        name (str): Step name
+
+    Returns:
+        PostStep: The step function
+
+    Raises:
+        ValueError: If the step cannot be found
+    """
+    if name in BUILTIN_STEPS:
+        return BUILTIN_STEPS[name]
+    module_name, _, function_name = name.partition(':')
+    if not function_name:
+        raise ValueError(f"Unknown post-processing step: {name}. Expected one of {list(BUILTIN_STEPS)} or module:function")
+    try:
+        return getattr(importlib.import_module(module_name), function_name)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f"Cannot load post-processing step {name}: {e}")
+
+
+def run_steps(path: str, steps: List[str], settings: Settings) -> List[StepReport]:
+    """
+    Run post-processing steps on one file, in order. Executed in a worker process.
+
+    A failing step is reported and the remaining steps still run on the last good file.
+
+    Args:
+        path (str): Downloaded video
+        steps (List[str]): Step names
+        settings (Settings): Application settings
+
+    Returns:
+        List[StepReport]: One report per step
+    """
+    reports = []
+    for name in steps:
+        size_before = os.path.getsize(path)
+        started = time.perf_counter()
+        error = None
+        try:
+            path = resolve_step(name)(path, settings) or path
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        reports.append(StepReport(path, name, time.perf_counter() - started, size_before, os.path.getsize(path), error))
+    return reports
+
+
+class PostProcessor:
+    """
+    Runs post-processing steps on downloaded files in a bounded pool of worker processes.
+
+    Files are submitted as soon as their download completes and processed while further
+    downloads run, so CPU-heavy steps never hold up network transfers. Workers are started
+    with 'spawn', as forking a process that drives browsers from several threads is unsafe.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None):
+        """
+        Initialize PostProcessor.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.reports: List[StepReport] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any post-processing step is configured."""
+        return bool(self.settings.post_processing)
+
+    def validate(self) -> None:
+        """
+        Check that all configured steps exist.
+
+        Raises:
+            ValueError: If a step cannot be found
+        """
+        for name in self.settings.post_processing:
+            resolve_step(name)
+
+    def submit(self, path: str) -> Optional[Future]:
+        """
+        Queue a downloaded file for post-processing.
+
+        Args:
+            path (str): Downloaded video
+
+        Returns:
+            Optional[Future]: Future of the step reports, or None if post-processing is off
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=max(1, self.settings.post_processing_workers),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            future = self._executor.submit(run_steps, path, list(self.settings.post_processing), self.settings)
+            future.add_done_callback(self._log_result)
+            self._futures.append(future)
+        return future
+
+    def _log_result(self, future: Future) -> None:
+        try:
+            reports = future.result()
+        except Exception as e:
+            self.logger.error(f"Post-processing failed: {e}")
+            return
+        with self._lock:
+            self.reports.extend(reports)
+        for report in reports:
+            if report.error:
+                self.logger.warning(f"Post-processing step {report.step} failed for {report.path}: {report.error}")
+            else:
+                self.logger.info(
+                    f"{report.step}: {os.path.basename(report.path)} in {report.seconds:.1f}s, "
+                    f"{report.size_before} -> {report.size_after} bytes"
+                )
+
+    def wait(self) -> List[StepReport]:
+        """
+        Wait for all queued files, shut the pool down and log a per-step summary.
+
+        Returns:
+            List[StepReport]: Reports of all processed files
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            futures, self._futures = self._futures, []
+        if executor is None:
+            return self.reports
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                pass
+        executor.shutdown(wait=True)
+        self.logger.info(self.summary())
+        return self.reports
+
+    def summary(self) -> str:
+        """Render time spent and bytes saved per step."""
+        lines = ['Post-processing summary:']
+        for name in self.settings.post_processing:
+            reports = [report for report in self.reports if report.step == name]
+            failed = sum(1 for report in reports if report.error)
+            seconds = sum(report.seconds for report in reports)
+            saved = sum(report.saved_bytes for report in reports if not report.error)
+            lines.append(f"  {name:<12} files {len(reports):4d}   failed {failed:3d}   {seconds:8.1f} s   saved {saved / 2**20:8.1f} MiB")
+        return '\n'.join(lines)
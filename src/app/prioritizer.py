@@ -0,0 +1,69 @@
+from itertools import zip_longest
+from typing import Dict, List, Optional
+
+from .extractor import VideoDTO
+from .settings import Settings
+from .skiplist import video_key
+
+PRIORITY_PAGE = 'page'
+PRIORITY_NEWEST = 'newest'
+PRIORITY_CHANNEL = 'channel'
+PRIORITIES = [PRIORITY_PAGE, PRIORITY_NEWEST, PRIORITY_CHANNEL]
+
+
+def _video_number(video: VideoDTO) -> int:
+    key = video_key(video.url)
+    return int(key.rsplit('_', 1)[1]) if key else -1
+
+
+def _owner(video: VideoDTO) -> Optional[str]:
+    key = video_key(video.url)
+    return key.rsplit('_', 1)[0] if key else None
+
+
+class Prioritizer:
+    """
+    Orders videos for downloading, so that a budgeted run spends its budget on what matters most.
+
+    'page' keeps the order of the channel pages. 'newest' takes each channel's videos newest
+    first and interleaves the channels, one video of each in turn. VK video ids only grow with
+    upload time within one owner, and no upload date is extracted, so videos of different
+    channels are not compared by age. 'channel' orders by the position of the owner in
+    ``Settings.channel_priority``, owners not listed last, newest first within a channel.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None):
+        """
+        Initialize Prioritizer.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+
+        Raises:
+            ValueError: If the priority is unknown
+        """
+        self.settings = settings or Settings()
+        if self.settings.download_priority not in PRIORITIES:
+            raise ValueError(f"Unknown download priority: {self.settings.download_priority}. Expected one of {PRIORITIES}")
+
+    def order(self, videos: List[VideoDTO]) -> List[VideoDTO]:
+        """
+        Return the videos in download order.
+
+        Args:
+            videos (List[VideoDTO]): Videos in page order
+
+        Returns:
+            List[VideoDTO]: The same videos, reordered
+        """
+        priority = self.settings.download_priority
+        if priority == PRIORITY_NEWEST:
+            channels: Dict[Optional[str], List[VideoDTO]] = {}
+            for video in videos:
+                channels.setdefault(_owner(video), []).append(video)
+            newest_first = [sorted(channel, key=_video_number, reverse=True) for channel in channels.values()]
+            return [video for turn in zip_longest(*newest_first) for video in turn if video is not None]
+        if priority == PRIORITY_CHANNEL:
+            ranks = {str(owner).strip(): rank for rank, owner in enumerate(self.settings.channel_priority)}
+            return sorted(videos, key=lambda video: (ranks.get(_owner(video), len(ranks)), -_video_number(video)))
+        return list(videos)
@@ -0,0 +1,204 @@
+import hashlib
+import itertools
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: slots are only exclusive within one process
+    fcntl = None
+
+from .logger import Logger
+from .settings import Settings
+
+# Files whose change means the logged-in session changed
+SESSION_FILES = [
+    'Local State',
+    os.path.join('Default', 'Cookies'),
+    os.path.join('Default', 'Network', 'Cookies'),
+    os.path.join('Default', 'Login Data'),
+]
+
+_SOURCE_LOCK_FILE = '.vkvideo-lock'
+
+# Lock files of a running Chromium and caches that are not worth cloning
+_CLONE_IGNORE = shutil.ignore_patterns(
+    'Singleton*', 'lockfile', 'LOCK', _SOURCE_LOCK_FILE, 'Cache', 'Code Cache', 'GPUCache', 'DawnCache',
+    'GrShaderCache', 'ShaderCache', 'CacheStorage', 'Crashpad', 'BrowserMetrics*'
+)
+
+_MARKER_FILE = '.vkvideo-session'
+
+
+class ProfilePool:
+    """
+    A pool of Chromium profiles cloned from the logged-in profile.
+
+    Chromium locks its profile directory, so concurrent browser sessions need one profile
+    each. The pool hands each concurrent download slot its own clone of the source profile,
+    at most ``download_concurrency`` at a time per process. Clones are refreshed when the
+    session files of the source profile change. With a concurrency of one the source
+    profile is used directly, unless another process already uses it.
+
+    Several processes on one host (e.g. queue workers) share the pool directory: a slot,
+    and the source profile, is held under an exclusive file lock while it is in use, so
+    a process takes the first slot no other session holds and never reclones a profile
+    another Chromium is running on.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None):
+        """
+        Initialize ProfilePool.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.source_dir = os.path.expanduser(self.settings.chromium_profile_dir)
+        self.pool_dir = os.path.expanduser(self.settings.profile_pool_dir)
+        self._sessions: Optional[threading.Semaphore] = None
+        self._lock = threading.Lock()
+        # Slots held in this process, for platforms without file locks
+        self._held: Set[str] = set()
+
+    @property
+    def size(self) -> int:
+        """Number of profiles, one per concurrent download slot."""
+        if self.settings.download_pipeline:
+            # Only the resolvers open pages; transfers run without a browser
+            return max(1, self.settings.pipeline_resolvers)
+        if self.settings.adaptive_concurrency:
+            return max(1, self.settings.concurrency_max)
+        return max(1, self.settings.download_concurrency)
+
+    def _get_sessions(self) -> threading.Semaphore:
+        # Created on first use, so that the concurrency can still be changed from the command line
+        with self._lock:
+            if self._sessions is None:
+                self._sessions = threading.Semaphore(self.size)
+            return self._sessions
+
+    def _try_lock(self, path: str) -> Optional[int]:
+        """Take an exclusive lock on ``path`` without waiting; returns the lock's file descriptor, or None if it is held."""
+        with self._lock:
+            if path in self._held:
+                return None
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    return None
+            self._held.add(path)
+            return fd
+
+    def _unlock(self, path: str, fd: int) -> None:
+        with self._lock:
+            self._held.discard(path)
+            # Closing the descriptor releases the lock
+            os.close(fd)
+
+    def _lock_slot(self) -> Tuple[int, str, int]:
+        # There is always a free slot further up, so only the number of sessions is limited
+        for index in itertools.count():
+            path = self.slot_dir(index) + '.lock'
+            fd = self._try_lock(path)
+            if fd is not None:
+                return index, path, fd
+
+    def slot_dir(self, index: int) -> str:
+        """Directory of the cloned profile for a slot."""
+        return os.path.join(self.pool_dir, f'worker-{index}')
+
+    def session_fingerprint(self) -> str:
+        """Fingerprint of the session files of the source profile."""
+        digest = hashlib.md5()
+        for name in SESSION_FILES:
+            path = os.path.join(self.source_dir, name)
+            if os.path.exists(path):
+                stat = os.stat(path)
+                digest.update(f'{name}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+        return digest.hexdigest()
+
+    def is_fresh(self, index: int, fingerprint: Optional[str] = None) -> bool:
+        """Whether the clone of a slot was made from the current session."""
+        marker = os.path.join(self.slot_dir(index), _MARKER_FILE)
+        if not os.path.exists(marker):
+            return False
+        with open(marker, 'r') as f:
+            return f.read().strip() == (fingerprint or self.session_fingerprint())
+
+    def clone(self, index: int) -> str:
+        """
+        (Re)create the profile of a slot from the source profile.
+
+        The clone is built next to its final location and swapped in, so a slot never
+        holds a half-copied profile.
+
+        Args:
+            index (int): Slot index
+
+        Returns:
+            str: Path of the cloned profile
+        """
+        fingerprint = self.session_fingerprint()
+        target = self.slot_dir(index)
+        staging = target + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.copytree(self.source_dir, staging, ignore=_CLONE_IGNORE, symlinks=True)
+        with open(os.path.join(staging, _MARKER_FILE), 'w') as f:
+            f.write(fingerprint)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+        self.logger.info(f"Cloned browser profile into {target}")
+        return target
+
+    @contextmanager
+    def acquire(self) -> Iterator[str]:
+        """
+        Reserve a profile for one browser session, blocking until this process has a free slot.
+
+        The profile stays locked against other processes until the session ends.
+
+        Yields:
+            str: Path of the profile directory to launch Chromium with
+        """
+        sessions = self._get_sessions()
+        sessions.acquire()
+        try:
+            if self.size == 1:
+                path = os.path.join(self.source_dir, _SOURCE_LOCK_FILE)
+                fd = self._try_lock(path)
+                if fd is not None:
+                    try:
+                        yield self.source_dir
+                    finally:
+                        self._unlock(path, fd)
+                    return
+                self.logger.info("The browser profile is in use by another process, using a clone")
+
+            index, path, fd = self._lock_slot()
+            try:
+                if not self.is_fresh(index):
+                    self.clone(index)
+                yield self.slot_dir(index)
+            finally:
+                self._unlock(path, fd)
+        finally:
+            sessions.release()
+
+    def refresh(self) -> None:
+        """Mark all clones stale; each is recreated from the source profile the next time its slot is acquired."""
+        if not os.path.isdir(self.pool_dir):
+            return
+        for name in os.listdir(self.pool_dir):
+            marker = os.path.join(self.pool_dir, name, _MARKER_FILE)
+            if name.startswith('worker-') and os.path.exists(marker):
+                os.remove(marker)
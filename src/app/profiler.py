@@ -0,0 +1,196 @@
+import io
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from .logger import Logger
+from .settings import Settings
+
+
+@dataclass
+class OperationTiming:
+    """
+    Duration of one timed page operation.
+    """
+    name: str
+    detail: str
+    seconds: float
+
+
+class RunProfiler:
+    """
+    Collects profiling artifacts for one run in a timestamped directory.
+
+    While active it records a cProfile profile of the main thread and of every thread started
+    during the run (such as download workers), merged into one, a Playwright trace per
+    browser context and the duration of every page operation. ``stop`` writes a summary
+    ranking the hottest Python functions and the slowest page operations. When inactive all
+    hooks are no-ops, so components can be instrumented unconditionally.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None):
+        """
+        Initialize RunProfiler.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.output_dir: Optional[str] = None
+        self.operations: List[OperationTiming] = []
+        self._profiles = []
+        self._stats = None
+        self._trace_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        """Whether a profiling run is in progress."""
+        return self.output_dir is not None
+
+    def start(self, base_dir: Optional[str] = None) -> str:
+        """
+        Start profiling into a new timestamped directory.
+
+        Args:
+            base_dir (Optional[str], optional): Parent directory. Defaults to settings.profiling_dir.
+
+        Returns:
+            str: The run's artifact directory
+        """
+        # Imported here so that runs without --profile don't load the profiler modules
+        import cProfile
+
+        base_dir = os.path.expanduser(base_dir or self.settings.profiling_dir)
+        self.output_dir = os.path.join(base_dir, datetime.now().strftime('%Y%m%d-%H%M%S-%f'))
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.operations = []
+        self._trace_count = 0
+        self._profiles = [cProfile.Profile()]
+        if sys.version_info < (3, 12):
+            # A profiler only sees the thread that enabled it, so each new thread enables its own.
+            # From 3.12 on a profiler sees every thread, and only one may be enabled at a time.
+            threading.setprofile(self._profile_thread)
+        self._profiles[0].enable()
+        self.logger.info(f"Profiling run into {self.output_dir}")
+        return self.output_dir
+
+    def stop(self) -> Optional[str]:
+        """
+        Stop profiling and write the profile and the summary.
+
+        Returns:
+            Optional[str]: Path of the summary file, or None if profiling was not active
+        """
+        if not self.active:
+            return None
+        self._profiles[0].disable()
+        threading.setprofile(None)
+        self._stats = self._merged_stats()
+        self._stats.dump_stats(os.path.join(self.output_dir, 'python.prof'))
+        summary_path = os.path.join(self.output_dir, 'summary.txt')
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(self.summary())
+        self.logger.info(f"Profiling summary written to {summary_path}")
+        self.output_dir = None
+        self._profiles = []
+        self._stats = None
+        return summary_path
+
+    def _profile_thread(self, frame, event, arg) -> None:
+        """Profile hook of threads started during the run: replaces itself by a profiler of the thread."""
+        import cProfile
+
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def _merged_stats(self):
+        """Statistics of all threads' profilers."""
+        import pstats
+
+        stats = pstats.Stats(self._profiles[0])
+        with self._lock:
+            profiles = self._profiles[1:]
+        for profile in profiles:
+            # A thread still running is profiled up to this point
+            profile.create_stats()
+            if profile.stats:
+                stats.add(profile)
+        return stats
+
+    def summary(self, limit: int = 25) -> str:
+        """Render the hottest functions and the slowest page operations."""
+        import pstats
+
+        out = io.StringIO()
+        out.write(f"Profiling summary for {self.output_dir}\n\n")
+
+        out.write(f"Slowest page operations (top {limit}):\n")
+        for timing in sorted(self.operations, key=lambda t: t.seconds, reverse=True)[:limit]:
+            out.write(f"  {timing.seconds:10.3f} s  {timing.name:<20} {timing.detail}\n")
+
+        out.write("\nPage operations by name:\n")
+        totals = {}
+        for timing in self.operations:
+            count, total, longest = totals.get(timing.name, (0, 0.0, 0.0))
+            totals[timing.name] = (count + 1, total + timing.seconds, max(longest, timing.seconds))
+        for name, (count, total, longest) in sorted(totals.items(), key=lambda item: item[1][1], reverse=True):
+            out.write(f"  {name:<20} count {count:5d}   total {total:10.3f} s   max {longest:10.3f} s\n")
+
+        out.write(f"\nHottest Python functions by own time (top {limit}):\n")
+        stats = self._stats
+        stats.stream = out
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(limit)
+        return out.getvalue()
+
+    @contextmanager
+    def operation(self, name: str, detail: str = '') -> Iterator[None]:
+        """
+        Time a page operation such as navigation or scrolling.
+
+        Args:
+            name (str): Operation name, e.g. 'goto'
+            detail (str, optional): Extra context, e.g. the URL. Defaults to ''.
+        """
+        if not self.active:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.operations.append(OperationTiming(name, detail, time.perf_counter() - start))
+
+    @contextmanager
+    def trace(self, context, name: str) -> Iterator[None]:
+        """
+        Record a Playwright trace of a browser context for the duration of the block.
+
+        Args:
+            context: Playwright BrowserContext
+            name (str): Name used in the trace file name, e.g. 'browser' or 'downloader'
+        """
+        if not self.active:
+            yield
+            return
+        with self._lock:
+            self._trace_count += 1
+            path = os.path.join(self.output_dir, f'trace-{self._trace_count:03d}-{name}.zip')
+        context.tracing.start(screenshots=True, snapshots=True, sources=False)
+        try:
+            yield
+        finally:
+            try:
+                context.tracing.stop(path=path)
+            except Exception as e:
+                self.logger.warning(f"Failed to save Playwright trace {path}: {e}")
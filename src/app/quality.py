@@ -0,0 +1,197 @@
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional
+
+from .logger import Logger
+from .settings import Settings
+
+QUALITY_MAX_RESOLUTION = 'max-resolution'
+QUALITY_MAX_BYTES = 'max-bytes'
+QUALITY_BANDWIDTH = 'bandwidth'
+QUALITY_STRATEGIES = [QUALITY_MAX_RESOLUTION, QUALITY_MAX_BYTES, QUALITY_BANDWIDTH]
+
+if TYPE_CHECKING:
+    from .http_client import HttpClient
+
+_HEIGHT_PATTERN = re.compile(r'(\d{3,4})\s*p', re.IGNORECASE)
+_CONTENT_RANGE_PATTERN = re.compile(r'/\s*(\d+)\s*$')
+
+
+class QualityError(Exception):
+    """Raised when no video variant satisfies the quality strategy"""
+    pass
+
+
+@dataclass
+class VideoVariant:
+    """
+    A single downloadable rendition of a video, as offered by the download panel.
+    """
+    index: int
+    url: str
+    label: str = ''
+    size: Optional[int] = None
+
+    @property
+    def height(self) -> Optional[int]:
+        """Vertical resolution parsed from the label (e.g. "720p"), if any."""
+        match = _HEIGHT_PATTERN.search(self.label or '')
+        return int(match.group(1)) if match else None
+
+    def rank(self):
+        """Sort key: resolution first, then panel order (the panel lists renditions from low to high)."""
+        return (self.height or 0, self.index)
+
+
+class SizeProbe:
+    """
+    Estimates the size of a remote file without downloading it.
+
+    Uses a HEAD request first and falls back to a single-byte Range request when the
+    server does not report a Content-Length for HEAD.
+    """
+
+    def __init__(self, http_client: Optional['HttpClient'] = None, logger: Optional[Logger] = None):
+        """
+        Initialize SizeProbe.
+
+        Args:
+            http_client (Optional[HttpClient], optional): Client used for probing. Defaults to a new HttpClient.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+        """
+        self._http_client = http_client
+        self.logger = logger or Logger()
+
+    @property
+    def http_client(self) -> 'HttpClient':
+        """HTTP client used for probing, created on first use."""
+        if self._http_client is None:
+            from .http_client import HttpClient
+            self._http_client = HttpClient()
+        return self._http_client
+
+    def probe(self, url: str) -> Optional[int]:
+        """
+        Return the size of the resource in bytes, or None if it cannot be determined.
+
+        Args:
+            url (str): URL of the resource.
+
+        Returns:
+            Optional[int]: Size in bytes.
+        """
+        try:
+            response = self.http_client.head(url)
+            length = response.header('content-length')
+            if response.status == 200 and length and length.isdigit() and int(length) > 0:
+                return int(length)
+
+            response = self.http_client.get(url, headers={'Range': 'bytes=0-0'})
+            if response.status == 206:
+                match = _CONTENT_RANGE_PATTERN.search(response.header('content-range') or '')
+                if match:
+                    return int(match.group(1))
+            length = response.header('content-length')
+            if response.status == 200 and length and length.isdigit():
+                return int(length)
+        except (OSError, RuntimeError) as e:
+            self.logger.warning(f"Failed to probe size of {url}: {e}")
+        return None
+
+
+class QualityStrategy:
+    """
+    Chooses which video variant to download.
+
+    Supported strategies:
+        max-resolution: the highest resolution variant.
+        max-bytes: the highest resolution variant not larger than ``max_bytes``.
+        bandwidth: the highest resolution variant that can be transferred within
+            ``max_transfer_sec`` at ``bandwidth_bytes_per_sec``.
+    """
+
+    def __init__(
+        self,
+        name: str = QUALITY_MAX_RESOLUTION,
+        max_bytes: Optional[int] = None,
+        bandwidth_bytes_per_sec: Optional[int] = None,
+        max_transfer_sec: Optional[int] = None
+    ):
+        """
+        Initialize QualityStrategy.
+
+        Args:
+            name (str, optional): One of QUALITY_STRATEGIES. Defaults to 'max-resolution'.
+            max_bytes (Optional[int], optional): Size limit per video for 'max-bytes'.
+            bandwidth_bytes_per_sec (Optional[int], optional): Expected link throughput for 'bandwidth'.
+            max_transfer_sec (Optional[int], optional): Time budget per video for 'bandwidth'.
+
+        Raises:
+            ValueError: If the strategy name is unknown or its limits are missing.
+        """
+        if name not in QUALITY_STRATEGIES:
+            raise ValueError(f"Unknown quality strategy: {name}. Expected one of {QUALITY_STRATEGIES}")
+        if name == QUALITY_MAX_BYTES and not max_bytes:
+            raise ValueError("Quality strategy 'max-bytes' requires a maximum number of bytes per video")
+        if name == QUALITY_BANDWIDTH and not (bandwidth_bytes_per_sec and max_transfer_sec):
+            raise ValueError("Quality strategy 'bandwidth' requires bandwidth and maximum transfer time")
+        self.name = name
+        self.max_bytes = max_bytes
+        self.bandwidth_bytes_per_sec = bandwidth_bytes_per_sec
+        self.max_transfer_sec = max_transfer_sec
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'QualityStrategy':
+        """Create the strategy configured in settings."""
+        return cls(
+            name=settings.quality_strategy,
+            max_bytes=settings.max_bytes_per_video,
+            bandwidth_bytes_per_sec=settings.bandwidth_bytes_per_sec,
+            max_transfer_sec=settings.max_transfer_sec
+        )
+
+    @property
+    def needs_sizes(self) -> bool:
+        """Whether variant sizes must be probed before selecting."""
+        return self.name != QUALITY_MAX_RESOLUTION
+
+    @property
+    def byte_limit(self) -> Optional[int]:
+        """Largest acceptable variant size in bytes, if the strategy has one."""
+        if self.name == QUALITY_MAX_BYTES:
+            return self.max_bytes
+        if self.name == QUALITY_BANDWIDTH:
+            return self.bandwidth_bytes_per_sec * self.max_transfer_sec
+        return None
+
+    def select(self, variants: List[VideoVariant]) -> VideoVariant:
+        """
+        Select the variant to download.
+
+        Variants of unknown size are only considered when no variant of known size fits.
+
+        Args:
+            variants (List[VideoVariant]): Available variants, with sizes if probed.
+
+        Returns:
+            VideoVariant: The chosen variant.
+
+        Raises:
+            QualityError: If there are no variants or none fits the byte limit.
+        """
+        if not variants:
+            raise QualityError("No video variants available")
+        ranked = sorted(variants, key=VideoVariant.rank)
+        limit = self.byte_limit
+        if limit is None:
+            return ranked[-1]
+
+        fitting = [variant for variant in ranked if variant.size is not None and variant.size <= limit]
+        if fitting:
+            return fitting[-1]
+        unknown = [variant for variant in ranked if variant.size is None]
+        if unknown:
+            # Sizes could not be estimated; the smallest rendition is the safest bet
+            return unknown[0]
+        smallest = min(variant.size for variant in ranked)
+        raise QualityError(f"Smallest variant ({smallest} bytes) exceeds the limit of {limit} bytes")
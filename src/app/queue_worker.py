@@ -0,0 +1,157 @@
+import os
+import socket
+import threading
+import time
+from typing import Callable, List, Optional
+
+from .downloader import Downloader
+from .extractor import Extractor, VideoDTO
+from .logger import Logger
+from .settings import Settings
+from .work_queue import JOB_DOWNLOAD, JOB_EXTRACT, Job, WorkQueue
+
+
+def default_worker_id() -> str:
+    """Worker identity unique across hosts sharing a queue: host name and process id."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class QueueWorker:
+    """
+    Processes extraction and download jobs from a shared WorkQueue.
+
+    Extraction jobs list the videos of a VK page and enqueue one download job per video. They
+    run again on every run, so videos added to a channel since are found, while download jobs
+    stay unique, so no video is downloaded twice.
+    Download jobs download a single video, within the downloader's run budget: once it is
+    exhausted, the worker leaves the remaining jobs in the queue and stops. Several workers,
+    in one or more processes or hosts, can run against the same queue; each job is processed
+    by one worker at a time, and a download is cancelled if its worker loses the lease.
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        extractor: Extractor,
+        downloader: Downloader,
+        logger: Logger,
+        settings: Settings,
+        is_skipped: Callable[[VideoDTO], bool] = lambda video: False,
+        worker_id: Optional[str] = None
+    ):
+        """
+        Initialize QueueWorker.
+
+        Args:
+            queue (WorkQueue): Shared job queue
+            extractor (Extractor): Video link extractor
+            downloader (Downloader): Video downloader
+            logger (Logger): Logging utility
+            settings (Settings): Application settings
+            is_skipped (Callable[[VideoDTO], bool], optional): Skiplist predicate. Defaults to skipping nothing.
+            worker_id (Optional[str], optional): Worker identity. Defaults to host name and process id.
+        """
+        self.queue = queue
+        self.extractor = extractor
+        self.downloader = downloader
+        self.logger = logger
+        self.settings = settings
+        self.is_skipped = is_skipped
+        self.worker_id = worker_id or default_worker_id()
+        self.processed: List[Job] = []
+
+    def enqueue_pages(self, urls: List[str], destination: str) -> None:
+        """
+        Enqueue extraction jobs for VK video pages; pages an earlier run already listed are listed again.
+
+        Args:
+            urls (List[str]): VK video page URLs
+            destination (str): Destination folder for the downloaded videos
+        """
+        for url in urls:
+            if self.queue.rearm(JOB_EXTRACT, url, {'destination': destination}):
+                self.logger.info(f"Queued extraction of {url}")
+
+    def run(self, wait_for_others: bool = True) -> int:
+        """
+        Claim and process jobs until the queue is drained.
+
+        Args:
+            wait_for_others (bool, optional): Keep polling while other workers hold leases,
+                since their extraction jobs may still produce downloads. Defaults to True.
+
+        Returns:
+            int: Number of jobs processed by this worker
+        """
+        count = 0
+        budget = self.downloader.budget
+        while True:
+            if budget.exhausted:
+                self.logger.info(f"Worker {self.worker_id} stops claiming jobs: {budget.exhausted_reason()}")
+                break
+            job = self.queue.claim(self.worker_id)
+            if job is None:
+                if not wait_for_others or self.queue.is_drained():
+                    break
+                time.sleep(self.settings.queue_poll_sec)
+                continue
+            self.process(job)
+            count += 1
+        self.logger.info(f"Worker {self.worker_id} processed {count} jobs; queue: {self.queue.counts()}")
+        return count
+
+    def process(self, job: Job) -> None:
+        """
+        Process one claimed job while keeping its lease renewed.
+
+        Args:
+            job (Job): Claimed job
+        """
+        keeper = None
+        started = True
+        try:
+            with self.queue.lease(job, self.worker_id) as keeper:
+                if job.kind == JOB_EXTRACT:
+                    self._extract(job)
+                elif job.kind == JOB_DOWNLOAD:
+                    started = self._download(job, keeper.cancelled)
+                else:
+                    raise ValueError(f"Unknown job kind: {job.kind}")
+        except Exception as e:
+            if keeper is not None and keeper.lost:
+                self.logger.warning(f"Job {job.kind}:{job.key} was reclaimed by another worker: {e}")
+                return
+            self.logger.error(f"Job {job.kind}:{job.key} failed (attempt {job.attempts}): {e}")
+            self.queue.fail(job, self.worker_id, str(e))
+            return
+
+        if not started:
+            # Deferred by the run budget; another worker or a later run downloads it
+            self.queue.release(job, self.worker_id)
+            return
+        if keeper.lost or not self.queue.complete(job, self.worker_id):
+            self.logger.warning(f"Job {job.kind}:{job.key} was reclaimed by another worker")
+            return
+        self.processed.append(job)
+
+    def _extract(self, job: Job) -> None:
+        destination = job.payload.get('destination')
+        cached = self.extractor.load_cached_links(job.key)
+        if cached is None:
+            videos = self.extractor.extract_video_links_cached(job.key)
+        else:
+            # Other workers start on the cached videos while the page is listed again for new ones
+            self._enqueue_downloads(cached, destination)
+            videos = self.extractor.extract_video_links(job.key)
+        self._enqueue_downloads(videos, destination)
+
+    def _enqueue_downloads(self, videos: List[VideoDTO], destination: Optional[str]) -> None:
+        for video in videos:
+            if self.is_skipped(video):
+                self.logger.info(f'Skipped video: {video.title}')
+                continue
+            self.queue.enqueue(JOB_DOWNLOAD, video.url, {'title': video.title, 'destination': destination})
+
+    def _download(self, job: Job, cancelled: threading.Event) -> bool:
+        video = VideoDTO(job.key, job.payload['title'])
+        return self.downloader.download_admitted(video, job.payload.get('destination'), cancelled=cancelled)
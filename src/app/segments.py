@@ -0,0 +1,596 @@
+import json
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from .concurrency import ThrottledError
+from .logger import Logger
+from .media_resolver import MediaExpiredError, check_expired
+from .quality import QualityError, QualityStrategy, VideoVariant
+from .settings import Settings
+
+if TYPE_CHECKING:
+    from .http_client import HttpClient
+    from .media_resolver import MediaStream
+
+CONTAINER_TS = 'ts'
+CONTAINER_MP4 = 'mp4'
+
+_ATTRIBUTE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+_TEMPLATE_FIELD = re.compile(r'\$(RepresentationID|Number|Bandwidth|Time)(?:%0(\d+)d)?\$')
+_CONTENT_RANGE_TOTAL = re.compile(r'/\s*(\d+)\s*$')
+_ISO_DURATION = re.compile(r'PT(?:(\d+(?:\.\d+)?)H)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)S)?')
+
+
+class SegmentError(Exception):
+    """Raised for manifests the segment downloader cannot assemble, e.g. encrypted HLS"""
+    pass
+
+
+class _HttpStatusError(OSError):
+    """A request answered with a client error; retrying does not help"""
+    pass
+
+
+@dataclass
+class Segment:
+    """
+    One media segment: a URL and, for byte-range addressing, (offset, length).
+    """
+    url: str
+    byte_range: Optional[Tuple[int, int]] = None
+
+
+@dataclass
+class SegmentPlaylist:
+    """
+    The segments of one track, in playback order; ``init`` is the fMP4 initialization segment.
+
+    ``single_file`` marks a DASH representation stored as one file (SegmentBase or a bare BaseURL),
+    whose only segment is split into byte ranges once its size is known.
+    """
+    source: str
+    segments: List[Segment]
+    init: Optional[Segment] = None
+    container: str = CONTAINER_TS
+    name: str = 'video'
+    single_file: bool = False
+
+    @property
+    def items(self) -> List[Segment]:
+        """Segments in the order they are written, initialization segment first."""
+        return ([self.init] if self.init else []) + self.segments
+
+    @property
+    def key(self) -> str:
+        """Identity of the playlist for resuming; the query string holds expiring signatures."""
+        parts = urlsplit(self.source)
+        return f'{parts.netloc}{parts.path}#{self.name}:{len(self.items)}'
+
+
+def _byte_range(value: str, previous_end: int) -> Tuple[int, int]:
+    length, _, offset = value.partition('@')
+    return (int(offset) if offset else previous_end), int(length)
+
+
+def parse_hls_media(text: str, base_url: str) -> SegmentPlaylist:
+    """
+    Parse an HLS media playlist.
+
+    Args:
+        text (str): Playlist text
+        base_url (str): Playlist URL, for relative segment URIs
+
+    Returns:
+        SegmentPlaylist: The playlist's segments
+
+    Raises:
+        SegmentError: If the playlist is a master playlist or its segments are encrypted
+    """
+    segments = []
+    init = None
+    byte_range = None
+    ends: Dict[str, int] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-STREAM-INF'):
+            raise SegmentError(f"{base_url} is a master playlist")
+        if line.startswith('#EXT-X-KEY:'):
+            attributes = dict(_ATTRIBUTE.findall(line.split(':', 1)[1]))
+            if attributes.get('METHOD', 'NONE') != 'NONE':
+                raise SegmentError(f"{base_url} is encrypted ({attributes['METHOD']})")
+        elif line.startswith('#EXT-X-MAP:'):
+            attributes = {name: value.strip('"') for name, value in _ATTRIBUTE.findall(line.split(':', 1)[1])}
+            map_range = _byte_range(attributes['BYTERANGE'], 0) if 'BYTERANGE' in attributes else None
+            init = Segment(urljoin(base_url, attributes['URI']), map_range)
+        elif line.startswith('#EXT-X-BYTERANGE:'):
+            byte_range = line.split(':', 1)[1]
+        elif line and not line.startswith('#'):
+            url = urljoin(base_url, line)
+            segment = Segment(url)
+            if byte_range is not None:
+                segment.byte_range = _byte_range(byte_range, ends.get(url, 0))
+                ends[url] = sum(segment.byte_range)
+                byte_range = None
+            segments.append(segment)
+    if not segments:
+        raise SegmentError(f"{base_url} lists no segments")
+    fragmented = init is not None or urlsplit(segments[0].url).path.endswith(('.m4s', '.mp4'))
+    return SegmentPlaylist(base_url, segments, init, CONTAINER_MP4 if fragmented else CONTAINER_TS)
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _child(element, name: str):
+    return next((child for child in element if _local(child.tag) == name), None)
+
+
+def _children(element, name: str) -> list:
+    return [child for child in element if _local(child.tag) == name]
+
+
+def _inherited(name: str, *elements):
+    """Return the first of the elements' children with the name; Elements without children are falsy, so no `or`."""
+    for element in elements:
+        child = _child(element, name)
+        if child is not None:
+            return child
+    return None
+
+
+def _base(element, base_url: str) -> str:
+    base = _child(element, 'BaseURL')
+    return urljoin(base_url, base.text.strip()) if base is not None and base.text else base_url
+
+
+def _seconds(duration: Optional[str]) -> float:
+    match = _ISO_DURATION.fullmatch(duration or '')
+    if not match:
+        return 0.0
+    hours, minutes, seconds = (float(value or 0) for value in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _fill(template: str, representation, number: int = 0, time_value: int = 0) -> str:
+    values = {
+        'RepresentationID': representation.get('id', ''),
+        'Bandwidth': representation.get('bandwidth', ''),
+        'Number': number,
+        'Time': time_value,
+    }
+
+    def replace(match) -> str:
+        value = values[match.group(1)]
+        return str(value).zfill(int(match.group(2))) if match.group(2) else str(value)
+
+    return _TEMPLATE_FIELD.sub(replace, template.replace('$$', '$'))
+
+
+def _template_segments(template, representation, base_url: str, period_seconds: float) -> Tuple[Optional[Segment], List[Segment]]:
+    init = template.get('initialization')
+    init_segment = Segment(urljoin(base_url, _fill(init, representation))) if init else None
+    media = template.get('media')
+    number = int(template.get('startNumber', '1'))
+    segments = []
+    timeline = _child(template, 'SegmentTimeline')
+    if timeline is not None:
+        time_value = 0
+        for entry in _children(timeline, 'S'):
+            time_value = int(entry.get('t', time_value))
+            duration = int(entry.get('d'))
+            for _ in range(int(entry.get('r', '0')) + 1):
+                segments.append(Segment(urljoin(base_url, _fill(media, representation, number, time_value))))
+                number += 1
+                time_value += duration
+    else:
+        duration = int(template.get('duration', '0')) / int(template.get('timescale', '1'))
+        if not duration or not period_seconds:
+            raise SegmentError("DASH SegmentTemplate without a timeline needs a duration and the presentation length")
+        count = int(-(-period_seconds // duration))
+        segments = [Segment(urljoin(base_url, _fill(media, representation, number + i))) for i in range(count)]
+    return init_segment, segments
+
+
+def _list_segments(segment_list, base_url: str) -> Tuple[Optional[Segment], List[Segment]]:
+    def ranged(url: Optional[str], media_range: Optional[str]) -> Segment:
+        byte_range = None
+        if media_range:
+            first, last = (int(value) for value in media_range.split('-'))
+            byte_range = (first, last - first + 1)
+        return Segment(urljoin(base_url, url or ''), byte_range)
+
+    initialization = _child(segment_list, 'Initialization')
+    init = ranged(initialization.get('sourceURL'), initialization.get('range')) if initialization is not None else None
+    segments = [ranged(entry.get('media'), entry.get('mediaRange')) for entry in _children(segment_list, 'SegmentURL')]
+    return init, segments
+
+
+def choose_rendition(
+    candidates: List[Tuple[Optional[int], Optional[int], Any]],
+    height: Optional[int] = None,
+    strategy: Optional[QualityStrategy] = None,
+    seconds: float = 0.0
+) -> Any:
+    """
+    Pick a rendition of a manifest with a quality strategy.
+
+    Args:
+        candidates (List[Tuple[Optional[int], Optional[int], Any]]): (height, bandwidth, rendition) triples
+        height (Optional[int], optional): Height the resolver already chose; only renditions of that
+            height are considered if there are any. Defaults to None.
+        strategy (Optional[QualityStrategy], optional): Strategy to apply. Defaults to the highest resolution.
+        seconds (float, optional): Presentation length, to estimate sizes from bandwidths. Defaults to 0.
+
+    Returns:
+        Any: The chosen rendition
+    """
+    if height is not None:
+        candidates = [candidate for candidate in candidates if candidate[0] == height] or candidates
+    ordered = sorted(candidates, key=lambda candidate: (candidate[0] or 0, candidate[1] or 0))
+    variants = [
+        VideoVariant(index, '', f'{rendition_height}p' if rendition_height else '',
+                     size=int(bandwidth * seconds / 8) if bandwidth and seconds else None)
+        for index, (rendition_height, bandwidth, _) in enumerate(ordered)
+    ]
+    try:
+        return ordered[(strategy or QualityStrategy()).select(variants).index][2]
+    except QualityError:
+        # The resolver accepted the stream; its smallest rendition comes closest to the limit
+        return ordered[0][2]
+
+
+def parse_dash(
+    text: str,
+    base_url: str,
+    height: Optional[int] = None,
+    strategy: Optional[QualityStrategy] = None
+) -> List[SegmentPlaylist]:
+    """
+    Parse a DASH manifest into the tracks to download: the video representation the quality
+    strategy picks and, when audio is a separate adaptation set, the highest audio representation.
+
+    Args:
+        text (str): MPD document
+        base_url (str): Manifest URL, for relative segment URLs
+        height (Optional[int], optional): Video height the resolver chose. Defaults to None.
+        strategy (Optional[QualityStrategy], optional): Quality strategy. Defaults to the highest resolution.
+
+    Returns:
+        List[SegmentPlaylist]: The video track, then the audio track if there is one
+
+    Raises:
+        SegmentError: If the manifest has no video representation or uses unsupported addressing
+    """
+    try:
+        mpd = ElementTree.fromstring(text)
+    except ElementTree.ParseError as e:
+        raise SegmentError(f"Invalid DASH manifest {base_url}: {e}")
+    mpd_base = _base(mpd, base_url)
+    period = _child(mpd, 'Period')
+    if period is None:
+        raise SegmentError(f"{base_url} has no Period")
+    period_seconds = _seconds(period.get('duration') or mpd.get('mediaPresentationDuration'))
+    period_base = _base(period, mpd_base)
+
+    candidates: Dict[str, list] = {'video': [], 'audio': []}
+    for adaptation in _children(period, 'AdaptationSet'):
+        for representation in _children(adaptation, 'Representation'):
+            kind = (representation.get('mimeType') or adaptation.get('mimeType') or adaptation.get('contentType') or '').split('/')[0]
+            if kind in candidates:
+                rank = (int(representation.get('height') or 0) or None, int(representation.get('bandwidth') or 0) or None)
+                candidates[kind].append(rank + ((adaptation, representation),))
+    if not candidates['video']:
+        raise SegmentError(f"{base_url} has no video representation")
+    chosen = {'video': choose_rendition(candidates['video'], height, strategy, period_seconds)}
+    if candidates['audio']:
+        chosen['audio'] = choose_rendition(candidates['audio'])
+
+    playlists = []
+    for kind, (adaptation, representation) in chosen.items():
+        representation_base = _base(representation, _base(adaptation, period_base))
+        template = _inherited('SegmentTemplate', representation, adaptation)
+        segment_list = _inherited('SegmentList', representation, adaptation)
+        if template is not None:
+            init, segments = _template_segments(template, representation, representation_base, period_seconds)
+        elif segment_list is not None:
+            init, segments = _list_segments(segment_list, representation_base)
+        else:
+            # SegmentBase or a bare BaseURL: the representation is one file, fetched in byte ranges
+            playlists.append(SegmentPlaylist(base_url, [Segment(representation_base)], None, CONTAINER_MP4, kind, single_file=True))
+            continue
+        playlists.append(SegmentPlaylist(base_url, segments, init, CONTAINER_MP4, name=kind))
+    return playlists
+
+
+@dataclass
+class _ResumeState:
+    """Progress of one track, saved next to its partial file after every written segment."""
+    key: str
+    written: int = 0
+    offset: int = 0
+    path: str = field(default='', repr=False)
+
+    @classmethod
+    def load(cls, path: str, key: str) -> '_ResumeState':
+        state_path = path + '.segments.json'
+        try:
+            with open(state_path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('key') == key and os.path.getsize(path) >= data['offset']:
+                return cls(key, data['written'], data['offset'], state_path)
+        except (OSError, ValueError, KeyError):
+            pass
+        return cls(key, path=state_path)
+
+    def save(self) -> None:
+        staging = self.path + '.tmp'
+        with open(staging, 'w', encoding='utf-8') as f:
+            json.dump({'key': self.key, 'written': self.written, 'offset': self.offset}, f)
+        os.replace(staging, self.path)
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SegmentDownloader:
+    """
+    Downloads segmented HLS/DASH streams without ffmpeg in the transfer path.
+
+    Segments are requested in parallel (``segment_workers``) over pooled keep-alive
+    connections and written strictly in order by the calling thread. At most
+    ``segment_buffer`` segments are in flight or waiting to be written, which bounds memory
+    however far ahead the fast requests get. After every written segment the track's
+    progress is saved next to its ``.part`` file, so an interrupted download resumes at the
+    first segment that was not written. MPEG-TS output and separate DASH audio are remuxed
+    into MP4 with ffmpeg once all segments are local.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None, http_client: Optional['HttpClient'] = None):
+        """
+        Initialize SegmentDownloader.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            http_client (Optional[HttpClient], optional): Client for manifests and segments. Defaults to a new
+                HttpClient pooling one connection per segment worker.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self._http_client = http_client
+
+    @property
+    def http_client(self) -> 'HttpClient':
+        if self._http_client is None:
+            from .http_client import HttpClient
+            self._http_client = HttpClient(self.settings, pool_size=self.settings.segment_workers)
+        return self._http_client
+
+    def load(
+        self,
+        stream: 'MediaStream',
+        headers: Optional[Dict[str, str]] = None,
+        http_client: Optional['HttpClient'] = None
+    ) -> List[SegmentPlaylist]:
+        """
+        Fetch and parse the manifest of a stream.
+
+        Of an HLS master playlist or a DASH manifest the rendition of the stream's height is
+        taken, picked with the quality strategy. A DASH representation stored as one file is
+        split into ``segment_range_mb`` byte ranges.
+
+        Args:
+            stream (MediaStream): HLS or DASH stream
+            headers (Optional[Dict[str, str]], optional): Request headers. Defaults to None.
+            http_client (Optional[HttpClient], optional): Client to use instead of the downloader's, e.g. an
+                egress route's. Defaults to None.
+
+        Returns:
+            List[SegmentPlaylist]: Tracks to download, video first
+
+        Raises:
+            SegmentError: If the manifest cannot be assembled from segments
+        """
+        from .media_resolver import MEDIA_HLS, parse_hls_master
+        text = self._get(stream.url, headers, http_client).decode('utf-8', errors='replace')
+        strategy = QualityStrategy.from_settings(self.settings)
+        if stream.kind != MEDIA_HLS:
+            playlists = parse_dash(text, stream.url, stream.height, strategy)
+            for playlist in playlists:
+                if playlist.single_file:
+                    self._split(playlist, headers, http_client)
+            return playlists
+        if '#EXT-X-STREAM-INF' in text:
+            variants = parse_hls_master(text, stream.url)
+            best = choose_rendition([(variant.height, variant.bandwidth, variant) for variant in variants], stream.height, strategy)
+            return [parse_hls_media(self._get(best.url, headers, http_client).decode('utf-8', errors='replace'), best.url)]
+        return [parse_hls_media(text, stream.url)]
+
+    def _split(self, playlist: SegmentPlaylist, headers: Optional[Dict[str, str]], http_client: Optional['HttpClient'] = None) -> None:
+        """Replace the single segment of a one-file representation by byte ranges, so it is never held in memory whole."""
+        url = playlist.segments[0].url
+        response = (http_client or self.http_client).get(url, headers={**(headers or {}), 'Range': 'bytes=0-0'})
+        if response.status == 429 or response.status >= 500:
+            raise ThrottledError(f"HTTP {response.status} for {url}", status=response.status)
+        check_expired(response.status, url)
+        match = _CONTENT_RANGE_TOTAL.search(response.header('content-range') or '')
+        if response.status != 206 or not match:
+            raise SegmentError(f"{url} is one file and its server does not answer byte ranges")
+        size = int(match.group(1))
+        step = max(1, self.settings.segment_range_mb) * 2**20
+        playlist.segments = [Segment(url, (offset, min(step, size - offset))) for offset in range(0, size, step)]
+
+    def download(
+        self,
+        stream: 'MediaStream',
+        path: str,
+        headers: Optional[Dict[str, str]] = None,
+        progress: Optional[Callable[[str], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        http_client: Optional['HttpClient'] = None
+    ) -> str:
+        """
+        Download a segmented stream to an MP4 file.
+
+        Args:
+            stream (MediaStream): HLS or DASH stream
+            path (str): Target file
+            headers (Optional[Dict[str, str]], optional): Request headers, e.g. Referer and User-Agent.
+            progress (Optional[Callable[[str], None]], optional): Called with progress text.
+            cancelled (Optional[threading.Event], optional): Aborts the transfer once set.
+            http_client (Optional[HttpClient], optional): Client to use instead of the downloader's. Defaults to None.
+
+        Returns:
+            str: Path of the downloaded file
+
+        Raises:
+            SegmentError: If the manifest cannot be assembled from segments
+            ThrottledError: If a segment keeps failing with HTTP 429 or 5xx
+            OSError: If a segment cannot be fetched
+        """
+        playlists = self.load(stream, headers, http_client)
+        if len(playlists) == 1 and playlists[0].container == CONTAINER_MP4:
+            self.fetch_track(playlists[0], path + '.part', headers, progress, cancelled, http_client)
+            os.replace(path + '.part', path)
+            return path
+
+        from .postprocess import run_ffmpeg
+        parts = []
+        for playlist in playlists:
+            part = f'{path}.{playlist.name}.{playlist.container}.part'
+            self.fetch_track(playlist, part, headers, progress, cancelled, http_client)
+            parts.append(part)
+        staging = path + '.part.mp4'
+        args = []
+        for part in parts:
+            args += ['-f', 'mpegts' if part.endswith('.ts.part') else 'mp4', '-i', part]
+        for index in range(len(parts)):
+            args += ['-map', str(index)]
+        try:
+            run_ffmpeg(self.settings, args + ['-c', 'copy', '-movflags', '+faststart', staging])
+            os.replace(staging, path)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+        for part in parts:
+            os.remove(part)
+        return path
+
+    def fetch_track(
+        self,
+        playlist: SegmentPlaylist,
+        path: str,
+        headers: Optional[Dict[str, str]] = None,
+        progress: Optional[Callable[[str], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        http_client: Optional['HttpClient'] = None
+    ) -> None:
+        """
+        Fetch the segments of a track in parallel and append them to a file in order.
+
+        Resumes after the last segment a previous attempt wrote to the same file.
+
+        Args:
+            playlist (SegmentPlaylist): Track to fetch
+            path (str): Partial file the segments are appended to
+            headers (Optional[Dict[str, str]], optional): Request headers. Defaults to None.
+            progress (Optional[Callable[[str], None]], optional): Called with progress text.
+            cancelled (Optional[threading.Event], optional): Aborts the transfer once set.
+            http_client (Optional[HttpClient], optional): Client to use instead of the downloader's. Defaults to None.
+        """
+        from .downloader import DownloadCancelled
+        items = playlist.items
+        state = _ResumeState.load(path, playlist.key)
+        if state.written:
+            self.logger.info(f"Resuming {os.path.basename(path)} at segment {state.written + 1} of {len(items)}")
+        buffer = max(1, self.settings.segment_buffer)
+        workers = max(1, min(self.settings.segment_workers, buffer))
+        upcoming = iter(range(state.written, len(items)))
+        pending: deque = deque()
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='vkvideo-segment')
+
+        def submit_next() -> None:
+            index = next(upcoming, None)
+            if index is not None:
+                pending.append(pool.submit(self._fetch, items[index], headers, cancelled, http_client))
+
+        try:
+            with open(path, 'r+b' if state.offset else 'wb') as f:
+                f.seek(state.offset)
+                f.truncate()
+                for _ in range(buffer):
+                    submit_next()
+                while pending:
+                    future: Future = pending.popleft()
+                    data = future.result()
+                    f.write(data)
+                    f.flush()
+                    state.written += 1
+                    state.offset += len(data)
+                    state.save()
+                    submit_next()
+                    if progress is not None:
+                        progress(f"{playlist.name} {state.written} of {len(items)} segments, {state.offset / 2**20:.1f} MB")
+                    if cancelled is not None and cancelled.is_set():
+                        raise DownloadCancelled(f"Download of {os.path.basename(path)} was cancelled")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        state.remove()
+
+    def _fetch(
+        self,
+        segment: Segment,
+        headers: Optional[Dict[str, str]],
+        cancelled: Optional[threading.Event],
+        http_client: Optional['HttpClient'] = None
+    ) -> bytes:
+        """Fetch one segment, retrying transient failures with exponential backoff."""
+        from .downloader import DownloadCancelled
+        request_headers = dict(headers or {})
+        if segment.byte_range:
+            offset, length = segment.byte_range
+            request_headers['Range'] = f'bytes={offset}-{offset + length - 1}'
+        attempts = max(1, self.settings.segment_retries)
+        for attempt in range(attempts):
+            if cancelled is not None and cancelled.is_set():
+                # Never hand back an empty segment: it would be written and recorded for resuming
+                raise DownloadCancelled(f"Fetch of {segment.url} was cancelled")
+            try:
+                body = self._get(segment.url, request_headers, http_client)
+            except (_HttpStatusError, MediaExpiredError):
+                raise
+            except (ThrottledError, OSError):
+                if attempt == attempts - 1:
+                    raise
+                delay = min(0.25 * 2 ** attempt, 4)
+                if cancelled is not None:
+                    # Wakes up as soon as the download is cancelled
+                    cancelled.wait(delay)
+                else:
+                    time.sleep(delay)
+                continue
+            if segment.byte_range and len(body) > segment.byte_range[1]:
+                # The server ignored the Range header and sent the whole resource
+                offset, length = segment.byte_range
+                body = body[offset:offset + length]
+            return body
+        raise AssertionError('unreachable')
+
+    def _get(self, url: str, headers: Optional[Dict[str, str]], http_client: Optional['HttpClient'] = None) -> bytes:
+        response = (http_client or self.http_client).get(url, headers=headers)
+        if response.status == 429 or response.status >= 500:
+            raise ThrottledError(f"HTTP {response.status} for {url}", status=response.status)
+        check_expired(response.status, url)
+        if response.status not in (200, 206):
+            raise _HttpStatusError(f"HTTP {response.status} for {url}")
+        return response.body
@@ -0,0 +1,226 @@
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Iterable, List, Optional, Pattern, Set, Tuple
+
+from .extractor import VideoDTO
+from .logger import Logger
+from .settings import Settings
+
+RULE_OWNER = 'owner:'
+RULE_TITLE = 'title:'
+
+_VIDEO_ID_PATTERN = re.compile(r'video(-?\d+)_(\d+)')
+
+
+def video_key(url: str) -> Optional[str]:
+    """
+    Return the '<owner>_<id>' key of a video URL or rule, e.g. '-180058315_456239188'.
+
+    Args:
+        url (str): Video URL, or a bare 'video-1_2' id
+
+    Returns:
+        Optional[str]: The key, or None if the text contains no video id
+    """
+    match = _VIDEO_ID_PATTERN.search(url)
+    return f'{match.group(1)}_{match.group(2)}' if match else None
+
+
+class Skiplist:
+    """
+    Decides which videos must not be downloaded.
+
+    Rules come from ``Settings.skiplist`` and from a text file (``skiplist_path``), one per line:
+
+        https://vkvideo.ru/video-180058315_456239188   skip one video (a bare video-1_2 works too)
+        owner:-180058315                               skip every video of an owner
+        title:^Trailer\\b                               skip videos whose title matches a regex
+
+    Lines starting with '#' are comments. Video and owner rules are kept in sets, and title
+    patterns are compiled into one case-insensitive alternation, so a check costs two set
+    lookups and one regex search however many rules there are. Patterns that would change
+    meaning or fail once joined (inline global flags like ``(?i)``, capture groups that
+    backreferences or other patterns could refer to) are searched on their own. The file is re-read when
+    it changes (checked at most every ``skiplist_reload_sec``); only the rules that were added
+    or removed are applied, and the title regex is recompiled only if title rules changed.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None, path: Optional[str] = None):
+        """
+        Initialize Skiplist.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            path (Optional[str], optional): Rules file. Defaults to settings.skiplist_path.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.path = os.path.expanduser(path or self.settings.skiplist_path)
+        self.video_keys: Set[str] = set()
+        self.owners: Set[str] = set()
+        self.title_patterns: List[str] = []
+        self.title_regex: Optional[Pattern] = None
+        # Title patterns that cannot be joined into title_regex
+        self.separate_title_regexes: List[Pattern] = []
+        # Ids from Settings.skiplist, which file changes never remove
+        self._builtin_keys: Set[str] = set()
+        # Rules read from the file, to apply later changes incrementally
+        self._file_rules: Set[str] = set()
+        # Number of file rules naming each video key and owner, as differently written rules can name the same one
+        self._key_rules: Counter = Counter()
+        self._owner_rules: Counter = Counter()
+        self._file_signature: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _add(self, rule: str) -> bool:
+        """Add one rule; returns True if it was a title rule."""
+        if rule.startswith(RULE_OWNER):
+            owner = rule[len(RULE_OWNER):].strip()
+            self._owner_rules[owner] += 1
+            self.owners.add(owner)
+        elif rule.startswith(RULE_TITLE):
+            pattern = rule[len(RULE_TITLE):].strip()
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                self.logger.warning(f"Ignoring invalid skiplist title pattern {pattern!r}: {e}")
+                return False
+            self.title_patterns.append(pattern)
+            return True
+        else:
+            key = video_key(rule)
+            if key is None:
+                self.logger.warning(f"Ignoring unrecognized skiplist rule {rule!r}")
+            else:
+                self._key_rules[key] += 1
+                self.video_keys.add(key)
+        return False
+
+    def _remove(self, rule: str) -> bool:
+        """Remove one rule; returns True if it was a title rule."""
+        if rule.startswith(RULE_OWNER):
+            owner = rule[len(RULE_OWNER):].strip()
+            self._owner_rules[owner] -= 1
+            if self._owner_rules[owner] <= 0:
+                del self._owner_rules[owner]
+                self.owners.discard(owner)
+        elif rule.startswith(RULE_TITLE):
+            pattern = rule[len(RULE_TITLE):].strip()
+            if pattern in self.title_patterns:
+                self.title_patterns.remove(pattern)
+                return True
+        else:
+            key = video_key(rule)
+            if key is not None:
+                self._key_rules[key] -= 1
+                if self._key_rules[key] <= 0:
+                    del self._key_rules[key]
+                    if key not in self._builtin_keys:
+                        self.video_keys.discard(key)
+        return False
+
+    def _compile_titles(self) -> None:
+        joined, separate = [], []
+        for pattern in self.title_patterns:
+            (joined if self._joinable(pattern) else separate).append(pattern)
+        self.title_regex = None
+        if joined:
+            try:
+                self.title_regex = re.compile('|'.join(f'(?:{p})' for p in joined), re.IGNORECASE)
+            except re.error as e:
+                self.logger.warning(f"Searching skiplist title patterns one by one: {e}")
+                separate = joined + separate
+        self.separate_title_regexes = [re.compile(p, re.IGNORECASE) for p in separate]
+
+    @staticmethod
+    def _joinable(pattern: str) -> bool:
+        """Whether a pattern keeps its meaning inside an alternation: no capture groups and no global flags."""
+        try:
+            return re.compile(pattern).groups == 0 and re.compile(f'(?:)|(?:{pattern})') is not None
+        except re.error:
+            return False
+
+    @staticmethod
+    def parse(lines: Iterable[str]) -> Set[str]:
+        """Return the rules of a rules file, without comments and blank lines."""
+        rules = set()
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                rules.add(line)
+        return rules
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> None:
+        self._builtin_keys = {key for key in map(video_key, self.settings.skiplist) if key}
+        self.video_keys.update(self._builtin_keys)
+        self._loaded = True
+        self._reload(initial=True)
+
+    def _reload(self, initial: bool = False) -> None:
+        signature = self._signature()
+        if signature == self._file_signature:
+            return
+        rules = set()
+        if signature is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                rules = self.parse(f)
+        added = rules - self._file_rules
+        removed = self._file_rules - rules
+        titles_changed = False
+        for rule in removed:
+            titles_changed |= self._remove(rule)
+        for rule in added:
+            titles_changed |= self._add(rule)
+        if titles_changed:
+            self._compile_titles()
+        self._file_rules = rules
+        self._file_signature = signature
+        if not initial:
+            self.logger.info(f"Reloaded skiplist {self.path}: {len(added)} rules added, {len(removed)} removed")
+
+    def maybe_reload(self) -> None:
+        """Load the rules on first use, and re-read the file if it changed since the last check."""
+        now = time.monotonic()
+        if self._loaded and now < self._next_check:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            elif now >= self._next_check:
+                self._reload()
+            self._next_check = now + self.settings.skiplist_reload_sec
+
+    def is_skipped(self, video: VideoDTO) -> bool:
+        """
+        Check whether a video must not be downloaded.
+
+        Args:
+            video (VideoDTO): Video to check
+
+        Returns:
+            bool: True if the video, its owner or its title is skiplisted
+        """
+        self.maybe_reload()
+        key = video_key(video.url)
+        if key is not None:
+            if key in self.video_keys or key.rsplit('_', 1)[0] in self.owners:
+                return True
+        if not video.title:
+            return False
+        title_regex = self.title_regex
+        if title_regex is not None and title_regex.search(video.title):
+            return True
+        return any(regex.search(video.title) for regex in self.separate_title_regexes)
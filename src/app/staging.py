@@ -0,0 +1,362 @@
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+from .logger import Logger
+from .settings import Settings
+
+STAGED = 'staged'
+MOVING = 'moving'
+STORED = 'stored'
+
+_MANIFEST_NAME = 'manifest.json'
+# Stored files listed in the manifest; older ones are dropped so that rewriting it stays cheap in long runs
+_STORED_KEPT = 200
+
+
+class StagingError(Exception):
+    """Raised when a download cannot be staged"""
+    pass
+
+
+@dataclass
+class StagedFile:
+    """
+    A downloaded file on its way from the scratch directory to its destination.
+
+    ``error`` says why a file is still staged after a move was attempted.
+    """
+    path: str
+    staged: str
+    size: int
+    state: str = STAGED
+    updated: float = 0.0
+    error: Optional[str] = None
+
+
+def free_bytes(path: str) -> int:
+    """Free space of the filesystem holding path, or of its nearest existing parent."""
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return shutil.disk_usage(path).free
+
+
+class StagingArea:
+    """
+    Lands downloads on a fast scratch directory and moves them to their destination in the background.
+
+    Writing multi-GB files straight to slow bulk storage (a NAS) holds the browser for the whole
+    copy. With ``staging_dir`` set, downloads are written there and handed to ``staging_movers``
+    mover threads, so the next download starts while earlier files are copied. A download reserves
+    its expected size on the scratch disk, or ``staging_min_free_mb`` when the size is unknown, and
+    only starts once the free space less the reservations of the downloads in flight covers it and
+    ``staging_min_free_mb``, waiting for moves and downloads in flight to make room; a file is only moved while ``staging_dest_min_free_mb`` stays free at its
+    destination, otherwise it is left staged. The state of each file (staged, moving, stored) is
+    kept in a manifest in the scratch directory; files a previous run left staged are moved by
+    resume().
+
+    Without ``staging_dir`` staging is disabled and downloads go straight to their destination.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        logger: Optional[Logger] = None,
+        on_stored: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Initialize StagingArea.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            on_stored (Optional[Callable[[str], None]], optional): Called from a mover thread with the final path
+                of each stored file. Defaults to None.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.on_stored = on_stored
+        self.files: Dict[str, StagedFile] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        # Bytes reserved by the downloads in flight, by staged path
+        self._reserved: Dict[str, int] = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._space = threading.Condition(self._lock)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether a scratch directory is configured."""
+        return bool(self.settings.staging_dir)
+
+    @property
+    def directory(self) -> str:
+        return os.path.expanduser(self.settings.staging_dir)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, _MANIFEST_NAME)
+
+    def path_for(self, path: str) -> str:
+        """
+        Return where the download of a file is staged.
+
+        Files are grouped by destination folder, so equal names in different folders don't collide.
+
+        Args:
+            path (str): Final path of the file
+
+        Returns:
+            str: Path in the scratch directory
+        """
+        folder = hashlib.md5(os.path.dirname(os.path.abspath(path)).encode()).hexdigest()[:12]
+        return os.path.join(self.directory, folder, os.path.basename(path))
+
+    def pending(self, path: str) -> Optional[StagedFile]:
+        """
+        Return the staged file that will be moved to a path, if it is not stored yet.
+
+        Args:
+            path (str): Final path of the file
+
+        Returns:
+            Optional[StagedFile]: The file while staged or moving, else None
+        """
+        with self._lock:
+            self._load()
+            staged = self.files.get(path)
+            return staged if staged is not None and staged.state != STORED else None
+
+    def size(self, path: str) -> Optional[int]:
+        """
+        Return the size of a file handed to the movers in this run, wherever it is now.
+
+        Args:
+            path (str): Final path of the file
+
+        Returns:
+            Optional[int]: Size in bytes, or None if the file was not staged
+        """
+        with self._lock:
+            staged = self.files.get(path)
+            return staged.size if staged is not None else None
+
+    def reserve(self, staged: str, expected_size: Optional[int] = None) -> None:
+        """
+        Wait until the scratch disk has room for another download, and reserve it until the download is submitted or released.
+
+        Args:
+            staged (str): Path the download is staged at
+            expected_size (Optional[int], optional): Size of the download, if known. Defaults to None,
+                which reserves staging_min_free_mb.
+
+        Raises:
+            StagingError: If the scratch disk is short of room and no move or download in flight can free it
+        """
+        minimum = self.settings.staging_min_free_mb * 2**20
+        size = expected_size or minimum
+        os.makedirs(self.directory, exist_ok=True)
+        with self._space:
+            while free_bytes(self.directory) - sum(self._reserved.values()) < max(size, minimum):
+                if not self._reserved and not any(not future.done() for future in self._futures.values()):
+                    free_mb = free_bytes(self.directory) // 2**20
+                    raise StagingError(
+                        f"Scratch directory {self.directory} has {free_mb} MB free, "
+                        f"below the {max(size, minimum) // 2**20} MB needed, and no file is being moved"
+                    )
+                # Woken when a move completes or a reservation is released; the timeout catches space freed by others
+                self._space.wait(1.0)
+            self._reserved[staged] = size
+
+    def release(self, staged: str) -> None:
+        """
+        Give back the room reserved for a download that was not submitted, e.g. because it failed.
+
+        Args:
+            staged (str): Path the download was staged at
+        """
+        with self._space:
+            if self._reserved.pop(staged, None) is not None:
+                self._space.notify_all()
+
+    def submit(self, staged: str, path: str) -> Future:
+        """
+        Queue a finished download to be moved to its destination.
+
+        Args:
+            staged (str): Downloaded file in the scratch directory
+            path (str): Final path of the file
+
+        Returns:
+            Future: Resolves to the final path once stored
+        """
+        entry = StagedFile(path, staged, os.path.getsize(staged))
+        with self._lock:
+            # The file now takes its room on disk instead of the reservation
+            self._reserved.pop(staged, None)
+            self._load()
+            self._set_state(entry, STAGED)
+            self.files[path] = entry
+            self._write_manifest()
+            return self._queue(entry)
+
+    def resume(self) -> int:
+        """
+        Queue the files a previous run left staged or interrupted while moving.
+
+        Returns:
+            int: Number of files queued
+        """
+        if not self.enabled:
+            return 0
+        with self._lock:
+            self._load()
+            leftovers = [entry for entry in self.files.values() if entry.state != STORED and entry.path not in self._futures]
+            for entry in leftovers:
+                self._queue(entry)
+        if leftovers:
+            self.logger.info(f"Moving {len(leftovers)} files left in staging by a previous run")
+        return len(leftovers)
+
+    def _queue(self, entry: StagedFile) -> Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, self.settings.staging_movers), thread_name_prefix='vkvideo-mover')
+        future = self._executor.submit(self._move, entry)
+        self._futures[entry.path] = future
+        future.add_done_callback(lambda done: self._forget(entry.path, done))
+        return future
+
+    def _forget(self, path: str, future: Future) -> None:
+        with self._lock:
+            if self._futures.get(path) is future:
+                del self._futures[path]
+
+    def _load(self) -> None:
+        # Files already stored belong to earlier runs and are dropped from the manifest
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.enabled or not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)['files']
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f"Ignoring unreadable staging manifest {self.manifest_path}: {e}")
+            return
+        for data in entries:
+            entry = StagedFile(**data)
+            if entry.state != STORED and os.path.exists(entry.staged):
+                entry.state = STAGED
+                self.files[entry.path] = entry
+
+    def _set_state(self, entry: StagedFile, state: str, error: Optional[str] = None) -> None:
+        entry.state = state
+        entry.error = error
+        entry.updated = round(time.time(), 3)
+
+    def _write_manifest(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        staging = self.manifest_path + '.tmp'
+        with open(staging, 'w', encoding='utf-8') as f:
+            json.dump({'files': [asdict(entry) for entry in self.files.values()]}, f, ensure_ascii=False, indent=1)
+        os.replace(staging, self.manifest_path)
+
+    def _update(self, entry: StagedFile, state: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._set_state(entry, state, error)
+            if state == STORED:
+                stored = [path for path, staged in self.files.items() if staged.state == STORED]
+                for path in stored[:-_STORED_KEPT]:
+                    del self.files[path]
+            self._write_manifest()
+
+    def _move(self, entry: StagedFile) -> str:
+        destination = os.path.dirname(entry.path) or '.'
+        try:
+            free = free_bytes(destination)
+            reserve = self.settings.staging_dest_min_free_mb * 2**20
+            if free - entry.size < reserve:
+                raise StagingError(
+                    f"{free // 2**20} MB free at {destination}, {entry.size // 2**20} MB needed "
+                    f"plus {self.settings.staging_dest_min_free_mb} MB kept free"
+                )
+            self._update(entry, MOVING)
+            started = time.monotonic()
+            os.makedirs(destination, exist_ok=True)
+            move_file(entry.staged, entry.path)
+        except Exception as e:
+            self._update(entry, STAGED, str(e) or type(e).__name__)
+            self.logger.warning(f"Leaving {entry.staged} staged: {e}")
+            raise
+        finally:
+            with self._space:
+                self._space.notify_all()
+        self._update(entry, STORED)
+        seconds = time.monotonic() - started
+        self.logger.info(f"Stored {os.path.basename(entry.path)} in {seconds:.1f}s ({entry.size / 2**20 / max(seconds, 1e-6):.1f} MiB/s)")
+        if self.on_stored is not None:
+            self.on_stored(entry.path)
+        return entry.path
+
+    def wait(self) -> List[StagedFile]:
+        """
+        Wait for all queued moves, shut the movers down and log how many files were stored.
+
+        Returns:
+            List[StagedFile]: Files still staged, e.g. for lack of space at their destination
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            futures, self._futures = self._futures, {}
+        if executor is None:
+            return []
+        for future in futures.values():
+            try:
+                future.result()
+            except Exception:
+                pass
+        executor.shutdown(wait=True)
+        with self._lock:
+            left = [entry for entry in self.files.values() if entry.state != STORED]
+            stored = [entry for entry in self.files.values() if entry.state == STORED]
+        self.logger.info(
+            f"Staging: {len(stored)} files ({sum(entry.size for entry in stored) / 2**20:.1f} MiB) stored, "
+            f"{len(left)} left in {self.directory}"
+        )
+        return left
+
+
+def move_file(source: str, target: str) -> None:
+    """
+    Move a file, copying it across filesystems so the target never shows a partial file.
+
+    Args:
+        source (str): File to move
+        target (str): Final path
+    """
+    try:
+        os.replace(source, target)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    partial = target + '.part'
+    try:
+        shutil.copyfile(source, partial)
+        os.replace(partial, target)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    os.remove(source)
@@ -0,0 +1,148 @@
+import codecs
+from html.parser import HTMLParser
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class _AnchorRecord:
+    __slots__ = ('href', 'parts', 'closed')
+
+    def __init__(self, href: str):
+        self.href = href
+        self.parts: List[str] = []
+        self.closed = False
+
+
+class VideoLinkParser(HTMLParser):
+    """
+    Event-based parser collecting ``<a href="/video-...">`` links and their text.
+
+    Produces the same (href, title) pairs as ``soup.find_all('a', href=re.compile('^/video-'))``
+    with ``get_text(strip=True)``, in document order, but never builds a tree: only the
+    anchors that are still open are kept in memory. Feed it chunks and drain ``pop_links``.
+    """
+
+    def __init__(self, href_prefix: str = '/video-'):
+        super().__init__(convert_charrefs=True)
+        self.href_prefix = href_prefix
+        # One entry per open <a>; None for anchors that are not video links
+        self._open: List[Optional[_AnchorRecord]] = []
+        # Video links in start-tag order that have not been emitted yet
+        self._pending: List[_AnchorRecord] = []
+        # Pieces of the current text node; the parser may report one node in several calls
+        self._text: List[str] = []
+
+    def _flush_text(self):
+        if not self._text:
+            return
+        text = ''.join(self._text).strip()
+        self._text = []
+        if not text:
+            return
+        for record in self._open:
+            if record is not None:
+                record.parts.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag != 'a':
+            return
+        href = dict(attrs).get('href') or ''
+        if href.startswith(self.href_prefix):
+            record = _AnchorRecord(href)
+            self._open.append(record)
+            self._pending.append(record)
+        else:
+            self._open.append(None)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag != 'a' or not self._open:
+            return
+        record = self._open.pop()
+        if record is not None:
+            record.closed = True
+
+    def handle_data(self, data):
+        if self._open:
+            self._text.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def pop_links(self, final: bool = False) -> List[Tuple[str, str]]:
+        """
+        Return the links completed so far, in document order.
+
+        Args:
+            final (bool, optional): Also return anchors left unclosed at the end of the document.
+
+        Returns:
+            List[Tuple[str, str]]: (href, title) pairs
+        """
+        if final:
+            self._flush_text()
+        done = 0
+        for record in self._pending:
+            if not (record.closed or final):
+                break
+            done += 1
+        links = [(record.href, ''.join(record.parts)) for record in self._pending[:done]]
+        del self._pending[:done]
+        return links
+
+
+def iter_video_links_from_chunks(chunks: Iterable[str], href_prefix: str = '/video-') -> Iterator[Tuple[str, str]]:
+    """
+    Parse HTML chunk by chunk and yield (href, title) of video links as soon as each anchor closes.
+
+    Args:
+        chunks (Iterable[str]): HTML text in pieces of any size
+        href_prefix (str, optional): Prefix of the hrefs to collect. Defaults to '/video-'.
+
+    Yields:
+        Tuple[str, str]: href and stripped anchor text
+    """
+    parser = VideoLinkParser(href_prefix)
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.pop_links()
+    parser.close()
+    yield from parser.pop_links(final=True)
+
+
+def iter_file_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, encoding: str = 'utf-8') -> Iterator[str]:
+    """
+    Read a text file in chunks, decoding incrementally so multi-byte characters split across reads stay intact.
+
+    Args:
+        path (str): File path
+        chunk_size (int, optional): Bytes per read. Defaults to 64 KiB.
+        encoding (str, optional): File encoding. Defaults to 'utf-8'.
+
+    Yields:
+        str: Decoded text chunks
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            text = decoder.decode(data)
+            if text:
+                yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
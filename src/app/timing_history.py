@@ -0,0 +1,177 @@
+import json
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .logger import Logger
+from .settings import Settings
+
+
+@dataclass
+class ChannelTimeouts:
+    """
+    Timeouts for loading one channel page.
+    """
+    url: str
+    load_timeout_sec: float
+    scroll_budget_sec: float
+    samples: int = 0
+    learned: bool = False
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Return the nearest-rank percentile of a list of values.
+
+    Args:
+        values (List[float]): Observed values, not empty
+        pct (float): Percentile between 0 and 100
+
+    Returns:
+        float: The smallest value with at least pct percent of the values at or below it
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class TimingHistory:
+    """
+    Per-channel history of page load and scroll durations, used to derive timeouts.
+
+    Each channel URL keeps its last ``timing_history_size`` observations in a JSON file. Once a
+    channel has ``timing_min_samples`` observations, its timeouts are the configured percentile
+    of the observed durations times ``timing_margin_factor`` plus ``timing_margin_sec``, capped
+    at ``timing_max_sec``; until then the global timeouts from Settings apply.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, logger: Optional[Logger] = None, path: Optional[str] = None):
+        """
+        Initialize TimingHistory.
+
+        Args:
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+            path (Optional[str], optional): History file. Defaults to settings.timing_history_path.
+        """
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self.path = os.path.expanduser(path or self.settings.timing_history_path)
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, List[Dict]]:
+        """
+        Read the history file.
+
+        Returns:
+            Dict[str, List[Dict]]: Observations by channel URL, oldest first
+        """
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable timing history {self.path}: {e}")
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def record(self, url: str, load_sec: float, scroll_sec: float, items: int) -> None:
+        """
+        Add an observation for a channel and persist it.
+
+        The file is re-read before writing and replaced atomically, so concurrent runs only
+        lose each other's observations, never corrupt the file.
+
+        Args:
+            url (str): Channel URL
+            load_sec (float): Time the page took to load
+            scroll_sec (float): Time from the start of the wait for lazily loaded items until the last new item appeared
+            items (int): Number of video links on the page
+        """
+        with self._lock:
+            history = self.load()
+            samples = history.setdefault(url, [])
+            samples.append({
+                'load_sec': round(load_sec, 3),
+                'scroll_sec': round(scroll_sec, 3),
+                'items': items,
+                'at': int(time.time()),
+            })
+            del samples[:-max(1, self.settings.timing_history_size)]
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            staging = f'{self.path}.{os.getpid()}.tmp'
+            with open(staging, 'w', encoding='utf-8') as f:
+                json.dump(history, f, indent=1)
+            os.replace(staging, self.path)
+
+    def _derive(self, samples: List[Dict], key: str) -> float:
+        observed = percentile([sample[key] for sample in samples], self.settings.timing_percentile)
+        derived = observed * self.settings.timing_margin_factor + self.settings.timing_margin_sec
+        return min(derived, self.settings.timing_max_sec)
+
+    def timeouts(self, url: str, history: Optional[Dict[str, List[Dict]]] = None) -> ChannelTimeouts:
+        """
+        Return the timeouts to use for a channel.
+
+        Args:
+            url (str): Channel URL
+            history (Optional[Dict[str, List[Dict]]], optional): Already loaded history. Defaults to reading the file.
+
+        Returns:
+            ChannelTimeouts: Learned timeouts, or the global ones if the channel has too few observations
+        """
+        samples = (self.load() if history is None else history).get(url, [])
+        if len(samples) < max(1, self.settings.timing_min_samples):
+            return ChannelTimeouts(
+                url,
+                load_timeout_sec=self.settings.timeout_browser_sec,
+                scroll_budget_sec=self.settings.timeout_browser_scroll_sec,
+                samples=len(samples)
+            )
+        return ChannelTimeouts(
+            url,
+            load_timeout_sec=self._derive(samples, 'load_sec'),
+            scroll_budget_sec=self._derive(samples, 'scroll_sec'),
+            samples=len(samples),
+            learned=True
+        )
+
+    def render_report(self, urls: Optional[List[str]] = None) -> str:
+        """
+        Render observed durations and derived timeouts per channel.
+
+        Args:
+            urls (Optional[List[str]], optional): Channels to report. Defaults to all channels in the history.
+
+        Returns:
+            str: Human-readable report
+        """
+        history = self.load()
+        urls = urls or sorted(history)
+        if not urls:
+            return f"No timing history in {self.path}"
+        pct = self.settings.timing_percentile
+        lines = [f"Timing history: {self.path} (p{pct:g} x {self.settings.timing_margin_factor:g} + {self.settings.timing_margin_sec:g}s)"]
+        for url in urls:
+            samples = history.get(url, [])
+            timeouts = self.timeouts(url, history)
+            source = 'learned' if timeouts.learned else 'default'
+            lines.append(url)
+            if samples:
+                lines.append(
+                    f"  samples {len(samples)}, items {samples[-1]['items']}, "
+                    f"load p{pct:g} {percentile([s['load_sec'] for s in samples], pct):.1f}s, "
+                    f"scroll p{pct:g} {percentile([s['scroll_sec'] for s in samples], pct):.1f}s"
+                )
+            else:
+                lines.append("  no samples")
+            lines.append(
+                f"  load timeout {timeouts.load_timeout_sec:.1f}s, scroll budget {timeouts.scroll_budget_sec:.1f}s ({source})"
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,308 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from .logger import Logger
+from .settings import Settings
+
+JOB_EXTRACT = 'extract'
+JOB_DOWNLOAD = 'download'
+
+STATE_PENDING = 'pending'
+STATE_LEASED = 'leased'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    UNIQUE (kind, key)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires);
+"""
+
+
+@dataclass
+class Job:
+    """
+    A unit of work claimed from the queue.
+    """
+    id: int
+    kind: str
+    key: str
+    payload: Dict = field(default_factory=dict)
+    attempts: int = 0
+
+
+class LeaseLostError(Exception):
+    """Raised when a worker no longer owns the lease of a job it is working on"""
+    pass
+
+
+class WorkQueue:
+    """
+    A persistent job queue in an SQLite database shared by several worker processes.
+
+    Workers claim jobs by lease: a claimed job belongs to its worker until the lease
+    expires, and the worker renews the lease while it is working. Jobs whose lease has
+    expired (e.g. because the worker crashed) can be claimed again by other workers.
+    Jobs are unique per (kind, key), so enqueueing the same work twice is a no-op; work that
+    has to be repeated on every run, such as listing a channel, is re-armed instead.
+
+    WAL journaling is used by default, which requires all workers to be on the same host.
+    For a queue on a network filesystem set ``queue_journal_mode`` to ``DELETE``.
+    """
+
+    def __init__(self, path: str, settings: Optional[Settings] = None, logger: Optional[Logger] = None):
+        """
+        Initialize WorkQueue, creating the database if needed.
+
+        Args:
+            path (str): Path to the SQLite database file.
+            settings (Optional[Settings], optional): Application settings. Defaults to a new Settings instance.
+            logger (Optional[Logger], optional): Logger. Defaults to a new Logger instance.
+        """
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.settings = settings or Settings()
+        self.logger = logger or Logger()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the calling thread; sqlite3 connections are not shared between threads."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.settings.queue_busy_timeout_sec, isolation_level=None)
+            connection.execute(f'PRAGMA journal_mode={self.settings.queue_journal_mode}')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in a write transaction that is taken immediately, so claims never race."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def enqueue(self, kind: str, key: str, payload: Optional[Dict] = None) -> bool:
+        """
+        Add a job unless a job with the same kind and key already exists.
+
+        Args:
+            kind (str): Job kind, e.g. JOB_EXTRACT or JOB_DOWNLOAD.
+            key (str): Identity of the job within its kind, e.g. the URL.
+            payload (Optional[Dict], optional): JSON-serializable job data. Defaults to None.
+
+        Returns:
+            bool: True if the job was added.
+        """
+        cursor = self._connection().execute(
+            'INSERT OR IGNORE INTO jobs (kind, key, payload) VALUES (?, ?, ?)',
+            (kind, key, json.dumps(payload or {}))
+        )
+        return cursor.rowcount == 1
+
+    def rearm(self, kind: str, key: str, payload: Optional[Dict] = None) -> bool:
+        """
+        Add a job, or make a finished (done or failed) one pending again with fresh attempts.
+
+        A pending or leased job is left alone, since it is still going to run.
+
+        Args:
+            kind (str): Job kind, e.g. JOB_EXTRACT.
+            key (str): Identity of the job within its kind, e.g. the URL.
+            payload (Optional[Dict], optional): JSON-serializable job data. Defaults to None.
+
+        Returns:
+            bool: True if the job was added or re-armed.
+        """
+        if self.enqueue(kind, key, payload):
+            return True
+        cursor = self._connection().execute(
+            'UPDATE jobs SET state = ?, owner = NULL, lease_expires = NULL, attempts = 0, error = NULL, payload = ? '
+            'WHERE kind = ? AND key = ? AND state IN (?, ?)',
+            (STATE_PENDING, json.dumps(payload or {}), kind, key, STATE_DONE, STATE_FAILED)
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, worker_id: str, kinds: Optional[List[str]] = None, lease_sec: Optional[float] = None) -> Optional[Job]:
+        """
+        Claim the oldest available job: a pending one or one whose lease has expired.
+
+        A job whose lease expired after settings.queue_max_attempts attempts is marked failed instead,
+        so that a job that kills its worker (e.g. out of memory) is not retried forever.
+
+        Args:
+            worker_id (str): Identity of the claiming worker.
+            kinds (Optional[List[str]], optional): Job kinds to consider. Defaults to all kinds.
+            lease_sec (Optional[float], optional): Lease duration. Defaults to settings.queue_lease_sec.
+
+        Returns:
+            Optional[Job]: The claimed job, or None if no job is available.
+        """
+        lease_sec = lease_sec or self.settings.queue_lease_sec
+        now = time.time()
+        query = ('SELECT id, kind, key, payload, attempts FROM jobs '
+                 'WHERE (state = ? OR (state = ? AND lease_expires < ?))')
+        params = [STATE_PENDING, STATE_LEASED, now]
+        if kinds:
+            query += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+            params += kinds
+        query += ' ORDER BY id LIMIT 1'
+
+        with self._transaction() as connection:
+            connection.execute(
+                'UPDATE jobs SET state = ?, lease_expires = NULL, error = ? '
+                'WHERE state = ? AND lease_expires < ? AND attempts >= ?',
+                (STATE_FAILED, 'Lease expired on the last attempt', STATE_LEASED, now, self.settings.queue_max_attempts)
+            )
+            row = connection.execute(query, params).fetchone()
+            if row is None:
+                return None
+            job_id, kind, key, payload, attempts = row
+            connection.execute(
+                'UPDATE jobs SET state = ?, owner = ?, lease_expires = ?, attempts = ? WHERE id = ?',
+                (STATE_LEASED, worker_id, now + lease_sec, attempts + 1, job_id)
+            )
+        return Job(id=job_id, kind=kind, key=key, payload=json.loads(payload), attempts=attempts + 1)
+
+    def renew(self, job: Job, worker_id: str, lease_sec: Optional[float] = None) -> bool:
+        """
+        Extend the lease of a job owned by the worker.
+
+        Returns:
+            bool: False if the worker no longer owns the job.
+        """
+        lease_sec = lease_sec or self.settings.queue_lease_sec
+        cursor = self._connection().execute(
+            'UPDATE jobs SET lease_expires = ? WHERE id = ? AND owner = ? AND state = ?',
+            (time.time() + lease_sec, job.id, worker_id, STATE_LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job: Job, worker_id: str) -> bool:
+        """
+        Mark a job owned by the worker as done.
+
+        Returns:
+            bool: False if the worker no longer owns the job.
+        """
+        cursor = self._connection().execute(
+            'UPDATE jobs SET state = ?, lease_expires = NULL WHERE id = ? AND owner = ? AND state = ?',
+            (STATE_DONE, job.id, worker_id, STATE_LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job: Job, worker_id: str, error: str) -> bool:
+        """
+        Release a failed job: it becomes pending again until it has used up settings.queue_max_attempts.
+
+        Returns:
+            bool: False if the worker no longer owns the job.
+        """
+        state = STATE_FAILED if job.attempts >= self.settings.queue_max_attempts else STATE_PENDING
+        cursor = self._connection().execute(
+            'UPDATE jobs SET state = ?, lease_expires = NULL, error = ? WHERE id = ? AND owner = ? AND state = ?',
+            (state, error, job.id, worker_id, STATE_LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, job: Job, worker_id: str) -> bool:
+        """
+        Put a job the worker did not start back to pending, without using up an attempt.
+
+        Returns:
+            bool: False if the worker no longer owns the job.
+        """
+        cursor = self._connection().execute(
+            'UPDATE jobs SET state = ?, owner = NULL, lease_expires = NULL, attempts = attempts - 1 '
+            'WHERE id = ? AND owner = ? AND state = ?',
+            (STATE_PENDING, job.id, worker_id, STATE_LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of jobs per state."""
+        rows = self._connection().execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        return {state: count for state, count in rows}
+
+    def is_drained(self) -> bool:
+        """Whether no job is pending or leased."""
+        counts = self.counts()
+        return counts.get(STATE_PENDING, 0) == 0 and counts.get(STATE_LEASED, 0) == 0
+
+    @contextmanager
+    def lease(self, job: Job, worker_id: str, lease_sec: Optional[float] = None) -> Iterator['LeaseKeeper']:
+        """
+        Keep the lease of a job renewed in a background thread while the block runs.
+
+        Yields:
+            LeaseKeeper: The keeper; its ``lost`` flag and ``cancelled`` event are set if renewal failed.
+        """
+        keeper = LeaseKeeper(self, job, worker_id, lease_sec or self.settings.queue_lease_sec)
+        keeper.start()
+        try:
+            yield keeper
+        finally:
+            keeper.stop()
+
+    def close(self) -> None:
+        """Close the connection of the calling thread."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class LeaseKeeper(threading.Thread):
+    """
+    Background thread renewing a job lease at a third of its duration.
+
+    ``cancelled`` is set once the lease is lost, so that work in progress stops before the
+    worker that reclaimed the job repeats it.
+    """
+
+    def __init__(self, queue: WorkQueue, job: Job, worker_id: str, lease_sec: float):
+        super().__init__(daemon=True, name=f'lease-{job.id}')
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self.lease_sec = lease_sec
+        self.lost = False
+        self.cancelled = threading.Event()
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(self.lease_sec / 3):
+                if not self.queue.renew(self.job, self.worker_id, self.lease_sec):
+                    self.lost = True
+                    self.cancelled.set()
+                    self.queue.logger.warning(f"Lost lease of job {self.job.kind}:{self.job.key}")
+                    return
+        finally:
+            self.queue.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
@@ -0,0 +1,82 @@
+"""
+Benchmark of browser cold start against connecting to a running browser server.
+
+Cold: start Playwright, launch Chromium, open a page on about:blank, close everything, as
+every vkvideo invocation did before the browser server. Warm: start a BrowserServer once,
+then per round start Playwright, connect over CDP, open a context and a page, and disconnect.
+
+Usage:
+    poetry run python -m src.tests.benchmarks.bench_browser_connect [--rounds N]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from ...app.browser_server import BrowserServer, available_endpoint
+from ...app.logger import Logger
+from ...app.settings import Settings
+
+
+def cold_start():
+    from playwright.sync_api import sync_playwright
+    start = time.perf_counter()
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.goto('about:blank')
+        ready = time.perf_counter() - start
+        browser.close()
+    return ready
+
+
+def warm_connect(endpoint):
+    from playwright.sync_api import sync_playwright
+    start = time.perf_counter()
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.connect_over_cdp(endpoint)
+        context = browser.new_context()
+        page = context.new_page()
+        page.goto('about:blank')
+        ready = time.perf_counter() - start
+        context.close()
+        browser.close()
+    return ready
+
+
+def report(name, samples):
+    print(f"{name:<14} median {statistics.median(samples) * 1000:8.0f} ms   "
+          f"min {min(samples) * 1000:8.0f} ms   max {max(samples) * 1000:8.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Browser cold start vs warm connect benchmark')
+    parser.add_argument('--rounds', type=int, default=5, help='Rounds per mode')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # A throwaway profile without the extension, so the benchmark needs no logged-in session
+        settings = Settings(
+            chromium_profile_dir=directory + '/profile',
+            extension_path=directory + '/no-extension',
+            browser_server_endpoint_path=directory + '/server.json',
+        )
+        cold = [cold_start() for _ in range(args.rounds)]
+
+        server = BrowserServer(settings, Logger())
+        start = time.perf_counter()
+        server.start()
+        server_start = time.perf_counter() - start
+        try:
+            endpoint = available_endpoint(settings)
+            warm = [warm_connect(endpoint) for _ in range(args.rounds)]
+        finally:
+            server.stop()
+
+    print(f"rounds {args.rounds}   browser server start {server_start * 1000:.0f} ms (paid once)")
+    report('cold start', cold)
+    report('warm connect', warm)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Offline benchmark of the download flow, replayed from HAR recordings.
+
+Record a set of videos once with the live site:
+    poetry run vkvideo url https://vkvideo.ru/@club180058315/all --har record -d /tmp/recorded
+
+Then replay every recording in har_dir through Downloader.download_video. Media bodies are
+the small stub written at record time, so the numbers measure page load, panel resolution
+and download orchestration rather than the network.
+
+Usage:
+    poetry run python -m src.tests.benchmarks.bench_download_replay [--har-dir DIR] [--rounds N]
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from ...app.downloader import Downloader
+from ...app.har import HAR_REPLAY
+from ...app.logger import Logger
+from ...app.settings import Settings
+
+
+def recorded_video_url(har_path):
+    """Return the URL of the first page document in a recording."""
+    with open(har_path, encoding='utf-8') as f:
+        entries = json.load(f)['log']['entries']
+    for entry in entries:
+        if entry['response'].get('content', {}).get('mimeType', '').startswith('text/html'):
+            return entry['request']['url']
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replayed download flow benchmark')
+    parser.add_argument('--har-dir', default=Settings.har_dir, help='Directory with HAR recordings')
+    parser.add_argument('--rounds', type=int, default=3, help='Number of passes over the recordings')
+    args = parser.parse_args()
+
+    settings = Settings(har_mode=HAR_REPLAY, har_dir=args.har_dir)
+    recordings = sorted(glob.glob(os.path.join(os.path.expanduser(args.har_dir), '*.har')))
+    urls = [url for url in map(recorded_video_url, recordings) if url]
+    if not urls:
+        raise SystemExit(f"No recordings in {args.har_dir}; record some with --har record first")
+
+    downloader = Downloader(logger=Logger(), settings=settings)
+    latencies = []
+    total_bytes = 0
+    started = time.perf_counter()
+    try:
+        for round_index in range(args.rounds):
+            with tempfile.TemporaryDirectory() as destination:
+                for index, url in enumerate(urls):
+                    begin = time.perf_counter()
+                    path = downloader.download_video(url, f'video-{index}', destination_folder=destination)
+                    latencies.append(time.perf_counter() - begin)
+                    if path is not None and os.path.exists(path):
+                        total_bytes += os.path.getsize(path)
+    finally:
+        downloader.close()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"recordings {len(urls)}   rounds {args.rounds}   downloads {len(latencies)}")
+    print(f"latency   p50 {statistics.median(latencies):6.2f} s   p95 {p95:6.2f} s   max {latencies[-1]:6.2f} s")
+    print(f"throughput {len(latencies) / elapsed * 60:6.1f} videos/min   {total_bytes / elapsed / 2**20:6.2f} MiB/s (stub bodies)")
+
+
+if __name__ == '__main__':
+    main()
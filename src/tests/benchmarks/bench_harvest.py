@@ -0,0 +1,109 @@
+"""
+Benchmark of link harvesting against the scroll-then-snapshot path on a synthetic endless feed.
+
+A local HTTP server serves a feed that appends a batch of video cards whenever the page is
+scrolled near its end, up to N cards. Both paths run in the same headless Chromium; after
+each run the page's DOM node count and JS heap (CDP Performance.getMetrics) are sampled.
+
+Usage:
+    poetry run python -m src.tests.benchmarks.bench_harvest [--cards N] [--batch B]
+"""
+import argparse
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ...app.browser import Browser
+from ...app.settings import Settings
+from ...app.timing_history import ChannelTimeouts
+
+FEED_HTML = """<!doctype html>
+<html><body>
+<div id="feed"></div>
+<div id="sentinel" style="height: 10px"></div>
+<script>
+const total = %(cards)d, batch = %(batch)d;
+let rendered = 0;
+const feed = document.getElementById('feed');
+function append() {
+    const fragment = document.createDocumentFragment();
+    for (let i = 0; i < batch && rendered < total; i++, rendered++) {
+        const card = document.createElement('div');
+        card.className = 'card';
+        card.style.height = '240px';
+        card.innerHTML = '<a href="/video-1_' + rendered + '"><img width="320" height="180"><span>12:34</span></a>'
+            + '<div class="meta"><a href="/video-1_' + rendered + '">Synthetic video ' + rendered + '</a>'
+            + '<p>' + 'description '.repeat(20) + '</p></div>';
+        fragment.appendChild(card);
+    }
+    feed.appendChild(fragment);
+}
+new IntersectionObserver((entries) => {
+    if (entries.some((entry) => entry.isIntersecting)) setTimeout(append, 20);
+}, { rootMargin: '1000px' }).observe(document.getElementById('sentinel'));
+</script>
+</body></html>
+"""
+
+
+def serve(cards, batch):
+    html = (FEED_HTML % {'cards': cards, 'batch': batch}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(html)))
+            self.end_headers()
+            self.wfile.write(html)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def page_metrics(page):
+    session = page.context.new_cdp_session(page)
+    session.send('Performance.enable')
+    metrics = {m['name']: m['value'] for m in session.send('Performance.getMetrics')['metrics']}
+    return int(metrics['Nodes']), metrics['JSHeapUsedSize'] / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Link harvesting benchmark')
+    parser.add_argument('--cards', type=int, default=20000, help='Number of cards in the feed')
+    parser.add_argument('--batch', type=int, default=50, help='Cards appended per load')
+    parser.add_argument('--idle-sec', type=float, default=2, help='Stop after this long without new cards')
+    args = parser.parse_args()
+
+    server = serve(args.cards, args.batch)
+    url = f'http://127.0.0.1:{server.server_address[1]}/feed'
+    browser = Browser(Settings(adaptive_timeouts=False, browser_max_navigations_per_context=0, browser_max_navigations=0))
+    timeouts = ChannelTimeouts(url, 60, args.idle_sec)
+    try:
+        rows = []
+        for name, load in (
+            ('snapshot', lambda page: len(set(re.findall(r'href="(/video-[^"]+)"', browser._load_page(page, url, timeouts))))),
+            ('harvest', lambda page: len(browser._harvest_page(page, url, timeouts))),
+        ):
+            def run(page):
+                start = time.perf_counter()
+                links = load(page)
+                return links, time.perf_counter() - start, *page_metrics(page)
+            rows.append((name, *browser.lifecycle.run(run)))
+    finally:
+        browser.close()
+        server.shutdown()
+
+    print(f"cards {args.cards}   batch {args.batch}")
+    print(f"{'mode':<10} {'links':>8} {'seconds':>9} {'DOM nodes':>10} {'JS heap MiB':>12}")
+    for name, links, seconds, nodes, heap in rows:
+        print(f"{name:<10} {links:8d} {seconds:9.1f} {nodes:10d} {heap:12.1f}")
+
+
+if __name__ == '__main__':
+    main()
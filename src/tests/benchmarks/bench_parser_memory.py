@@ -0,0 +1,74 @@
+"""
+Memory benchmark for parsing recorded channel pages.
+
+Builds a synthetic recording of a very large channel by repeating the video cards of a
+real recording, then compares peak Python memory (tracemalloc) and wall time of the
+BeautifulSoup path and the streaming parser.
+
+Usage:
+    poetry run python -m src.tests.benchmarks.bench_parser_memory [--cards N]
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+
+from ...app.streaming_parser import iter_file_chunks, iter_video_links_from_chunks
+
+RECORDING = os.path.join(os.path.dirname(__file__), '..', 'unit', 'recordings', '4434f6ef7e7f9e853c72ef0bab457231.html')
+
+
+def build_recording(path, cards):
+    """Write a page with the head of the real recording followed by `cards` copies of its video cards."""
+    with open(RECORDING, encoding='utf-8') as f:
+        html = f.read()
+    card_pattern = re.compile(r'<a [^>]*href="/video-[^"]*"[^>]*>.*?</a>', re.S)
+    samples = card_pattern.findall(html)
+    body_start = html.find('<body')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html[:body_start] + '<body><div class="feed">')
+        for i in range(cards):
+            card = samples[i % len(samples)]
+            f.write(f'<div class="VideoCard">{card.replace("_", f"_{i}", 1)}</div>\n')
+        f.write('</div></body></html>')
+
+
+def measure(name, parse, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = parse(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = os.path.getsize(path)
+    print(f"{name:<12} links {count:>8}   peak {peak / 2**20:8.1f} MiB ({peak / size:5.2f}x file)   {elapsed:6.2f} s")
+
+
+def parse_soup(path):
+    from bs4 import BeautifulSoup
+    with open(path, encoding='utf-8') as f:
+        soup = BeautifulSoup(f.read(), 'html.parser')
+    return len(soup.find_all('a', href=re.compile(r'^/video-')))
+
+
+def parse_streaming(path):
+    return sum(1 for _ in iter_video_links_from_chunks(iter_file_chunks(path)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recorded page parsing memory benchmark')
+    parser.add_argument('--cards', type=int, default=50000, help='Number of video cards in the synthetic page')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'large_channel.html')
+        build_recording(path, args.cards)
+        print(f"synthetic recording: {os.path.getsize(path) / 2**20:.1f} MiB, {args.cards} cards")
+        measure('streaming', parse_streaming, path)
+        measure('soup', parse_soup, path)
+
+
+if __name__ == '__main__':
+    main()
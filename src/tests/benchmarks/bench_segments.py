@@ -0,0 +1,85 @@
+"""
+Segment downloader benchmark against a local server with a synthetic HLS playlist.
+
+The server answers every segment request after a fixed latency (standing in for CDN time to
+first byte), so sequential fetching, as ffmpeg does, pays it once per segment. The playlist is
+downloaded once per worker count and the wall time, throughput and peak concurrent requests
+are reported; the output is checked to be byte-identical each time.
+
+Usage:
+    poetry run python -m src.tests.benchmarks.bench_segments [--segments N] [--segment-kib K] [--latency-ms L] [--workers 1,2,4,8]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from ..unit.fakes.http_server import LocalHttpServer
+from ...app.logger import Logger
+from ...app.media_resolver import MEDIA_HLS, MediaStream
+from ...app.segments import SegmentDownloader
+from ...app.settings import Settings
+
+
+class SyntheticStreamServer(LocalHttpServer):
+    def __init__(self, segments, segment_bytes, latency):
+        self.latency = latency
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.bodies = [bytes([index % 256]) * segment_bytes for index in range(segments)]
+        playlist = ['#EXTM3U', '#EXT-X-TARGETDURATION:4', '#EXT-X-MAP:URI="init.mp4"']
+        routes = {'/init.mp4': lambda h: (200, {}, b'init')}
+        for index in range(segments):
+            playlist += ['#EXTINF:4.0,', f'{index}.m4s']
+            routes[f'/{index}.m4s'] = lambda h, index=index: self.segment(index)
+        playlist.append('#EXT-X-ENDLIST')
+        routes['/index.m3u8'] = lambda h: (200, {}, '\n'.join(playlist).encode())
+        super().__init__(routes)
+
+    def segment(self, index):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.latency)
+        with self.lock:
+            self.active -= 1
+        return 200, {}, self.bodies[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Segment downloader benchmark')
+    parser.add_argument('--segments', type=int, default=200, help='Number of segments in the playlist')
+    parser.add_argument('--segment-kib', type=int, default=512, help='Size of one segment in KiB')
+    parser.add_argument('--latency-ms', type=float, default=30, help='Server latency per segment request')
+    parser.add_argument('--workers', default='1,2,4,8', help='Comma-separated segment_workers values to compare')
+    parser.add_argument('--buffer', type=int, default=Settings.segment_buffer, help='segment_buffer')
+    args = parser.parse_args()
+
+    segment_bytes = args.segment_kib * 1024
+    with SyntheticStreamServer(args.segments, segment_bytes, args.latency_ms / 1000) as server:
+        expected = b'init' + b''.join(server.bodies)
+        stream = MediaStream(server.url('/index.m3u8'), MEDIA_HLS)
+        total_mib = len(expected) / 2**20
+        print(f"segments {args.segments} x {args.segment_kib} KiB ({total_mib:.0f} MiB)   latency {args.latency_ms:g} ms   buffer {args.buffer}")
+        baseline = None
+        for workers in (int(value) for value in args.workers.split(',')):
+            server.peak = 0
+            settings = Settings(segment_workers=workers, segment_buffer=args.buffer)
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'video.mp4')
+                start = time.perf_counter()
+                SegmentDownloader(settings, Logger()).download(stream, path)
+                elapsed = time.perf_counter() - start
+                with open(path, 'rb') as f:
+                    assert f.read() == expected, 'assembled output differs from the source'
+            baseline = baseline or elapsed
+            print(
+                f"workers {workers:2d}   {elapsed:7.2f} s   {total_mib / elapsed:8.1f} MiB/s   "
+                f"peak requests {server.peak:2d}   speedup {baseline / elapsed:5.1f}x"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Skiplist benchmark: rule loading, checks and incremental reload at scale.
+
+Writes a rules file with N rules (mostly video ids, plus owner and title rules), checks M
+synthetic videos against it, then appends a few rules and measures the incremental reload.
+The legacy check (``video.url in list``) is timed on a sample and extrapolated to M videos.
+
+Usage:
+    poetry run python -m src.tests.benchmarks.bench_skiplist [--rules N] [--videos M] [--title-rules K]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from ...app.extractor import VideoDTO
+from ...app.logger import Logger
+from ...app.settings import Settings
+from ...app.skiplist import Skiplist
+
+LEGACY_SAMPLE = 500
+
+
+def write_rules(path, rules, title_rules, owner_rules):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(rules - title_rules - owner_rules):
+            f.write(f'https://vkvideo.ru/video-{1000 + i % 500}_{i}\n')
+        for i in range(owner_rules):
+            f.write(f'owner:-{900000 + i}\n')
+        for i in range(title_rules):
+            f.write(f'title:^episode {i} of\\b\n')
+
+
+def make_videos(count):
+    rng = random.Random(1)
+    return [
+        VideoDTO(f'https://vkvideo.ru/video-{rng.randrange(1000, 2000)}_{rng.randrange(0, 400000)}', f'Video number {i}')
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Skiplist benchmark')
+    parser.add_argument('--rules', type=int, default=100000, help='Total number of rules')
+    parser.add_argument('--videos', type=int, default=100000, help='Number of videos to check')
+    parser.add_argument('--title-rules', type=int, default=1000, help='Number of title pattern rules')
+    parser.add_argument('--owner-rules', type=int, default=1000, help='Number of owner rules')
+    args = parser.parse_args()
+
+    videos = make_videos(args.videos)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'skiplist.txt')
+        write_rules(path, args.rules, args.title_rules, args.owner_rules)
+        skiplist = Skiplist(Settings(skiplist_path=path, skiplist_reload_sec=0), Logger())
+
+        start = time.perf_counter()
+        skiplist.maybe_reload()
+        load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        skipped = sum(1 for video in videos if skiplist.is_skipped(video))
+        check = time.perf_counter() - start
+
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('video-1_1\nowner:-5\n')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        start = time.perf_counter()
+        skiplist.maybe_reload()
+        reload = time.perf_counter() - start
+
+        with open(path, encoding='utf-8') as f:
+            legacy_list = [line.strip() for line in f]
+        sample = videos[:LEGACY_SAMPLE]
+        start = time.perf_counter()
+        for video in sample:
+            video.url in legacy_list
+        legacy = (time.perf_counter() - start) / len(sample) * len(videos)
+
+    print(f"rules {args.rules} ({args.title_rules} title, {args.owner_rules} owner)   videos {args.videos}   skipped {skipped}")
+    print(f"initial load        {load * 1000:10.1f} ms")
+    print(f"check all videos    {check * 1000:10.1f} ms   ({check / len(videos) * 1e6:.2f} us/video)")
+    print(f"incremental reload  {reload * 1000:10.1f} ms   (2 rules added)")
+    print(f"legacy list scan    {legacy * 1000:10.1f} ms   (extrapolated from {LEGACY_SAMPLE} videos)")
+
+
+if __name__ == '__main__':
+    main()
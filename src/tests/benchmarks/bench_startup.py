@@ -0,0 +1,73 @@
+"""
+Startup benchmark for the vkvideo CLI.
+
+Measures the wall time of `vkvideo --help` and the import time of the entry point
+module in fresh interpreters, and lists the slowest imports. Cron-driven invocations
+pay this cost on every run, so it should stay well below the browser startup time.
+
+Usage:
+    poetry run python -m src.tests.benchmarks.bench_startup [--runs N]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+HEAVY_MODULES = ['playwright', 'bs4', 'yaml']
+
+
+def time_command(args, runs):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=PROJECT_ROOT, capture_output=True, check=False)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def slowest_imports(limit=10):
+    """Return (cumulative_us, module) for the slowest imports of src.app.main."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import src.app.main'],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|\s+(.*)$', line)
+        if match:
+            rows.append((int(match.group(1)), match.group(2).strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def report(name, durations):
+    print(f"{name:<28} median {statistics.median(durations) * 1000:8.1f} ms   "
+          f"min {min(durations) * 1000:8.1f} ms   max {max(durations) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI startup benchmark')
+    parser.add_argument('--runs', type=int, default=10, help='Number of runs per measurement')
+    args = parser.parse_args()
+
+    report('interpreter baseline', time_command([sys.executable, '-c', 'pass'], args.runs))
+    report('import src.app.main', time_command([sys.executable, '-c', 'import src.app.main'], args.runs))
+    report('vkvideo --help', time_command([sys.executable, '-m', 'src.app.main', '--help'], args.runs))
+
+    check = subprocess.run(
+        [sys.executable, '-c',
+         f"import sys, src.app.main; print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    )
+    print(f"heavy modules loaded at startup: {check.stdout.strip()}")
+
+    print("\nslowest imports (cumulative):")
+    for cumulative_us, module in slowest_imports():
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+
+if __name__ == '__main__':
+    main()
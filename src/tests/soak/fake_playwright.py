@@ -0,0 +1,271 @@
+"""
+A Playwright stand-in that plays vkvideo channel and video pages for soak runs.
+
+Channel pages list ``videos_per_channel`` video links. Video pages show the download
+extension's panel (extension engine) and make the player's media response (network engine);
+both point at a local media server, so every download moves real bytes over real sockets.
+``HandleRegistry`` counts the pages, contexts and browsers that are open, which is how a
+leaked Playwright handle shows up in a soak run.
+"""
+import re
+import threading
+import urllib.request
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+_VIDEO_ID = re.compile(r'/video(-?\d+_\d+)')
+
+
+class HandleRegistry:
+    """Open Playwright objects by kind"""
+
+    def __init__(self):
+        self.open: Dict[str, int] = {'playwright': 0, 'browser': 0, 'context': 0, 'page': 0}
+        self._lock = threading.Lock()
+
+    def opened(self, kind: str) -> None:
+        with self._lock:
+            self.open[kind] += 1
+
+    def closed(self, kind: str) -> None:
+        with self._lock:
+            self.open[kind] -= 1
+
+
+class _Emitter:
+    def __init__(self):
+        self.handlers: Dict[str, List[Callable]] = {}
+
+    def on(self, event: str, handler: Callable) -> None:
+        self.handlers.setdefault(event, []).append(handler)
+
+    def emit(self, event: str, *args) -> None:
+        for handler in self.handlers.get(event, []):
+            handler(*args)
+
+
+class FakeResponse:
+    def __init__(self, url: str, headers: Dict[str, str]):
+        self.url = url
+        self.headers = headers
+
+
+class FakeDownload:
+    def __init__(self, url: str):
+        self.url = url
+
+    def save_as(self, path: str) -> None:
+        with urllib.request.urlopen(self.url) as response, open(path, 'wb') as f:
+            while True:
+                chunk = response.read(65536)
+                if not chunk:
+                    break
+                f.write(chunk)
+
+    def cancel(self) -> None:
+        pass
+
+
+class _DownloadInfo:
+    value: Optional[FakeDownload] = None
+
+
+class FakeLocator:
+    def __init__(self, page: 'FakePage', selector: str, index: int = 0):
+        self.page = page
+        self.selector = selector
+        self.index = index
+
+    def nth(self, index: int) -> 'FakeLocator':
+        return FakeLocator(self.page, self.selector, index)
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        return self.page.site.media_url(self.page.url) if name == 'href' else None
+
+    def click(self, **kwargs) -> None:
+        self.page.clicked = self.get_attribute('href')
+
+    def is_visible(self) -> bool:
+        return False
+
+    def evaluate(self, script: str, *args):
+        return None
+
+
+class FakePage(_Emitter):
+    def __init__(self, context: 'FakeContext'):
+        super().__init__()
+        self.context = context
+        self.site = context.site
+        self.url = 'about:blank'
+        self.clicked: Optional[str] = None
+        self._closed = False
+        self.site.registry.opened('page')
+
+    def goto(self, url: str, **kwargs) -> None:
+        self.url = url
+        if _VIDEO_ID.search(url):
+            media = self.site.media_url(url)
+            size = str(self.site.media_bytes)
+            self.emit('response', FakeResponse(media, {'content-type': 'video/mp4', 'content-length': size}))
+
+    def evaluate(self, script: str, *args):
+        if 'a[href^="/video-"]' in script and 'length' in script:
+            return self.site.videos_per_channel
+        if 'navigator.userAgent' in script:
+            return 'SoakChromium/1.0'
+        if 'shadowRoot' in script:
+            # chrome://downloads shows no progress once the transfer is complete
+            return ''
+        if script.startswith('document.querySelector('):
+            return {'tagName': 'A'}
+        return None
+
+    def eval_on_selector_all(self, selector: str, script: str) -> list:
+        return [{'href': self.site.media_url(self.url), 'label': '720p'}]
+
+    def locator(self, selector: str) -> FakeLocator:
+        return FakeLocator(self, selector)
+
+    def click(self, selector: str, **kwargs) -> None:
+        pass
+
+    def content(self) -> str:
+        return self.site.channel_html()
+
+    def wait_for_timeout(self, ms: float) -> None:
+        pass
+
+    @contextmanager
+    def expect_download(self):
+        info = _DownloadInfo()
+        yield info
+        info.value = FakeDownload(self.clicked)
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self.context.pages.remove(self)
+            self.site.registry.closed('page')
+
+
+class FakeContext(_Emitter):
+    def __init__(self, site: 'FakeSite', browser: Optional['FakeBrowser'] = None):
+        super().__init__()
+        self.site = site
+        self.browser = browser
+        self.pages: List[FakePage] = []
+        self._closed = False
+        site.registry.opened('context')
+
+    def new_page(self) -> FakePage:
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    def set_default_timeout(self, timeout: float) -> None:
+        pass
+
+    def storage_state(self, path: str) -> None:
+        with open(path, 'w') as f:
+            f.write('{"cookies": [], "origins": []}')
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for page in list(self.pages):
+            page.close()
+        if self.browser is not None:
+            self.browser.contexts.remove(self)
+        self.site.registry.closed('context')
+        self.emit('close', self)
+
+
+class FakeBrowser(_Emitter):
+    def __init__(self, site: 'FakeSite'):
+        super().__init__()
+        self.site = site
+        self.contexts: List[FakeContext] = []
+        self._closed = False
+        site.registry.opened('browser')
+
+    def new_context(self, **kwargs) -> FakeContext:
+        context = FakeContext(self.site, self)
+        self.contexts.append(context)
+        return context
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for context in list(self.contexts):
+            context.close()
+        self.site.registry.closed('browser')
+        self.emit('disconnected', self)
+
+
+class _PersistentContext(FakeContext):
+    """A persistent context is its own browser"""
+
+    def __init__(self, site: 'FakeSite'):
+        super().__init__(site)
+        site.registry.opened('browser')
+
+    def close(self) -> None:
+        if not self._closed:
+            super().close()
+            self.site.registry.closed('browser')
+
+
+class FakeChromium:
+    def __init__(self, site: 'FakeSite'):
+        self.site = site
+
+    def launch(self, **kwargs) -> FakeBrowser:
+        return FakeBrowser(self.site)
+
+    def launch_persistent_context(self, user_data_dir: str, **kwargs) -> FakeContext:
+        return _PersistentContext(self.site)
+
+
+class FakePlaywright:
+    def __init__(self, site: 'FakeSite'):
+        self.site = site
+        self.chromium = FakeChromium(site)
+        site.registry.opened('playwright')
+
+    def stop(self) -> None:
+        self.site.registry.closed('playwright')
+
+
+class FakeSite:
+    """
+    The pages the fake browser renders.
+
+    Args:
+        media_base_url (str): Base URL of the local server serving /media/<n>.mp4
+        videos_per_channel (int): Number of video links on a channel page
+        media_bytes (int): Size of each media file
+    """
+
+    def __init__(self, media_base_url: str, videos_per_channel: int, media_bytes: int):
+        self.media_base_url = media_base_url
+        self.videos_per_channel = videos_per_channel
+        self.media_bytes = media_bytes
+        self.registry = HandleRegistry()
+
+    def media_url(self, page_url: str) -> str:
+        match = _VIDEO_ID.search(page_url)
+        number = match.group(1).rsplit('_', 1)[1] if match else '0'
+        return f'{self.media_base_url}/media/{number}.mp4'
+
+    def channel_html(self) -> str:
+        cards = ''.join(
+            f'<div class="card"><a href="/video-1_{n}">Soak video {n}</a></div>'
+            for n in range(self.videos_per_channel)
+        )
+        return f'<html><body>{cards}</body></html>'
+
+    def start_playwright(self) -> FakePlaywright:
+        return FakePlaywright(self)
@@ -0,0 +1,267 @@
+"""
+Soak test: thousands of extract + download cycles in one process, failing if resources grow.
+
+Each cycle lists a synthetic channel through the Extractor and downloads its videos with the
+Downloader, the way a long scheduled run does, against a fake Playwright (fake_playwright.py)
+and a local media server. RSS, open file descriptors, threads, open Playwright pages and
+live Python objects are sampled every few cycles. After the warmup, growth is the median of
+the last window of samples minus the median of the first; any metric growing past its limit
+fails the run with exit status 1.
+
+Browser recycling is off unless --recycle is given, as relaunching the browser frees the
+pages and contexts a leak would otherwise accumulate.
+
+Usage:
+    poetry run python -m src.tests.soak.harness [--cycles N] [--videos V] [--engine extension|network]
+        [--concurrency C] [--sample-every S] [--media-kib K] [--recycle]
+"""
+import argparse
+import contextlib
+import gc
+import io
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, fields
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+from .fake_playwright import FakeSite
+from ..unit.fakes.http_server import LocalHttpServer
+from ...app import browser_lifecycle
+from ...app.browser import Browser
+from ...app.downloader import Downloader
+from ...app.extractor import Extractor
+from ...app.logger import Logger
+from ...app.settings import Settings
+
+# Growth allowed between the first and the last window of samples
+LIMITS = {'rss_mb': 16.0, 'fds': 4, 'threads': 2, 'pages': 0, 'objects': 5000}
+
+
+@dataclass
+class Sample:
+    """Resource usage of the process after a cycle"""
+    cycle: int
+    rss_mb: float
+    fds: int
+    threads: int
+    pages: int
+    objects: int
+
+
+def _rss_mb() -> float:
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, IndexError, ValueError):
+        import resource
+        # ru_maxrss is the peak rather than the current RSS, so a leak still shows
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _count_entries(path: str, fallback: Callable[[], int]) -> int:
+    try:
+        return len(os.listdir(path))
+    except OSError:
+        return fallback()
+
+
+def sample(cycle: int, site: FakeSite) -> Sample:
+    """
+    Measure the process after a cycle.
+
+    Args:
+        cycle (int): Number of cycles run so far
+        site (FakeSite): Fake site whose registry counts the open pages
+
+    Returns:
+        Sample: Current resource usage
+    """
+    gc.collect()
+    return Sample(
+        cycle=cycle,
+        rss_mb=_rss_mb(),
+        fds=_count_entries('/proc/self/fd', lambda: 0),
+        threads=_count_entries('/proc/self/task', threading.active_count),
+        pages=site.registry.open['page'],
+        objects=len(gc.get_objects()),
+    )
+
+
+def growth(samples: List[Sample], window: int) -> Dict[str, float]:
+    """
+    Return how much each metric grew over the run.
+
+    The medians of the first and last ``window`` samples are compared, so one slow
+    garbage collection or a download in flight does not count as growth.
+
+    Args:
+        samples (List[Sample]): Samples after the warmup, in order
+        window (int): Number of samples at each end
+
+    Returns:
+        Dict[str, float]: Growth per metric name
+    """
+    window = max(1, min(window, len(samples) // 2))
+    first, last = samples[:window], samples[-window:]
+    return {
+        field.name: statistics.median(getattr(s, field.name) for s in last) - statistics.median(getattr(s, field.name) for s in first)
+        for field in fields(Sample) if field.name != 'cycle'
+    }
+
+
+def over_limits(grown: Dict[str, float], limits: Optional[Dict[str, float]] = None) -> List[str]:
+    """
+    Return a message for each metric that grew past its limit.
+
+    Args:
+        grown (Dict[str, float]): Growth per metric, as returned by growth()
+        limits (Optional[Dict[str, float]], optional): Allowed growth per metric. Defaults to LIMITS.
+
+    Returns:
+        List[str]: Failures; empty if the run stayed flat
+    """
+    limits = LIMITS if limits is None else limits
+    return [
+        f"{name} grew by {grown[name]:g} (limit {limit:g})"
+        for name, limit in limits.items() if grown.get(name, 0) > limit
+    ]
+
+
+class SoakRun:
+    """
+    Runs extract + download cycles against a fake site, sampling resources after each.
+
+    Args:
+        workdir (str): Directory for downloads, caches and the session state
+        videos (int, optional): Videos on the channel, all downloaded each cycle. Defaults to 5.
+        engine (str, optional): Download engine, 'extension' or 'network'. Defaults to 'extension'.
+        concurrency (int, optional): download_concurrency. Defaults to 1.
+        media_bytes (int, optional): Size of each video. Defaults to 64 KiB.
+        recycle (bool, optional): Keep the default browser recycling limits. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        workdir: str,
+        videos: int = 5,
+        engine: str = 'extension',
+        concurrency: int = 1,
+        media_bytes: int = 64 * 1024,
+        recycle: bool = False
+    ):
+        self.workdir = workdir
+        self.videos = videos
+        self.media_bytes = media_bytes
+        self.settings = Settings(
+            timeout_browser_scroll_sec=0,
+            adaptive_timeouts=False,
+            download_engine=engine,
+            download_concurrency=concurrency,
+            resolver_settle_sec=0,
+            use_browser_server=False,
+            cache_dir=os.path.join(workdir, 'recordings'),
+            link_cache_dir=os.path.join(workdir, 'links'),
+            storage_state_path=os.path.join(workdir, 'storage_state.json'),
+            chromium_profile_dir=os.path.join(workdir, 'profile'),
+            profile_pool_dir=os.path.join(workdir, 'profiles'),
+        )
+        if not recycle:
+            self.settings.browser_max_navigations_per_context = 0
+            self.settings.browser_max_navigations = 0
+            self.settings.browser_max_rss_mb = None
+        self.downloads = os.path.join(workdir, 'downloads')
+        os.makedirs(self.downloads, exist_ok=True)
+        os.makedirs(self.settings.chromium_profile_dir, exist_ok=True)
+
+    def run(self, cycles: int, sample_every: int = 10, on_sample: Optional[Callable[[Sample], None]] = None) -> List[Sample]:
+        """
+        Run the cycles.
+
+        Args:
+            cycles (int): Number of extract + download cycles
+            sample_every (int, optional): Cycles between samples. Defaults to 10.
+            on_sample (Optional[Callable[[Sample], None]], optional): Called with each sample as it is taken.
+
+        Returns:
+            List[Sample]: A sample before the first cycle and every sample_every cycles
+        """
+        body = b'\0' * self.media_bytes
+        routes = {f'/media/{n}.mp4': (lambda h: (200, {'Content-Type': 'video/mp4'}, body)) for n in range(self.videos)}
+        samples = []
+        with LocalHttpServer(routes) as server:
+            site = FakeSite(server.base_url, self.videos, self.media_bytes)
+            logger = Logger('vkvideo.soak')
+            with mock.patch.object(browser_lifecycle, '_start_playwright', site.start_playwright):
+                extractor = Extractor(self.settings, logger, browser=Browser(self.settings))
+                downloader = Downloader(logger=logger, settings=self.settings)
+                try:
+                    for cycle in range(cycles + 1):
+                        if cycle % sample_every == 0 or cycle == cycles:
+                            samples.append(sample(cycle, site))
+                            if on_sample is not None:
+                                on_sample(samples[-1])
+                        if cycle == cycles:
+                            break
+                        self._cycle(extractor, downloader)
+                        # The server's request log is test bookkeeping, not the application's memory
+                        server.requests.clear()
+                finally:
+                    downloader.close()
+                    extractor.close()
+        return samples
+
+    def _cycle(self, extractor: Extractor, downloader: Downloader) -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            videos = extractor.extract_video_links('https://vkvideo.ru/@soak')
+            downloader.download_videos(videos, self.downloads)
+        for name in os.listdir(self.downloads):
+            os.remove(os.path.join(self.downloads, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Soak test for resource leaks over many extract + download cycles')
+    parser.add_argument('--cycles', type=int, default=2000, help='Extract + download cycles')
+    parser.add_argument('--videos', type=int, default=5, help='Videos per channel, downloaded every cycle')
+    parser.add_argument('--engine', choices=['extension', 'network'], default='extension', help='Download engine')
+    parser.add_argument('--concurrency', type=int, default=1, help='download_concurrency')
+    parser.add_argument('--media-kib', type=int, default=64, help='Size of each video in KiB')
+    parser.add_argument('--sample-every', type=int, default=50, help='Cycles between samples')
+    parser.add_argument('--warmup', type=int, default=2, help='Samples ignored while caches fill')
+    parser.add_argument('--window', type=int, default=5, help='Samples compared at each end of the run')
+    parser.add_argument('--recycle', action='store_true', help='Keep the default browser recycling limits')
+    args = parser.parse_args()
+
+    # Only warnings and errors, as every cycle logs each download
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    print(f"{'cycle':>7} {'rss MB':>8} {'fds':>5} {'threads':>7} {'pages':>5} {'objects':>8}   elapsed")
+    started = time.monotonic()
+
+    def report(s: Sample) -> None:
+        print(f"{s.cycle:7d} {s.rss_mb:8.1f} {s.fds:5d} {s.threads:7d} {s.pages:5d} {s.objects:8d}   {time.monotonic() - started:6.1f} s")
+
+    workdir = tempfile.mkdtemp(prefix='vkvideo-soak-')
+    try:
+        run = SoakRun(workdir, args.videos, args.engine, args.concurrency, args.media_kib * 1024, args.recycle)
+        samples = run.run(args.cycles, args.sample_every, report)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    grown = growth(samples[args.warmup:], args.window)
+    print('growth: ' + '   '.join(f'{name} {value:+g}' for name, value in grown.items()))
+    failures = over_limits(grown)
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if not failures:
+        print('OK: no resource grew past its limit')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
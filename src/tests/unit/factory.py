@@ -74,6 +74,18 @@ class CLIAppTestFactory:
                 """
                 return self.extract_videos_from_urls(urls)
 
+            def extract_video_links(self, url: str):
+                """
+                Simulate fresh video link extraction for a single URL
+
+                Args:
+                    url (str): URL to extract from
+
+                Returns:
+                    List[VideoDTO]: Extracted video links
+                """
+                return self.extract_video_links_cached(url)
+
             def extract_video_links_cached(self, url: str):
                 """
                 Simulate cached video link extraction for a single URL
@@ -96,7 +108,15 @@ class CLIAppTestFactory:
                 super().__init__(logger)
                 self.download_calls = 0
 
-            def download_video(self, url: str, desired_filename: str, low_res: bool = False, destination_folder: Optional[str] = None) -> Path:
+            def download_video(
+                self,
+                url: str,
+                desired_filename: str,
+                low_res: bool = False,
+                destination_folder: Optional[str] = None,
+                progress=None,
+                cancelled=None
+            ) -> Path:
                 """
                 Simulate video download
 
@@ -18,6 +18,7 @@ class CaptureLogger(Logger):
         super().__init__(name, level)
         self.captured_logs = {
             'info': [],
+            'warning': [],
             'error': []
         }
     
@@ -27,6 +28,12 @@ class CaptureLogger(Logger):
         super().info(msg)
         print(f'INFO: {msg}')  # Print to stdout
     
+    def warning(self, msg):
+        """Capture warning log messages."""
+        self.captured_logs['warning'].append(msg)
+        super().warning(msg)
+        print(f'WARNING: {msg}')  # Print to stdout
+
     def error(self, msg):
         """Capture error log messages."""
         self.captured_logs['error'].append(msg)
@@ -37,5 +44,6 @@ class CaptureLogger(Logger):
         """Clear all captured logs."""
         self.captured_logs = {
             'info': [],
+            'warning': [],
             'error': []
         }
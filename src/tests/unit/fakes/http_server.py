@@ -0,0 +1,73 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+# A route returns (status, headers, body) for a request handler
+Route = Callable[[BaseHTTPRequestHandler], Tuple[int, Dict[str, str], bytes]]
+
+
+class LocalHttpServer:
+    """
+    A threaded HTTP server on localhost for tests.
+
+    Routes map request paths (without query string) to callables returning
+    (status, headers, body). Every request is recorded in ``requests`` as
+    (method, path, headers).
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Route]] = None):
+        self.routes = dict(routes or {})
+        self.requests = []
+        self.connections = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def _handle(self):
+                path = self.path.split('?', 1)[0]
+                server.requests.append((self.command, self.path, dict(self.headers)))
+                length = int(self.headers.get('Content-Length') or 0)
+                self.request_body = self.rfile.read(length) if length else b''
+                route = server.routes.get(path)
+                if route is None:
+                    status, headers, body = 404, {}, b'not found'
+                else:
+                    status, headers, body = route(self)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if not any(name.lower() == 'content-length' for name in headers):
+                    self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            do_GET = do_HEAD = do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,121 @@
+import http.client
+import socket
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class _ProxyServer:
+    """Runs a server on localhost in a background thread; ``requests`` counts proxied requests"""
+    scheme = ''
+
+    def __init__(self, server):
+        self.requests = 0
+        self.lock = threading.Lock()
+        self._server = server
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+
+    def count(self) -> None:
+        with self.lock:
+            self.requests += 1
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'{self.scheme}://{host}:{port}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class HttpForwardProxy(_ProxyServer):
+    """A forwarding HTTP proxy for plain-HTTP requests in absolute form"""
+    scheme = 'http'
+
+    def __init__(self):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                proxy.count()
+                target = urlsplit(self.path)
+                headers = {name: value for name, value in self.headers.items() if not name.lower().startswith('proxy-')}
+                upstream = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=5)
+                try:
+                    upstream.request('GET', target.path + (f'?{target.query}' if target.query else ''), headers=headers)
+                    response = upstream.getresponse()
+                    body = response.read()
+                finally:
+                    upstream.close()
+                self.send_response(response.status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        super().__init__(ThreadingHTTPServer(('127.0.0.1', 0), Handler))
+
+
+class Socks5Proxy(_ProxyServer):
+    """A SOCKS5 proxy (no authentication, CONNECT only) relaying each connection to its target"""
+    scheme = 'socks5'
+
+    def __init__(self):
+        proxy = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                client = self.request
+                greeting = client.recv(2)
+                client.recv(greeting[1])
+                client.sendall(b'\x05\x00')
+                request = client.recv(4)
+                if request[3] == 3:
+                    host = client.recv(client.recv(1)[0]).decode()
+                else:
+                    host = socket.inet_ntoa(client.recv(4))
+                port = int.from_bytes(client.recv(2), 'big')
+                proxy.count()
+                upstream = socket.create_connection((host, port), timeout=5)
+                client.sendall(b'\x05\x00\x00\x01' + socket.inet_aton('127.0.0.1') + b'\x00\x00')
+                relay = threading.Thread(target=self.pipe, args=(upstream, client), daemon=True)
+                relay.start()
+                self.pipe(client, upstream)
+                relay.join()
+
+            @staticmethod
+            def pipe(source, target):
+                try:
+                    while True:
+                        data = source.recv(65536)
+                        if not data:
+                            break
+                        target.sendall(data)
+                except OSError:
+                    pass
+                finally:
+                    try:
+                        target.shutdown(socket.SHUT_WR)
+                    except OSError:
+                        pass
+
+        super().__init__(socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler))
+
+
+def closed_port_url(scheme: str = 'http') -> str:
+    """Return a proxy URL on a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'{scheme}://127.0.0.1:{port}'
@@ -0,0 +1,22 @@
+import time
+
+from ....app.downloader import Downloader, target_path
+from ....app.extractor import VideoDTO
+
+
+def videos(count, owner=-1):
+    """Return `count` videos of an owner, with distinct titles"""
+    return [VideoDTO(f'https://vkvideo.ru/video{owner}_{i}', f'video {owner} {i}') for i in range(count)]
+
+
+class WritingDownloader(Downloader):
+    """Writes a file of a fixed size instead of downloading"""
+    size = 100
+    delay = 0
+
+    def download_video(self, url, desired_filename, low_res=False, destination_folder=None, progress=None, cancelled=None):
+        path = target_path(desired_filename, destination_folder)
+        time.sleep(self.delay)
+        with open(path, 'wb') as f:
+            f.write(b'x' * self.size)
+        return path
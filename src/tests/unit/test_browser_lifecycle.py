@@ -0,0 +1,148 @@
+import os
+
+import pytest
+
+from .fakes.capture_logger import CaptureLogger
+from ...app.browser_lifecycle import BrowserLifecycle, process_tree_rss
+from ...app.settings import Settings
+
+
+class FakeEmitter:
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def emit(self, event):
+        for handler in self.handlers.get(event, []):
+            handler(self)
+
+
+class FakePage(FakeEmitter):
+    def __init__(self, context):
+        super().__init__()
+        self.context = context
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeContext(FakeEmitter):
+    def __init__(self, browser):
+        super().__init__()
+        self.browser = browser
+        self.pages = []
+        self.closed = False
+
+    def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    def close(self):
+        self.closed = True
+        self.emit('close')
+
+
+class FakeBrowser(FakeEmitter):
+    def __init__(self):
+        super().__init__()
+        self.contexts = []
+        self.closed = False
+
+    def new_context(self):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    def close(self):
+        self.closed = True
+        self.emit('disconnected')
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.browsers = []
+        self.stopped = False
+
+    def launch(self):
+        browser = FakeBrowser()
+        self.browsers.append(browser)
+        return browser
+
+    def stop(self):
+        self.stopped = True
+
+
+def make_lifecycle(rss=lambda: 0, **settings):
+    playwright = FakePlaywright()
+    lifecycle = BrowserLifecycle(
+        lambda pw: pw.launch(),
+        Settings(**settings),
+        CaptureLogger(),
+        start_playwright=lambda: playwright,
+        rss_probe=rss
+    )
+    return lifecycle, playwright
+
+
+def test_contexts_and_browsers_are_recycled_at_navigation_limits():
+    lifecycle, playwright = make_lifecycle(browser_max_navigations_per_context=2, browser_max_navigations=5)
+    pages = [lifecycle.run(lambda page: page) for _ in range(7)]
+
+    assert all(page.closed for page in pages)
+    assert len(playwright.browsers) == 2
+    first = playwright.browsers[0]
+    assert first.closed and [c.closed for c in first.contexts] == [True, True, True]
+    assert [kind for kind, _ in lifecycle.events] == ['recycle context', 'recycle context', 'recycle']
+    lifecycle.close()
+    assert playwright.stopped and playwright.browsers[1].closed
+
+
+def test_browser_is_relaunched_above_rss_limit():
+    rss = [0]
+    lifecycle, playwright = make_lifecycle(rss=lambda: rss[0], browser_max_rss_mb=100)
+    lifecycle.run(lambda page: None)
+    rss[0] = 200 * 1024 * 1024
+    lifecycle.run(lambda page: None)
+
+    assert len(playwright.browsers) == 2
+    assert lifecycle.events[0][0] == 'recycle' and 'RSS' in lifecycle.events[0][1]
+
+
+def test_crashed_browser_is_restarted_and_work_retried():
+    lifecycle, playwright = make_lifecycle(browser_restart_attempts=1)
+    attempts = []
+
+    def work(page):
+        attempts.append(page)
+        if len(attempts) == 1:
+            page.context.browser.emit('disconnected')
+            raise RuntimeError('Target closed')
+        return 'html'
+
+    assert lifecycle.run(work) == 'html'
+    assert len(playwright.browsers) == 2
+    assert lifecycle.events == [('restart', 'browser crashed')]
+
+
+def test_errors_of_a_healthy_browser_are_not_retried():
+    lifecycle, playwright = make_lifecycle()
+    attempts = []
+
+    def work(page):
+        attempts.append(page)
+        raise ValueError('not logged in')
+
+    with pytest.raises(ValueError):
+        lifecycle.run(work)
+    assert len(attempts) == 1
+    assert not playwright.browsers[0].closed
+
+
+def test_process_tree_rss_counts_own_process():
+    if not os.path.exists('/proc/self/statm'):
+        pytest.skip('requires /proc')
+    assert process_tree_rss(os.getpid()) > 0
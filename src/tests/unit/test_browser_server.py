@@ -0,0 +1,119 @@
+import json
+import os
+import stat
+import sys
+
+import pytest
+
+from .fakes.capture_logger import CaptureLogger
+from ...app.browser_server import (
+    BrowserServer, BrowserServerError, SharedContext, available_endpoint, connect_or_launch
+)
+from ...app.settings import Settings
+
+# Stands in for Chromium: listens on a free port and announces it like the DevTools server does
+FAKE_CHROMIUM = '''#!{python}
+import socket, sys, time
+server = socket.socket()
+server.bind(('127.0.0.1', 0))
+server.listen()
+print('DevTools listening on ws://127.0.0.1:%d/devtools/browser/fake' % server.getsockname()[1], file=sys.stderr, flush=True)
+while True:
+    time.sleep(1)
+'''
+
+
+@pytest.fixture
+def fake_chromium(tmp_path):
+    path = tmp_path / 'chromium'
+    path.write_text(FAKE_CHROMIUM.format(python=sys.executable))
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+def make_settings(tmp_path, **overrides):
+    return Settings(browser_server_endpoint_path=str(tmp_path / 'server.json'), **overrides)
+
+
+def test_server_publishes_endpoint_until_stopped(tmp_path, fake_chromium):
+    settings = make_settings(tmp_path)
+    server = BrowserServer(settings, CaptureLogger())
+
+    endpoint = server.start(fake_chromium)
+    try:
+        assert endpoint.startswith('ws://127.0.0.1:')
+        assert available_endpoint(settings) == endpoint
+        assert available_endpoint(make_settings(tmp_path, use_browser_server=False)) is None
+        with pytest.raises(BrowserServerError):
+            BrowserServer(settings, CaptureLogger()).start(fake_chromium)
+    finally:
+        server.stop()
+
+    assert available_endpoint(settings) is None
+    assert not os.path.exists(settings.browser_server_endpoint_path)
+
+
+def test_stale_endpoint_file_is_ignored(tmp_path):
+    settings = make_settings(tmp_path)
+    with open(settings.browser_server_endpoint_path, 'w') as f:
+        json.dump({'endpoint': 'ws://127.0.0.1:1/devtools/browser/x', 'pid': 2 ** 22 + 1}, f)
+    assert available_endpoint(settings) is None
+
+
+def test_command_is_tuned_and_loads_the_extension():
+    command = BrowserServer(Settings(extension_path='/ext', headless=True)).command('chromium')
+    assert '--load-extension=/ext' in command
+    assert '--disable-background-networking' in command
+    assert '--headless=new' in command
+
+
+class FakeChromium:
+    def __init__(self):
+        self.connected = []
+
+    def connect_over_cdp(self, endpoint, timeout=None):
+        self.connected.append(endpoint)
+        return 'connected'
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+
+
+def test_connects_to_running_server_and_falls_back_to_launching(tmp_path, fake_chromium):
+    settings = make_settings(tmp_path)
+    playwright = FakePlaywright()
+    launch = lambda playwright: 'launched'
+
+    assert connect_or_launch(playwright, settings, CaptureLogger(), launch) == 'launched'
+
+    server = BrowserServer(settings, CaptureLogger())
+    endpoint = server.start(fake_chromium)
+    try:
+        assert connect_or_launch(playwright, settings, CaptureLogger(), launch) == 'connected'
+        assert playwright.chromium.connected == [endpoint]
+    finally:
+        server.stop()
+
+
+def test_shared_context_close_only_disconnects():
+    class FakeBrowser:
+        def __init__(self):
+            self.contexts = [type('Context', (), {'pages': []})()]
+            self.handlers = {}
+            self.closed = False
+
+        def on(self, event, handler):
+            self.handlers[event] = handler
+
+        def close(self):
+            self.closed = True
+
+    browser = FakeBrowser()
+    context = SharedContext(browser)
+    context.on('close', print)
+    context.close()
+
+    assert context.pages == []
+    assert 'disconnected' in browser.handlers and browser.closed
@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+
+from .factory import CLIAppTestFactory
+from .fakes.capture_logger import CaptureLogger
+from .fakes.writing_downloader import WritingDownloader, videos
+from ...app.budget import RunBudget
+from ...app.downloader import target_path
+from ...app.extractor import VideoDTO
+from ...app.prioritizer import Prioritizer
+from ...app.settings import Settings
+
+
+def test_video_and_time_limits_stop_admission():
+    now = [0.0]
+    budget = RunBudget(Settings(max_run_videos=2), CaptureLogger(), clock=lambda: now[0])
+    first, second, third = videos(3)
+    assert budget.admit(first) and budget.admit(second)
+    assert not budget.admit(third)
+    assert budget.deferred == [third]
+    assert budget.stop_reason == 'video limit of 2 reached'
+
+    budget = RunBudget(Settings(max_run_sec=10), CaptureLogger(), clock=lambda: now[0])
+    budget.start()
+    now[0] = 9.9
+    assert budget.admit(first)
+    now[0] = 10
+    assert not budget.admit(second)
+
+
+def test_downloads_stop_at_byte_limit_and_report_deferred_videos(tmp_path):
+    settings = Settings(max_run_bytes=250, deferred_report_path=str(tmp_path / 'deferred.json'))
+    downloader = WritingDownloader(CaptureLogger(), settings)
+    batch = videos(5)
+
+    downloader.download_videos(batch, str(tmp_path))
+
+    assert downloader.budget.admitted == 3
+    assert downloader.budget.bytes == 300
+    assert downloader.budget.deferred == batch[3:]
+    downloader.budget.write_report()
+    with open(tmp_path / 'deferred.json') as f:
+        report = json.load(f)
+    assert [video['url'] for video in report['deferred']] == [video.url for video in batch[3:]]
+    assert report['reason'].startswith('byte limit')
+
+
+def test_existing_files_cost_no_budget(tmp_path):
+    settings = Settings(max_run_videos=1)
+    downloader = WritingDownloader(CaptureLogger(), settings)
+    batch = videos(3)
+    open(target_path(batch[0].title, str(tmp_path)), 'w').close()
+
+    downloader.download_videos(batch, str(tmp_path))
+
+    assert downloader.budget.admitted == 1
+    assert downloader.budget.deferred == [batch[2]]
+
+
+def test_stop_request_lets_running_downloads_finish(tmp_path):
+    settings = Settings(download_concurrency=2)
+    downloader = WritingDownloader(CaptureLogger(), settings)
+    downloader.delay = 0.1
+    batch = videos(6)
+    timer = threading.Timer(0.05, downloader.budget.request_stop, args=('stop requested',))
+    timer.start()
+
+    downloader.download_videos(batch, str(tmp_path))
+
+    assert downloader.budget.admitted == 2
+    assert len(downloader.budget.deferred) == 4
+    assert sum(os.path.exists(target_path(video.title, str(tmp_path))) for video in batch) == 2
+
+
+def test_prioritizer_orders_newest_first_and_by_channel():
+    a = VideoDTO('https://vkvideo.ru/video-1_5', 'a')
+    b = VideoDTO('https://vkvideo.ru/video-2_9', 'b')
+    c = VideoDTO('https://vkvideo.ru/video-1_7', 'c')
+    d = VideoDTO('https://vkvideo.ru/video-2_3', 'd')
+    e = VideoDTO('https://vkvideo.ru/video-1_1', 'e')
+    assert Prioritizer(Settings(download_priority='page')).order([a, b, c]) == [a, b, c]
+    # Ids are only comparable within an owner, so channels take turns, newest first each
+    assert Prioritizer(Settings(download_priority='newest')).order([a, b, c, d, e]) == [c, b, a, d, e]
+    settings = Settings(download_priority='channel', channel_priority=['-1'])
+    assert Prioritizer(settings).order([a, b, c]) == [c, a, b]
+
+
+def test_exhausted_budget_skips_fresh_extraction_and_writes_report(tmp_path):
+    settings = Settings(max_run_videos=1, deferred_report_path=str(tmp_path / 'deferred.json'))
+    logger = CaptureLogger()
+    budget = RunBudget(settings, logger)
+    downloader = WritingDownloader(logger, settings, budget=budget)
+    app = CLIAppTestFactory.create_cli_app(downloader=downloader, settings=settings, logger=logger)
+    app.budget = budget
+    fresh_calls = []
+    app.extractor.extract_videos_from_urls_cached = lambda urls: videos(2)
+    app.extractor.extract_videos_from_urls = lambda urls: fresh_calls.append(urls) or []
+
+    app.run(['goodstuff', '-d', str(tmp_path / 'videos'), '--priority', 'newest'])
+
+    assert fresh_calls == []
+    with open(tmp_path / 'deferred.json') as f:
+        assert len(json.load(f)['deferred']) == 1
+
+    app.budget = RunBudget(settings, logger)
+    app.report_deferred_work()
+    assert any('previous run deferred 1 videos' in msg for msg in logger.captured_logs['info'])
@@ -50,3 +50,9 @@ def test_no_arguments(capsys):
     assert "VK Video Link Downloader" in captured.err
     assert "goodstuff" in captured.err
     assert "url" in captured.err
+
+
+def test_priority_is_rejected_in_queue_mode(tmp_path):
+    app = CLIAppTestFactory.create_cli_app()
+    with pytest.raises(CLIAppError, match="--priority is not supported with --queue"):
+        app.run(['goodstuff', '--queue', str(tmp_path / 'q.sqlite'), '--priority', 'newest', '-d', str(tmp_path)])
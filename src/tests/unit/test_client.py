@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from .fakes.capture_logger import CaptureLogger
+from ...app.client import AsyncClient
+from ...app.downloader import DownloadCancelled, Downloader, target_path
+from ...app.extractor import Extractor, VideoDTO
+from ...app.settings import Settings
+
+CHANNEL = 'https://vkvideo.ru/@club1/all'
+
+
+class SlowExtractor(Extractor):
+    """Blocks like a browser scroll, then returns three videos"""
+    def extract_video_links_cached(self, url):
+        self.thread = threading.get_ident()
+        time.sleep(0.2)
+        return [VideoDTO(f'https://vkvideo.ru/video-1_{i}', f'video {i}') for i in range(3)]
+
+
+class SteppingDownloader(Downloader):
+    """Reports `steps` progress ticks, honouring cancellation, then writes the file"""
+    steps = 3
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = []
+        self.closed_threads = []
+        self.cancelled_titles = []
+
+    def download_video(self, url, desired_filename, low_res=False, destination_folder=None, progress=None, cancelled=None):
+        self.threads.append(threading.get_ident())
+        for step in range(self.steps):
+            if cancelled is not None and cancelled.is_set():
+                self.cancelled_titles.append(desired_filename)
+                raise DownloadCancelled(desired_filename)
+            progress(f'{step + 1} of {self.steps}')
+            time.sleep(0.02)
+        path = target_path(desired_filename, destination_folder)
+        open(path, 'w').close()
+        return path
+
+    def close(self):
+        self.closed_threads.append(threading.get_ident())
+
+
+def make_client(**overrides):
+    settings = Settings(**overrides)
+    logger = CaptureLogger()
+    return AsyncClient(settings, logger, SlowExtractor(settings, logger), SteppingDownloader(logger, settings))
+
+
+def test_listing_runs_off_the_event_loop():
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        async with make_client() as client:
+            task = asyncio.create_task(ticker())
+            videos = [video async for video in client.list_channel(CHANNEL)]
+            task.cancel()
+            return client, videos, ticks
+
+    client, videos, ticks = asyncio.run(main())
+    assert [video.title for video in videos] == ['video 0', 'video 1', 'video 2']
+    assert client.extractor.thread != threading.get_ident()
+    assert ticks >= 10
+
+
+def test_downloads_report_progress_and_reuse_their_threads(tmp_path):
+    events = []
+
+    async def main():
+        async with make_client(download_concurrency=2) as client:
+            videos = [video async for video in client.list_channel(CHANNEL)]
+            paths = await asyncio.gather(*(
+                client.download(video, str(tmp_path), progress=lambda event: events.append((event.video.title, event.stage)))
+                for video in videos
+            ))
+            return client, paths
+
+    client, paths = asyncio.run(main())
+    assert all(path.endswith('.mp4') for path in paths)
+    assert ('video 0', 'started') in events and ('video 0', 'completed') in events
+    assert sum(1 for title, stage in events if title == 'video 2' and stage == 'progress') == 3
+    assert len(set(client.downloader.threads)) == 2
+    assert set(client.downloader.closed_threads) == set(client.downloader.threads)
+
+
+def test_cancelled_download_is_aborted(tmp_path):
+    async def main():
+        client = make_client()
+        client.downloader.steps = 100
+        video = VideoDTO('https://vkvideo.ru/video-1_1', 'long')
+        task = asyncio.create_task(client.download(video, str(tmp_path)))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await client.aclose()
+        return client
+
+    client = asyncio.run(main())
+    assert client.downloader.cancelled_titles == ['long']
+    assert not (tmp_path / 'long.mp4').exists()
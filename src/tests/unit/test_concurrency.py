@@ -0,0 +1,146 @@
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from .fakes.capture_logger import CaptureLogger
+from .fakes.http_server import LocalHttpServer
+from ...app.concurrency import AimdController, ThrottledError, is_backoff_error
+from ...app.downloader import Downloader, target_path
+from ...app.extractor import VideoDTO
+from ...app.settings import Settings
+
+
+def make_controller(now, **overrides):
+    values = dict(download_concurrency=2, concurrency_max=4, aimd_window_sec=1)
+    values.update(overrides)
+    settings = Settings(**values)
+    return AimdController(settings, CaptureLogger(), clock=lambda: now[0])
+
+
+def run_window(controller, now, downloads, size, error=None):
+    """Run `downloads` overlapping downloads of `size` bytes each within one window"""
+    for _ in range(downloads):
+        controller.acquire()
+    for _ in range(downloads):
+        controller.release(size=size, error=error)
+    now[0] += 1
+    controller.acquire()
+    controller.release(size=0)
+
+
+def test_limit_grows_while_throughput_rises_and_holds_when_flat():
+    now = [0.0]
+    controller = make_controller(now)
+    run_window(controller, now, 2, 100)
+    assert controller.limit == 3
+    run_window(controller, now, 3, 200)
+    assert controller.limit == 4
+    run_window(controller, now, 4, 200)
+    assert controller.limit == 4
+    assert controller.metrics()['increases'] == 2
+
+
+def test_throttling_halves_the_limit_once_per_window():
+    now = [0.0]
+    controller = make_controller(now, concurrency_max=8)
+    controller.limit = 8
+    for _ in range(4):
+        controller.acquire()
+    for _ in range(4):
+        controller.release(error=ThrottledError('too many requests', status=429))
+    assert controller.limit == 4
+    assert [d.action for d in controller.decisions] == ['decrease']
+
+
+def test_throughput_collapse_backs_off():
+    now = [0.0]
+    controller = make_controller(now)
+    run_window(controller, now, 2, 1000)
+    run_window(controller, now, 3, 100)
+    assert controller.decisions[-1].action == 'decrease'
+    assert controller.limit == 1
+
+
+def test_backoff_errors():
+    assert is_backoff_error(TimeoutError())
+    assert is_backoff_error(ThrottledError('bad gateway', status=502))
+    assert not is_backoff_error(ThrottledError('not found', status=404))
+    assert not is_backoff_error(RuntimeError('boom'))
+
+
+class ThrottlingServer(LocalHttpServer):
+    """Serves 8 KiB per request, slowly; more than `capacity` concurrent requests get HTTP 429"""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.active = 0
+        self.peak = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+        super().__init__({'/video': self.video})
+
+    def video(self, handler):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            over = self.active > self.capacity
+            self.throttled += over
+        try:
+            if over:
+                return 429, {}, b'slow down'
+            time.sleep(0.015)
+            return 200, {}, b'x' * 8192
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class HttpDownloader(Downloader):
+    """Downloads from the throttling server instead of through the browser"""
+    url = None
+
+    def download_video(self, url, desired_filename, low_res=False, destination_folder=None, progress=None, cancelled=None):
+        try:
+            with urllib.request.urlopen(self.url) as response:
+                body = response.read()
+        except urllib.error.HTTPError as e:
+            raise ThrottledError(f'HTTP {e.code}', status=e.code)
+        path = target_path(desired_filename, destination_folder)
+        with open(path, 'wb') as f:
+            f.write(body)
+        return path
+
+
+def test_adaptive_downloads_converge_below_throttling_threshold(tmp_path):
+    settings = Settings(
+        adaptive_concurrency=True, download_concurrency=1, concurrency_max=8,
+        aimd_window_sec=0.03, aimd_retries=10, concurrency_metrics_path=str(tmp_path / 'metrics.jsonl')
+    )
+    videos = [VideoDTO(f'https://vkvideo.ru/video-1_{i}', f'video {i}') for i in range(40)]
+    with ThrottlingServer(capacity=3) as server:
+        downloader = HttpDownloader(CaptureLogger(), settings)
+        downloader.url = server.url('/video')
+        downloader.download_videos(videos, str(tmp_path))
+
+    metrics = downloader.concurrency.metrics()
+    assert all((tmp_path / f'video {i}.mp4').exists() for i in range(40))
+    assert metrics['completed'] == 40 and metrics['increases'] >= 1
+    assert server.peak > 1
+    if server.throttled:
+        assert metrics['decreases'] >= 1
+    assert (tmp_path / 'metrics.jsonl').read_text().count('\n') == len(downloader.concurrency.decisions)
+
+
+def test_videos_already_on_disk_are_not_counted_as_downloads(tmp_path):
+    settings = Settings(adaptive_concurrency=True, download_concurrency=2, concurrency_max=4)
+    videos = [VideoDTO(f'https://vkvideo.ru/video-1_{i}', f'video {i}') for i in range(6)]
+    for video in videos[:4]:
+        (tmp_path / f'{video.title}.mp4').write_bytes(b'x')
+    with ThrottlingServer(capacity=4) as server:
+        downloader = HttpDownloader(CaptureLogger(), settings)
+        downloader.url = server.url('/video')
+        downloader.download_videos(videos, str(tmp_path))
+
+    metrics = downloader.concurrency.metrics()
+    assert metrics['completed'] == 2
+    assert downloader.concurrency.in_flight == 0
@@ -0,0 +1,94 @@
+import csv
+import json
+import logging
+import os
+
+from .factory import CLIAppTestFactory
+from .fakes.capture_logger import CaptureLogger
+from ...app.cli_app import GOODSTUFF_VIDEOS
+from ...app.downloader import Downloader, target_path
+from ...app.exporter import CatalogExporter
+from ...app.extractor import Extractor, VideoDTO
+from ...app.logger import Logger
+from ...app.settings import Settings
+
+
+def read_ndjson(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_ndjson_records_are_readable_before_close(tmp_path):
+    path = tmp_path / 'catalog.ndjson'
+    with CatalogExporter(str(path)) as exporter:
+        exporter.write(VideoDTO('https://vkvideo.ru/video-1_1', 'Первое "видео"'), 'https://vkvideo.ru/@club1/all')
+        assert read_ndjson(path) == [{
+            'url': 'https://vkvideo.ru/video-1_1',
+            'title': 'Первое "видео"',
+            'source': 'https://vkvideo.ru/@club1/all'
+        }]
+
+
+def test_csv_format_inferred_from_extension(tmp_path):
+    path = tmp_path / 'catalog.csv'
+    with CatalogExporter(str(path)) as exporter:
+        exporter.write(VideoDTO('https://vkvideo.ru/video-1_1', 'a, b'), 'src')
+    with open(path, encoding='utf-8', newline='') as f:
+        assert list(csv.reader(f)) == [['url', 'title', 'source'], ['https://vkvideo.ru/video-1_1', 'a, b', 'src']]
+
+
+def test_export_is_written_while_extracting(tmp_path):
+    path = tmp_path / 'catalog.ndjson'
+    seen_before_page = []
+
+    class PageExtractor(Extractor):
+        def extract_video_links_cached(self, url):
+            seen_before_page.append(len(read_ndjson(path)))
+            return [VideoDTO(f'{url}/video{i}', f'{url} {i}') for i in range(3)]
+
+    app = CLIAppTestFactory.create_cli_app(extractor=PageExtractor(logger=CaptureLogger()))
+    app.run(['goodstuff', '-o', str(path), '--no-download'])
+
+    assert seen_before_page == [0, 3], "Videos of a page must be exported before the next page is extracted"
+    assert len(read_ndjson(path)) == 3 * len(GOODSTUFF_VIDEOS)
+    assert app.downloader.download_calls == 0
+
+
+def test_export_then_download(tmp_path):
+    path = tmp_path / 'catalog.ndjson'
+    app = CLIAppTestFactory.create_cli_app()
+    app.run(['goodstuff', '-o', str(path), '-d', str(tmp_path)])
+    assert [record['source'] for record in read_ndjson(path)] == GOODSTUFF_VIDEOS
+    assert app.downloader.download_calls == len(GOODSTUFF_VIDEOS)
+
+
+def test_download_run_exports_videos_found_by_the_fresh_extraction(tmp_path):
+    path = tmp_path / 'catalog.ndjson'
+    app = CLIAppTestFactory.create_cli_app()
+    cached = app.extractor.extract_video_links_cached
+    app.extractor.extract_video_links = lambda url: cached(url) + [VideoDTO(f"{url}/video2", 'New video')]
+    app.run(['goodstuff', '-o', str(path), '-d', str(tmp_path)])
+
+    records = read_ndjson(path)
+    # The cached pass's videos are not exported again by the fresh pass
+    assert [record['url'] for record in records] == (
+        [f"{url}/video1" for url in GOODSTUFF_VIDEOS] + [f"{url}/video2" for url in GOODSTUFF_VIDEOS]
+    )
+    assert app.downloader.download_calls == 2 * len(GOODSTUFF_VIDEOS)
+
+
+def test_export_to_stdout_is_not_mixed_with_download_output(tmp_path, capsys, caplog):
+    # CaptureLogger echoes to stdout, so log through the logging module only
+    caplog.set_level(logging.INFO)
+    downloader = Downloader(Logger(), Settings(use_browser_server=False))
+    app = CLIAppTestFactory.create_cli_app(downloader=downloader)
+    # Videos already on disk take the download path without a browser
+    for url in GOODSTUFF_VIDEOS:
+        path = target_path(f'Video from {url}', str(tmp_path))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+    app.run(['goodstuff', '-o', '-', '-d', str(tmp_path)])
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)['source'] for line in lines] == GOODSTUFF_VIDEOS
+    assert 'File already exists' in caplog.text
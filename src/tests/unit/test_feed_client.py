@@ -0,0 +1,93 @@
+import json
+import os
+from urllib.parse import parse_qs
+
+from .fakes.capture_logger import CaptureLogger
+from .fakes.http_server import LocalHttpServer
+from ...app.browser import Browser
+from ...app.extractor import Extractor
+from ...app.feed_client import ChannelFeedClient, load_session_cookies
+from ...app.http_client import HttpClient
+from ...app.settings import Settings
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(__file__), 'recordings')
+# Synthetic feed pages, written by hand from the videos of the recorded channel page (the
+# thumbnails and hashes are placeholders), not responses captured from the live endpoint
+FEED_DIR = os.path.join(RECORDINGS_DIR, 'feed')
+CHANNEL_URL = 'https://vkvideo.ru/@public111751633/all'
+
+
+def feed_route(handler):
+    """Serve the synthetic feed pages by owner id and offset"""
+    form = parse_qs(handler.request_body.decode())
+    path = os.path.join(FEED_DIR, f"{form['oid'][0]}_{form['offset'][0]}.json")
+    if not os.path.exists(path):
+        return 404, {}, b''
+    with open(path, 'rb') as f:
+        return 200, {'Content-Type': 'application/json'}, f.read()
+
+
+def make_settings(server, tmp_path):
+    return Settings(
+        vk_base_url=server.base_url,
+        cache_dir=RECORDINGS_DIR,
+        link_cache_dir=str(tmp_path),
+        storage_state_path=str(tmp_path / 'missing.json')
+    )
+
+
+def make_client(settings):
+    return ChannelFeedClient(settings, CaptureLogger(), HttpClient(settings))
+
+
+def test_feed_pages_parse_into_the_videos_of_the_recorded_page(tmp_path):
+    # The pages are derived from the recorded HTML, so this checks the parsing and paging of
+    # the client, not that the live endpoint lists what the browser sees
+    with LocalHttpServer({'/al_video.php': feed_route}) as server:
+        settings = make_settings(server, tmp_path)
+        videos = make_client(settings).list_videos(CHANNEL_URL)
+
+    browser_extractor = Extractor(settings=settings, logger=CaptureLogger(), browser=Browser(settings, record_replay=True))
+    assert videos == browser_extractor.extract_video_links(CHANNEL_URL)
+
+
+def test_feed_pages_over_one_keepalive_connection(tmp_path):
+    with LocalHttpServer({'/al_video.php': feed_route}) as server:
+        make_client(make_settings(server, tmp_path)).list_videos(CHANNEL_URL)
+        assert len(server.requests) == 2
+        assert server.connections == 1
+
+
+def test_named_channel_owner_id_is_read_from_page(tmp_path):
+    page = b'<script>var newCur = {"section_id":null,"oid":-111751633,"videoCanAdd":0};</script>'
+    routes = {'/@somechannel/all': lambda h: (200, {}, page), '/al_video.php': feed_route}
+    with LocalHttpServer(routes) as server:
+        client = make_client(make_settings(server, tmp_path))
+        assert client.resolve_owner_id('https://vkvideo.ru/@somechannel/all') == -111751633
+        assert len(client.list_videos('https://vkvideo.ru/@somechannel/all')) == 14
+
+
+def test_extractor_http_backend_falls_back_to_browser(tmp_path):
+    with LocalHttpServer({'/al_video.php': lambda h: (500, {}, b'')}) as server:
+        settings = make_settings(server, tmp_path)
+        settings.extraction_backend = 'http'
+        logger = CaptureLogger()
+        extractor = Extractor(
+            settings=settings,
+            logger=logger,
+            browser=Browser(settings, record_replay=True),
+            feed_client=make_client(settings)
+        )
+        videos = extractor.extract_video_links(CHANNEL_URL)
+    assert len(videos) == 14
+    assert any('Launching browser' in log for log in logger.captured_logs['info'])
+
+
+def test_session_cookies_from_storage_state(tmp_path):
+    state = {'cookies': [
+        {'name': 'remixsid', 'value': 'abc', 'domain': '.vkvideo.ru'},
+        {'name': 'other', 'value': 'x', 'domain': 'example.com'},
+    ]}
+    path = tmp_path / 'state.json'
+    path.write_text(json.dumps(state))
+    assert load_session_cookies(Settings(storage_state_path=str(path))) == {'remixsid': 'abc'}
@@ -0,0 +1,155 @@
+import contextlib
+import json
+import os
+
+import pytest
+
+from .fakes.capture_logger import CaptureLogger
+from ...app import downloader as downloader_module
+from ...app.downloader import Downloader
+from ...app.extractor import VideoDTO
+from ...app.har import HAR_RECORD, HAR_REPLAY, MEDIA_STUB_FILE, HarArchive, HarError, is_media_entry
+from ...app.media_resolver import MEDIA_MP4, MediaStream
+from ...app.settings import Settings
+
+VIDEO_URL = 'https://vkvideo.ru/video-1_2'
+
+
+def entry(url, mime_type, body_file=None, text=None, size=0):
+    content = {'mimeType': mime_type, 'size': size}
+    if body_file:
+        content['_file'] = body_file
+    if text is not None:
+        content['text'] = text
+    return {
+        'request': {'method': 'GET', 'url': url, 'headers': []},
+        'response': {'status': 200, 'headers': [{'name': 'Content-Length', 'value': str(size)}], 'content': content},
+    }
+
+
+def make_archive(tmp_path, mode=None):
+    return HarArchive(Settings(har_mode=mode, har_dir=str(tmp_path), har_stub_bytes=16), CaptureLogger())
+
+
+class FakePage:
+    def __init__(self):
+        self.routes = []
+
+    def route_from_har(self, path, **kwargs):
+        self.routes.append((path, kwargs))
+
+
+def test_media_entries_are_detected_by_mime_type_or_extension():
+    assert is_media_entry(entry('https://cdn/v.bin', 'video/mp4'))
+    assert is_media_entry(entry('https://cdn/seg-1.m4s?x=1', 'application/octet-stream'))
+    assert not is_media_entry(entry('https://cdn/master.m3u8', 'application/vnd.apple.mpegurl'))
+    assert not is_media_entry(entry(VIDEO_URL, 'text/html'))
+
+
+def test_stub_media_replaces_bodies_and_removes_recorded_media(tmp_path):
+    archive = make_archive(tmp_path, HAR_RECORD)
+    (tmp_path / 'page.html').write_text('<html></html>')
+    (tmp_path / 'video.mp4').write_bytes(b'x' * 1000)
+    har_path = archive.path_for(VIDEO_URL)
+    with open(har_path, 'w') as f:
+        json.dump({'log': {'entries': [
+            entry(VIDEO_URL, 'text/html', body_file='page.html', size=13),
+            entry('https://cdn/video.mp4', 'video/mp4', body_file='video.mp4', size=1000),
+            entry('https://cdn/inline.mp4', 'video/mp4', text='AAAA', size=3),
+        ]}}, f)
+
+    assert archive.stub_media(har_path) == 2
+
+    with open(har_path) as f:
+        page, video, inline = json.load(f)['log']['entries']
+    assert page['response']['content']['_file'] == 'page.html'
+    for stubbed in (video, inline):
+        assert stubbed['response']['content']['_file'] == MEDIA_STUB_FILE
+        assert stubbed['response']['content']['size'] == 16
+        assert 'text' not in stubbed['response']['content']
+        assert stubbed['response']['headers'][0]['value'] == '16'
+    assert os.path.getsize(tmp_path / MEDIA_STUB_FILE) == 16
+    assert not (tmp_path / 'video.mp4').exists()
+    assert (tmp_path / 'page.html').exists()
+
+
+def test_attach_routes_pages_according_to_mode(tmp_path):
+    page = FakePage()
+    assert make_archive(tmp_path).attach(page, VIDEO_URL) is None
+    assert page.routes == []
+
+    path = make_archive(tmp_path, HAR_RECORD).attach(page, VIDEO_URL)
+    assert page.routes[-1] == (path, {'update': True, 'update_content': 'attach', 'update_mode': 'minimal'})
+
+    replay = make_archive(tmp_path, HAR_REPLAY)
+    with pytest.raises(HarError):
+        replay.attach(page, VIDEO_URL)
+    open(path, 'w').close()
+    assert replay.attach(page, VIDEO_URL) == path
+    assert page.routes[-1] == (path, {'not_found': 'abort'})
+
+
+class RecordingDownloader(Downloader):
+    """Resolves videos without a browser; the recording is written when the browser closes, if at all"""
+    writes_recording = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.closed = 0
+
+    def lifecycle(self, download_path):
+        return None
+
+    def close(self):
+        self.closed += 1
+
+    def _resolve_via_network(self, lifecycle, url, http_client=None):
+        if self.writes_recording:
+            with open(self.har_archive.path_for(url), 'w') as f:
+                json.dump({'log': {'entries': [entry('https://cdn/video.mp4', 'video/mp4', text='AAAA', size=3)]}}, f)
+        return MediaStream('https://cdn/video.mp4', MEDIA_MP4), {}
+
+    def _download_via_network(self, lifecycle, url, filename_with_path, progress=None, cancelled=None, egress=None):
+        return filename_with_path
+
+
+def make_recording_downloader(tmp_path):
+    settings = Settings(har_mode=HAR_RECORD, har_dir=str(tmp_path / 'har'), har_stub_bytes=16, download_engine='network')
+    os.makedirs(settings.har_dir)
+    return RecordingDownloader(CaptureLogger(), settings)
+
+
+def test_resolving_a_video_finishes_its_recording(tmp_path):
+    downloader = make_recording_downloader(tmp_path)
+
+    assert downloader.resolve_video(VideoDTO(VIDEO_URL, 'video'), str(tmp_path)) is not None
+
+    assert downloader.closed == 1
+    with open(downloader.har_archive.path_for(VIDEO_URL)) as f:
+        assert json.load(f)['log']['entries'][0]['response']['content']['_file'] == MEDIA_STUB_FILE
+
+
+def test_missing_recording_does_not_fail_a_download(tmp_path):
+    downloader = make_recording_downloader(tmp_path)
+    downloader.writes_recording = False
+
+    path = str(tmp_path / 'video.mp4')
+    assert downloader.download_video(VIDEO_URL, 'video', destination_folder=str(tmp_path)) == path
+    assert any('No HAR recording' in message for message in downloader.logger.captured_logs['warning'])
+
+
+def test_recording_launches_its_own_browser_instead_of_the_browser_server(tmp_path, monkeypatch):
+    acquired = []
+
+    class FakePool:
+        @contextlib.contextmanager
+        def acquire(self):
+            acquired.append(True)
+            yield str(tmp_path / 'profile')
+
+    monkeypatch.setattr(downloader_module, 'available_endpoint', lambda settings: 'ws://127.0.0.1:9222/devtools')
+    settings = Settings(har_mode=HAR_RECORD, har_dir=str(tmp_path))
+    downloader = Downloader(CaptureLogger(), settings, profile_pool=FakePool())
+    downloader.lifecycle(str(tmp_path))
+    downloader.close()
+    assert acquired == [True]
@@ -0,0 +1,112 @@
+import os
+import time
+
+import pytest
+
+from .fakes.capture_logger import CaptureLogger
+from ..benchmarks.bench_harvest import serve
+from ...app.browser import Browser
+from ...app.extractor import Extractor
+from ...app.settings import Settings
+from ...app.timing_history import ChannelTimeouts, TimingHistory
+
+CHANNEL = 'https://vkvideo.ru/@club1/all'
+
+
+class FakeFeedPage:
+    """Page that renders `batch` new links on each scroll until `total` links exist"""
+    def __init__(self, total, batch=10):
+        self.total = total
+        self.batch = batch
+        self.links = []
+        self.scrolls = 0
+
+    def goto(self, url, timeout=None, wait_until=None):
+        pass
+
+    def evaluate(self, script):
+        if 'new MutationObserver' in script:
+            return len(self.links)
+        if 'scrollTo' in script:
+            self.scrolls += 1
+            start = len(self.links)
+            for i in range(start, min(start + self.batch, self.total)):
+                self.links.append((f'/video-1_{i}', f'video {i}' if i % 3 else '12:34'))
+            return len(self.links)
+        if 'entries' in script:
+            return [list(link) for link in self.links]
+        raise AssertionError(f'unexpected script: {script}')
+
+    def wait_for_timeout(self, ms):
+        time.sleep(ms / 1000)
+
+
+def make_browser(**overrides):
+    browser = Browser(Settings(adaptive_timeouts=False, **overrides))
+    browser.settle_poll_ms = 10
+    return browser
+
+
+def test_harvest_scrolls_until_no_new_links_within_budget():
+    page = FakeFeedPage(total=45)
+    links = make_browser()._harvest_page(page, CHANNEL, ChannelTimeouts(CHANNEL, 1, 0.1))
+
+    assert [href for href, _ in links] == [f'/video-1_{i}' for i in range(45)]
+    assert page.scrolls > 5
+
+
+def test_harvest_records_the_longest_wait_for_a_new_link(tmp_path):
+    settings = Settings(timing_history_path=str(tmp_path / 'timings.json'))
+    logger = CaptureLogger()
+    browser = Browser(settings, timing_history=TimingHistory(settings, logger), logger=logger)
+    browser.settle_poll_ms = 10
+    started = time.monotonic()
+    browser._harvest_page(FakeFeedPage(total=45), CHANNEL, ChannelTimeouts(CHANNEL, 1, 0.2))
+    elapsed = time.monotonic() - started
+
+    [sample] = browser.timing_history.load()[CHANNEL]
+    # Links arrive on every poll; the idle budget at the end is not part of the wait
+    assert sample['items'] == 45
+    assert sample['scroll_sec'] < 0.1 < elapsed
+
+
+def test_harvest_ends_an_endless_feed_at_max_links():
+    page = FakeFeedPage(total=10 ** 9)
+    links = make_browser(harvest_max_links=25)._harvest_page(page, CHANNEL, ChannelTimeouts(CHANNEL, 1, 10))
+
+    assert len(links) == 25
+    assert page.scrolls == 3
+
+
+def test_extractor_skips_timestamp_titles_of_harvested_links(tmp_path):
+    settings = Settings(extraction_backend='harvest', link_cache_dir=str(tmp_path))
+    browser = make_browser()
+    browser.harvest_links = lambda url: [('/video-1_1', 'first'), ('/video-1_2', '12:34'), ('/video-1_3', '')]
+    extractor = Extractor(settings, CaptureLogger(), browser=browser)
+
+    videos = extractor.extract_video_links(CHANNEL)
+
+    assert [(video.url, video.title) for video in videos] == [
+        ('https://vkvideo.ru/video-1_1', 'first'),
+        ('https://vkvideo.ru/video-1_3', 'Untitled Video'),
+    ]
+
+
+@pytest.mark.timeout(60)
+def test_harvest_script_collects_every_card_of_a_synthetic_feed():
+    # Runs the harvesting script in Chromium: removing the last card of a batch used to take the feed with it
+    from playwright.sync_api import sync_playwright
+    with sync_playwright() as playwright:
+        if not os.path.exists(playwright.chromium.executable_path):
+            pytest.skip('Chromium is not installed')
+    server = serve(cards=300, batch=50)
+    url = f'http://127.0.0.1:{server.server_address[1]}/feed'
+    browser = make_browser(use_browser_server=False, timeout_browser_scroll_sec=2)
+    try:
+        links = browser.harvest_links(url)
+    finally:
+        browser.close()
+        server.shutdown()
+
+    assert [href for href, _ in links] == [f'/video-1_{i}' for i in range(300)]
+    assert all(title == f'Synthetic video {i}' for i, (_, title) in enumerate(links))
@@ -0,0 +1,154 @@
+import time
+
+import pytest
+
+from .fakes.capture_logger import CaptureLogger
+from .fakes.http_server import LocalHttpServer
+from ...app.concurrency import ThrottledError
+from ...app.downloader import Downloader
+from ...app.media_resolver import (
+    MEDIA_DASH, MEDIA_HLS, MEDIA_MP4, HttpDownloadEngine, MediaResolveError, MediaStream,
+    NetworkMediaResolver, classify, parse_hls_master
+)
+from ...app.settings import Settings
+
+VIDEO_PAGE = 'https://vkvideo.ru/video-1_1'
+
+MASTER = '''#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"
+360/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080
+1080/index.m3u8
+'''
+
+
+class FakeResponse:
+    def __init__(self, url, headers):
+        self.url = url
+        self.headers = headers
+
+
+class StandInPage:
+    """Video page whose player requests the given responses, `delay` seconds apart, after goto"""
+    def __init__(self, responses, delay=0.0):
+        self.responses = responses
+        self.delay = delay
+        self.handlers = []
+        self.clicked = []
+
+    def on(self, event, handler):
+        assert event == 'response'
+        self.handlers.append(handler)
+
+    def goto(self, url):
+        for response in self.responses:
+            time.sleep(self.delay)
+            for handler in self.handlers:
+                handler(response)
+
+    def click(self, selector, timeout=None):
+        self.clicked.append(selector)
+
+    def wait_for_timeout(self, ms):
+        time.sleep(ms / 1000)
+
+    def evaluate(self, script):
+        return 'StandIn/1.0'
+
+
+def make_settings(**overrides):
+    values = dict(resolver_timeout_sec=0.5, resolver_settle_sec=0.05)
+    values.update(overrides)
+    return Settings(**values)
+
+
+def test_classify_media_responses():
+    assert classify('https://cdn/v/master.m3u8?sig=1') == MEDIA_HLS
+    assert classify('https://cdn/v/manifest', 'application/dash+xml') == MEDIA_DASH
+    assert classify('https://cdn/v/?type=3', 'video/mp4') == MEDIA_MP4
+    assert classify('https://cdn/thumb.jpg', 'image/jpeg') is None
+
+
+def test_hls_master_variants_are_resolved_against_the_playlist():
+    streams = parse_hls_master(MASTER, 'https://cdn/v/master.m3u8')
+    assert [(s.url, s.height, s.bandwidth) for s in streams] == [
+        ('https://cdn/v/360/index.m3u8', 360, 800000),
+        ('https://cdn/v/1080/index.m3u8', 1080, 5000000),
+    ]
+
+
+def test_best_progressive_variant_is_selected():
+    responses = [
+        FakeResponse('https://cdn/video.480.mp4', {'content-type': 'video/mp4', 'content-range': 'bytes 0-99/4000'}),
+        FakeResponse('https://cdn/video.720.mp4', {'content-type': 'video/mp4', 'content-range': 'bytes 0-99/9000'}),
+        FakeResponse('https://cdn/poster.jpg', {'content-type': 'image/jpeg'}),
+    ]
+    page = StandInPage(responses)
+    resolver = NetworkMediaResolver(make_settings(), CaptureLogger())
+
+    streams = resolver.resolve(page, VIDEO_PAGE)
+
+    assert page.clicked == ['#video_player']
+    assert [(s.height, s.size) for s in streams] == [(480, 4000), (720, 9000)]
+    assert resolver.select(streams).url == 'https://cdn/video.720.mp4'
+    settings = make_settings(quality_strategy='max-bytes', max_bytes_per_video=5000)
+    assert NetworkMediaResolver(settings, CaptureLogger()).select(streams).height == 480
+
+
+def test_manifest_is_expanded_and_its_segments_ignored():
+    with LocalHttpServer({'/v/master.m3u8': lambda h: (200, {'Content-Type': 'application/vnd.apple.mpegurl'}, MASTER.encode())}) as server:
+        responses = [
+            FakeResponse(server.url('/v/master.m3u8'), {'content-type': 'application/vnd.apple.mpegurl'}),
+            FakeResponse(server.url('/v/1080/seg-1.mp4'), {'content-type': 'video/mp4'}),
+        ]
+        resolver = NetworkMediaResolver(make_settings(), CaptureLogger())
+        streams = resolver.resolve(StandInPage(responses), VIDEO_PAGE)
+
+    assert [s.kind for s in streams] == [MEDIA_HLS, MEDIA_HLS]
+    assert resolver.select(streams).url == server.url('/v/1080/index.m3u8')
+    assert server.requests[0][2]['Referer'] == VIDEO_PAGE
+
+
+def test_page_without_media_fails_after_the_timeout():
+    resolver = NetworkMediaResolver(make_settings(resolver_timeout_sec=0.1), CaptureLogger())
+    with pytest.raises(MediaResolveError):
+        resolver.resolve(StandInPage([]), VIDEO_PAGE)
+
+
+def test_engine_streams_progressive_files_and_reports_throttling(tmp_path):
+    body = b'v' * (3 * 1024 * 1024 + 5)
+    routes = {
+        '/video.mp4': lambda h: (200, {'Content-Type': 'video/mp4'}, body),
+        '/busy.mp4': lambda h: (429, {}, b'slow down'),
+    }
+    engine = HttpDownloadEngine(Settings(), CaptureLogger())
+    progress = []
+    with LocalHttpServer(routes) as server:
+        path = engine.download(MediaStream(server.url('/video.mp4'), MEDIA_MP4), str(tmp_path / 'v.mp4'), progress=progress.append)
+        with pytest.raises(ThrottledError):
+            engine.download(MediaStream(server.url('/busy.mp4'), MEDIA_MP4), str(tmp_path / 'busy.mp4'))
+
+    assert open(path, 'rb').read() == body
+    assert len(progress) == 4 and progress[-1] == '3.0 MB of 3.0 MB'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['v.mp4']
+
+
+class FakeLifecycle:
+    def __init__(self, page):
+        self.page = page
+
+    def run(self, work):
+        return work(self.page)
+
+
+def test_downloader_network_engine_needs_no_extension(tmp_path):
+    settings = make_settings(download_engine='network')
+    with LocalHttpServer({'/video.720.mp4': lambda h: (200, {'Content-Type': 'video/mp4'}, b'x' * 100)}) as server:
+        page = StandInPage([FakeResponse(server.url('/video.720.mp4'), {'content-type': 'video/mp4', 'content-length': '100'})])
+        downloader = Downloader(CaptureLogger(), settings)
+        downloader.lifecycle = lambda download_path: FakeLifecycle(page)
+
+        path = downloader.download_video(VIDEO_PAGE, 'clip', destination_folder=str(tmp_path))
+
+        assert server.requests[-1][2]['User-Agent'] == 'StandIn/1.0'
+    assert path.read_bytes() == b'x' * 100
@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from .fakes.capture_logger import CaptureLogger
+from .fakes.http_server import LocalHttpServer
+from .fakes.writing_downloader import videos
+from ...app.downloader import Downloader, ResolvedVideo, target_path
+from ...app.media_resolver import MEDIA_MP4, MediaExpiredError, MediaStream, media_expiry
+from ...app.settings import Settings
+
+BODY = b'x' * 100
+
+
+class ResolvingDownloader(Downloader):
+    """Resolves videos to paths of a local server instead of loading their pages"""
+
+    def __init__(self, server, media, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.server = server
+        # Called with (video, resolution number) to pick the path a resolution hands out
+        self.media = media
+        self.events = []
+        self.resolutions = {}
+        self._events_lock = threading.Lock()
+
+    def resolve_video(self, video, destination_folder=None, low_res=False):
+        with self._events_lock:
+            count = self.resolutions[video.url] = self.resolutions.get(video.url, 0) + 1
+            self.events.append(('resolved', video.title))
+        url = self.server.url(self.media(video, count))
+        stream = MediaStream(url, MEDIA_MP4)
+        expires_at = media_expiry(url, time.time(), self.settings.pipeline_url_ttl_sec)
+        return ResolvedVideo(video, target_path(video.title, destination_folder), stream, {}, expires_at)
+
+    def transfer_video(self, resolved, progress=None, cancelled=None):
+        path = super().transfer_video(resolved, progress, cancelled)
+        with self._events_lock:
+            self.events.append(('transferred', resolved.video.title))
+        return path
+
+
+def media_route(delay=0.0):
+    def route(handler):
+        time.sleep(delay)
+        return 200, {'Content-Type': 'video/mp4'}, BODY
+    return route
+
+
+def make_downloader(server, media=lambda video, count: '/media', **overrides):
+    values = dict(
+        download_engine='network',
+        use_browser_server=False,
+        download_pipeline=True,
+        pipeline_lookahead=2,
+    )
+    values.update(overrides)
+    logger = CaptureLogger()
+    return ResolvingDownloader(server, media, logger, Settings(**values))
+
+
+def test_media_expiry_reads_the_expires_parameter():
+    assert media_expiry('https://cdn/v.mp4?id=1&expires=1760000000', 100.0, 900) == 1760000000
+    assert media_expiry('https://cdn/v.mp4?Expires=1760000000123', 100.0, 900) == 1760000000.123
+    assert media_expiry('https://cdn/v.mp4?id=1', 100.0, 900) == 1000.0
+
+
+def test_videos_are_resolved_ahead_of_their_transfers_within_the_lookahead(tmp_path):
+    routes = {'/media': media_route(delay=0.02)}
+    with LocalHttpServer(routes) as server:
+        downloader = make_downloader(server)
+        batch = videos(8)
+        downloader.download_videos(batch, str(tmp_path))
+
+    for video in batch:
+        assert open(target_path(video.title, str(tmp_path)), 'rb').read() == BODY
+    assert downloader.budget.bytes == 800
+    events = downloader.events
+    # The next video was resolved while the first one was still transferring
+    assert events.index(('resolved', batch[1].title)) < events.index(('transferred', batch[0].title))
+    ahead = [
+        sum(kind == 'resolved' for kind, _ in events[:end]) - sum(kind == 'transferred' for kind, _ in events[:end])
+        for end in range(len(events) + 1)
+    ]
+    # The ready queue, plus one video in each resolver's and each transfer thread's hands
+    assert max(ahead) <= 2 + 1 + 1
+
+
+def test_urls_rejected_as_expired_are_resolved_again(tmp_path):
+    routes = {'/media': media_route(), '/expired': lambda handler: (403, {}, b'expired')}
+    batch = videos(2)
+    first = lambda video, count: '/expired' if video is batch[0] and count == 1 else '/media'
+    with LocalHttpServer(routes) as server:
+        downloader = make_downloader(server, first)
+        downloader.download_videos(batch, str(tmp_path))
+
+    assert downloader.resolutions == {batch[0].url: 2, batch[1].url: 1}
+    assert open(target_path(batch[0].title, str(tmp_path)), 'rb').read() == BODY
+    assert any('again' in message and '403' in message for message in downloader.logger.captured_logs['info'])
+    assert not any(path.name.endswith('.part') for path in tmp_path.iterdir())
+
+
+def test_urls_about_to_expire_are_resolved_again_without_a_transfer(tmp_path):
+    soon = int(time.time()) + 5
+    batch = videos(1)
+    first = lambda video, count: f'/media?expires={soon}' if count == 1 else '/media'
+    with LocalHttpServer({'/media': media_route()}) as server:
+        downloader = make_downloader(server, first, pipeline_url_margin_sec=60)
+        downloader.download_videos(batch, str(tmp_path))
+        requested = [path for _, path, _ in server.requests]
+
+    assert downloader.resolutions == {batch[0].url: 2}
+    assert requested == ['/media']
+
+
+def test_a_url_that_keeps_expiring_fails_the_run(tmp_path):
+    routes = {'/expired': lambda handler: (410, {}, b'gone')}
+    with LocalHttpServer(routes) as server:
+        downloader = make_downloader(server, lambda video, count: '/expired', pipeline_max_resolves=2)
+        with pytest.raises(MediaExpiredError):
+            downloader.download_videos(videos(1), str(tmp_path))
+
+    assert downloader.resolutions == {videos(1)[0].url: 2}
@@ -0,0 +1,62 @@
+import os
+import yaml
+
+from .factory import CLIAppTestFactory
+from .fakes.capture_logger import CaptureLogger
+from ...app.browser import Browser
+from ...app.cli_app import GOODSTUFF_VIDEOS
+from ...app.extractor import Extractor
+from ...app.settings import Settings
+
+
+class FailingBrowser(Browser):
+    """A browser that must never be used"""
+    def get_page_html(self, url: str) -> str:
+        raise AssertionError(f"Browser launched for {url}")
+
+
+def create_offline_app(tmp_path):
+    settings = Settings(link_cache_dir=str(tmp_path / 'links'))
+    logger = CaptureLogger()
+    extractor = Extractor(settings=settings, logger=logger, browser=FailingBrowser(settings))
+    app = CLIAppTestFactory.create_cli_app(extractor=extractor, settings=settings)
+    return app, extractor
+
+
+def write_link_cache(extractor, url, videos):
+    os.makedirs(extractor.cache_dir, exist_ok=True)
+    with open(extractor._get_cache_path(url), 'w') as f:
+        yaml.safe_dump([{'url': u, 'title': t} for u, t in videos], f)
+
+
+def test_plan_uses_link_cache_and_files_on_disk(tmp_path, capsys):
+    app, extractor = create_offline_app(tmp_path)
+    dest = tmp_path / 'videos'
+    dest.mkdir()
+    write_link_cache(extractor, GOODSTUFF_VIDEOS[0], [
+        ('https://vkvideo.ru/video-1_1', 'First'),
+        ('https://vkvideo.ru/video-1_2', 'Second'),
+        (app.settings.skiplist[0], 'Skipped'),
+    ])
+    (dest / 'Second.mp4').write_bytes(b'')
+
+    app.run(['plan', '-d', str(dest)])
+
+    out = capsys.readouterr().out
+    assert 'download  First' in out
+    assert 'present   Second' in out
+    assert 'skip      Skipped' in out
+    assert f'uncached  {GOODSTUFF_VIDEOS[1]}' in out
+    assert '1 to download, 1 already present, 1 skipped, 1 pages not cached' in out
+    assert app.downloader.download_calls == 0
+
+
+def test_offline_flag_reports_plan_for_url(tmp_path, capsys):
+    app, extractor = create_offline_app(tmp_path)
+    url = 'https://vkvideo.ru/@club1/all'
+    write_link_cache(extractor, url, [('https://vkvideo.ru/video-1_3', 'Third')])
+
+    app.run(['url', url, '--offline', '-d', str(tmp_path)])
+
+    assert 'download  Third' in capsys.readouterr().out
+    assert app.downloader.download_calls == 0
@@ -0,0 +1,68 @@
+import hashlib
+import os
+
+import pytest
+
+from .fakes.capture_logger import CaptureLogger
+from .fakes.writing_downloader import WritingDownloader, videos
+from ...app.downloader import target_path
+from ...app.postprocess import PostProcessor, run_steps, resolve_step
+from ...app.settings import Settings
+
+
+def truncate(path, settings):
+    """Plug-in step that halves the file"""
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        f.truncate(size // 2)
+    return path
+
+
+def broken(path, settings):
+    raise RuntimeError('broken step')
+
+
+def test_steps_report_timing_and_savings_and_survive_failures(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'x' * 1000)
+    steps = [f'{__name__}:truncate', f'{__name__}:broken', 'hash']
+
+    reports = run_steps(str(path), steps, Settings())
+
+    assert [report.step for report in reports] == steps
+    assert reports[0].saved_bytes == 500 and reports[0].error is None
+    assert reports[1].error == 'broken step'
+    assert reports[2].error is None and reports[2].saved_bytes == 0
+    digest = hashlib.sha256(b'x' * 500).hexdigest()
+    assert (tmp_path / 'video.mp4.sha256').read_text() == f'{digest}  video.mp4\n'
+
+
+def test_unknown_steps_are_rejected():
+    with pytest.raises(ValueError):
+        resolve_step('gzip')
+    with pytest.raises(ValueError):
+        PostProcessor(Settings(post_processing=[f'{__name__}:missing'])).validate()
+
+
+def test_missing_ffmpeg_is_reported_as_step_error(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'x' * 10)
+
+    reports = run_steps(str(path), ['remux'], Settings(ffmpeg_path=str(tmp_path / 'no-ffmpeg')))
+
+    assert 'ffmpeg not found' in reports[0].error
+    assert path.read_bytes() == b'x' * 10
+
+
+def test_downloaded_files_are_processed_in_worker_processes(tmp_path):
+    settings = Settings(post_processing=[f'{__name__}:truncate'], post_processing_workers=1)
+    logger = CaptureLogger()
+    downloader = WritingDownloader(logger, settings, post_processor=PostProcessor(settings, logger))
+    batch = videos(2)
+
+    downloader.download_videos(batch, str(tmp_path))
+    reports = downloader.post_processor.wait()
+
+    assert len(reports) == 2
+    assert all(os.path.getsize(target_path(video.title, str(tmp_path))) == 50 for video in batch)
+    assert any('saved' in msg for msg in logger.captured_logs['info'])
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+from .fakes.capture_logger import CaptureLogger
+from ...app.downloader import Downloader
+from ...app.extractor import VideoDTO
+from ...app.profile_pool import ProfilePool
+from ...app.settings import Settings
+
+
+def make_profile(path):
+    (path / 'Default').mkdir(parents=True)
+    (path / 'Default' / 'Cookies').write_text('session-1')
+    (path / 'Default' / 'Preferences').write_text('{}')
+    (path / 'SingletonLock').write_text('locked')
+    (path / 'Default' / 'Cache').mkdir()
+    (path / 'Default' / 'Cache' / 'data_0').write_text('cached')
+
+
+def make_pool(tmp_path, concurrency=2):
+    make_profile(tmp_path / 'source')
+    settings = Settings(
+        chromium_profile_dir=str(tmp_path / 'source'),
+        profile_pool_dir=str(tmp_path / 'pool'),
+        download_concurrency=concurrency
+    )
+    return ProfilePool(settings, CaptureLogger())
+
+
+def test_single_slot_uses_source_profile(tmp_path):
+    pool = make_pool(tmp_path, concurrency=1)
+    with pool.acquire() as profile:
+        assert profile == str(tmp_path / 'source')
+    assert not (tmp_path / 'pool').exists()
+
+
+def test_concurrent_slots_get_distinct_clones(tmp_path):
+    pool = make_pool(tmp_path)
+    with pool.acquire() as first, pool.acquire() as second:
+        assert first != second
+        for profile in (first, second):
+            assert open(os.path.join(profile, 'Default', 'Cookies')).read() == 'session-1'
+            assert not os.path.exists(os.path.join(profile, 'SingletonLock'))
+            assert not os.path.exists(os.path.join(profile, 'Default', 'Cache'))
+
+
+def test_clone_refreshed_when_session_changes(tmp_path):
+    pool = make_pool(tmp_path)
+    pool.clone(0)
+    assert pool.is_fresh(0)
+
+    cookies = tmp_path / 'source' / 'Default' / 'Cookies'
+    cookies.write_text('session-2-longer')
+    assert not pool.is_fresh(0)
+    with pool.acquire() as first, pool.acquire() as second:
+        assert pool.is_fresh(0) and pool.is_fresh(1)
+        assert open(os.path.join(first, 'Default', 'Cookies')).read() == 'session-2-longer'
+
+
+def test_acquire_blocks_until_slot_is_free(tmp_path):
+    pool = make_pool(tmp_path, concurrency=1)
+    pool.settings.download_concurrency = 2
+    acquired = []
+    with pool.acquire(), pool.acquire():
+        thread = threading.Thread(target=lambda: acquired.append(pool.acquire().__enter__()))
+        thread.start()
+        time.sleep(0.05)
+        assert acquired == []
+    thread.join(0.5)
+    assert len(acquired) == 1
+
+
+def test_download_videos_runs_concurrently():
+    settings = Settings(download_concurrency=3)
+    active, peak = [], []
+    lock = threading.Lock()
+
+    class SlowDownloader(Downloader):
+        def download_video(self, url, desired_filename, low_res=False, destination_folder=None, progress=None, cancelled=None):
+            with lock:
+                active.append(url)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(url)
+
+    downloader = SlowDownloader(logger=CaptureLogger(), settings=settings)
+    videos = [VideoDTO(f'https://vkvideo.ru/video-1_{i}', f'v{i}') for i in range(6)]
+    downloader.download_videos(videos, skip=[videos[0]])
+    assert len(peak) == 5
+    assert max(peak) == 3
+
+
+def test_processes_sharing_a_pool_take_distinct_slots(tmp_path):
+    # Each pool stands for another process: file locks are per open file, not per process
+    first_process = make_pool(tmp_path, concurrency=1)
+    second_process = ProfilePool(first_process.settings, CaptureLogger())
+    with first_process.acquire() as first, second_process.acquire() as second:
+        assert first == str(tmp_path / 'source')
+        assert second == second_process.slot_dir(0)
+
+    first_process.settings.download_concurrency = 2
+    first_process._sessions = second_process._sessions = None
+    with first_process.acquire() as first, second_process.acquire() as second:
+        assert first == first_process.slot_dir(0)
+        assert second == second_process.slot_dir(1)
+        # A slot in use by the other process is neither handed out nor recloned
+        first_process.refresh()
+        with first_process.acquire() as third:
+            assert third == first_process.slot_dir(2)
+        assert os.path.exists(os.path.join(second, 'Default', 'Cookies'))
@@ -0,0 +1,89 @@
+import os
+import pstats
+import threading
+
+from .factory import CLIAppTestFactory
+from .fakes.capture_logger import CaptureLogger
+from ...app.profiler import RunProfiler
+from ...app.settings import Settings
+
+
+class FakeTracing:
+    """Records Playwright tracing calls and writes an empty trace file on stop"""
+    def __init__(self):
+        self.started = False
+
+    def start(self, **kwargs):
+        self.started = True
+
+    def stop(self, path):
+        with open(path, 'wb') as f:
+            f.write(b'')
+
+
+class FakeContext:
+    def __init__(self):
+        self.tracing = FakeTracing()
+
+
+def test_inactive_profiler_records_nothing(tmp_path):
+    profiler = RunProfiler(Settings(profiling_dir=str(tmp_path)), CaptureLogger())
+    context = FakeContext()
+    with profiler.trace(context, 'browser'), profiler.operation('goto', 'https://vkvideo.ru'):
+        pass
+    assert profiler.operations == []
+    assert not context.tracing.started
+    assert profiler.stop() is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_profiler_writes_traces_profile_and_summary(tmp_path):
+    profiler = RunProfiler(Settings(profiling_dir=str(tmp_path)), CaptureLogger())
+    run_dir = profiler.start()
+    assert os.path.dirname(run_dir) == str(tmp_path)
+
+    context = FakeContext()
+    with profiler.trace(context, 'browser'):
+        with profiler.operation('goto', 'https://vkvideo.ru/@club1/all'):
+            sum(i * i for i in range(10000))
+        with profiler.operation('content', 'https://vkvideo.ru/@club1/all'):
+            pass
+    summary_path = profiler.stop()
+
+    assert context.tracing.started
+    assert sorted(os.listdir(run_dir)) == ['python.prof', 'summary.txt', 'trace-001-browser.zip']
+    with open(summary_path) as f:
+        summary = f.read()
+    assert 'Slowest page operations' in summary
+    assert summary.index('goto') < summary.index('content')
+    assert 'Hottest Python functions' in summary
+    assert not profiler.active
+
+
+def busy_download_worker():
+    return sum(i * i for i in range(10000))
+
+
+def test_profile_includes_worker_threads(tmp_path):
+    profiler = RunProfiler(Settings(profiling_dir=str(tmp_path)), CaptureLogger())
+    run_dir = profiler.start()
+    thread = threading.Thread(target=busy_download_worker)
+    thread.start()
+    thread.join()
+    profiler.stop()
+
+    stats = pstats.Stats(os.path.join(run_dir, 'python.prof'))
+    assert any(function == 'busy_download_worker' for _, _, function in stats.stats)
+
+
+def test_cli_profile_option_wraps_the_run(tmp_path):
+    app = CLIAppTestFactory.create_cli_app(settings=Settings(link_cache_dir=str(tmp_path / 'links')))
+    profile_root = tmp_path / 'profiling'
+
+    app.run(['goodstuff', '-d', str(tmp_path / 'videos'), '--profile', str(profile_root)])
+
+    runs = os.listdir(profile_root)
+    assert len(runs) == 1
+    assert os.path.exists(profile_root / runs[0] / 'summary.txt')
+    assert os.path.exists(profile_root / runs[0] / 'python.prof')
+    assert app.downloader.download_calls > 0
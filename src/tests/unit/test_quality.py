@@ -0,0 +1,109 @@
+import pytest
+
+from .fakes.capture_logger import CaptureLogger
+from .fakes.http_server import LocalHttpServer
+from ...app.downloader import Downloader
+from ...app.http_client import HttpClient
+from ...app.quality import QualityError, QualityStrategy, SizeProbe, VideoVariant
+from ...app.settings import Settings
+
+
+def make_variants(sizes):
+    labels = ['240p', '480p', '720p', '1080p']
+    return [
+        VideoVariant(index=i, url=f'https://cdn.example/{label}.mp4', label=label, size=size)
+        for i, (label, size) in enumerate(zip(labels, sizes))
+    ]
+
+
+class FakeSizeProbe(SizeProbe):
+    """A size probe returning predefined sizes by URL"""
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.probed = []
+
+    def probe(self, url):
+        self.probed.append(url)
+        return self.sizes.get(url)
+
+
+def test_max_resolution_picks_highest():
+    variants = make_variants([None, None, None, None])
+    assert QualityStrategy().select(variants).label == '1080p'
+
+
+def test_max_resolution_uses_panel_order_without_labels():
+    variants = [VideoVariant(index=0, url='a'), VideoVariant(index=1, url='b')]
+    assert QualityStrategy().select(variants).url == 'b'
+
+
+def test_max_bytes_picks_largest_fitting():
+    variants = make_variants([10, 20, 30, 40])
+    strategy = QualityStrategy('max-bytes', max_bytes=25)
+    assert strategy.select(variants).label == '480p'
+
+
+def test_max_bytes_raises_when_nothing_fits():
+    variants = make_variants([10, 20, 30, 40])
+    with pytest.raises(QualityError):
+        QualityStrategy('max-bytes', max_bytes=5).select(variants)
+
+
+def test_bandwidth_budget():
+    variants = make_variants([100, 200, 300, 400])
+    strategy = QualityStrategy('bandwidth', bandwidth_bytes_per_sec=10, max_transfer_sec=30)
+    assert strategy.select(variants).label == '720p'
+
+
+def test_strategy_requires_limits():
+    with pytest.raises(ValueError):
+        QualityStrategy('max-bytes')
+    with pytest.raises(ValueError):
+        QualityStrategy('fastest')
+
+
+def test_size_probe_uses_head_content_length():
+    routes = {'/video.mp4': lambda h: (200, {'Content-Length': '12345'}, b'')}
+    with LocalHttpServer(routes) as server:
+        probe = SizeProbe(HttpClient(), CaptureLogger())
+        assert probe.probe(server.url('/video.mp4')) == 12345
+        assert [method for method, _, _ in server.requests] == ['HEAD']
+
+
+def test_size_probe_falls_back_to_range_request():
+    def route(handler):
+        if handler.command == 'HEAD':
+            return 405, {}, b''
+        assert handler.headers['Range'] == 'bytes=0-0'
+        return 206, {'Content-Range': 'bytes 0-0/98765'}, b'x'
+
+    with LocalHttpServer({'/video.mp4': route}) as server:
+        probe = SizeProbe(HttpClient(), CaptureLogger())
+        assert probe.probe(server.url('/video.mp4')) == 98765
+
+
+def test_size_probe_reuses_connection():
+    routes = {'/a.mp4': lambda h: (200, {'Content-Length': '1'}, b'')}
+    with LocalHttpServer(routes) as server:
+        probe = SizeProbe(HttpClient(), CaptureLogger())
+        for _ in range(3):
+            probe.probe(server.url('/a.mp4'))
+        assert server.connections == 1
+
+
+def test_downloader_probes_sizes_for_size_aware_strategy():
+    variants = make_variants([None, None, None, None])
+    sizes = {variant.url: (variant.index + 1) * 100 for variant in variants}
+    probe = FakeSizeProbe(sizes)
+    settings = Settings(quality_strategy='max-bytes', max_bytes_per_video=250)
+    downloader = Downloader(logger=CaptureLogger(), settings=settings, size_probe=probe)
+    assert downloader.select_variant(variants).label == '480p'
+    assert len(probe.probed) == 4
+
+
+def test_downloader_skips_probing_for_max_resolution():
+    probe = FakeSizeProbe({})
+    downloader = Downloader(logger=CaptureLogger(), settings=Settings(), size_probe=probe)
+    assert downloader.select_variant(make_variants([None] * 4)).label == '1080p'
+    assert downloader.select_variant(make_variants([None] * 4), low_res=True).label == '240p'
+    assert probe.probed == []
@@ -0,0 +1,232 @@
+import threading
+import time
+
+import pytest
+
+from .fakes.capture_logger import CaptureLogger
+from .fakes.http_server import LocalHttpServer
+from ...app.downloader import DownloadCancelled
+from ...app.media_resolver import MEDIA_DASH, MEDIA_HLS, HttpDownloadEngine, MediaStream
+from ...app.quality import QUALITY_MAX_BYTES, QualityStrategy
+from ...app.segments import (
+    CONTAINER_MP4, CONTAINER_TS, SegmentDownloader, SegmentError, parse_dash, parse_hls_media
+)
+from ...app.settings import Settings
+
+MPD = '''<?xml version="1.0"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" mediaPresentationDuration="PT10S">
+  <Period>
+    <AdaptationSet mimeType="video/mp4">
+      <SegmentTemplate initialization="$RepresentationID$/init.mp4" media="$RepresentationID$/$Number%03d$.m4s" startNumber="0">
+        <SegmentTimeline><S t="0" d="4000" r="1"/><S d="2000"/></SegmentTimeline>
+      </SegmentTemplate>
+      <Representation id="v360" bandwidth="500000" height="360"/>
+      <Representation id="v720" bandwidth="2000000" height="720"/>
+    </AdaptationSet>
+    <AdaptationSet mimeType="audio/mp4">
+      <Representation id="a1" bandwidth="128000">
+        <SegmentTemplate initialization="a/init.mp4" media="a/$Number$.m4s" duration="4" timescale="1"/>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+'''
+
+SINGLE_FILE_MPD = """<?xml version="1.0"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" mediaPresentationDuration="PT10S">
+  <Period>
+    <AdaptationSet mimeType="video/mp4">
+      <Representation id="v360" bandwidth="500000" height="360"><BaseURL>v360.mp4</BaseURL></Representation>
+      <Representation id="v720" bandwidth="2000000" height="720">
+        <BaseURL>v720.mp4</BaseURL><SegmentBase indexRange="700-799"><Initialization range="0-699"/></SegmentBase>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+
+def ranged(handler, body):
+    """Answer like a file server, honouring a Range header"""
+    start, _, end = handler.headers.get('Range', '').replace('bytes=', '').partition('-')
+    if not start:
+        return 200, {}, body
+    end = min(int(end), len(body) - 1) if end else len(body) - 1
+    return 206, {'Content-Range': f'bytes {start}-{end}/{len(body)}'}, body[int(start):end + 1]
+
+
+def segment_body(index):
+    return f'<segment {index:03d}>'.encode() * 64
+
+
+class SegmentServer(LocalHttpServer):
+    """Serves an fMP4 HLS playlist of `count` segments; early segments are the slowest"""
+    def __init__(self, count, delay=0.001):
+        self.count = count
+        self.delay = delay
+        self.failures = {}
+        self.active = 0
+        self.peak = 0
+        self.requested = []
+        self.lock = threading.Lock()
+        routes = {
+            '/v/index.m3u8': lambda h: (200, {'Content-Type': 'application/vnd.apple.mpegurl'}, self.playlist()),
+            '/v/init.mp4': lambda h: (200, {}, b'<init>'),
+        }
+        for index in range(count):
+            routes[f'/v/{index}.m4s'] = lambda h, index=index: self.segment(index)
+        super().__init__(routes)
+
+    def playlist(self):
+        lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:4', '#EXT-X-MAP:URI="init.mp4"']
+        for index in range(self.count):
+            lines += ['#EXTINF:4.0,', f'{index}.m4s?sig=abc']
+        return ('\n'.join(lines + ['#EXT-X-ENDLIST']) + '\n').encode()
+
+    def segment(self, index):
+        with self.lock:
+            self.requested.append(index)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            failure = self.failures.pop(index, None)
+        try:
+            if failure:
+                return failure, {}, b'failed'
+            time.sleep(self.delay * (self.count - index))
+            return 200, {}, segment_body(index)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def expected(self):
+        return b'<init>' + b''.join(segment_body(index) for index in range(self.count))
+
+
+def make_downloader(**overrides):
+    values = dict(segment_workers=4, segment_buffer=6)
+    values.update(overrides)
+    return SegmentDownloader(Settings(**values), CaptureLogger())
+
+
+def test_hls_media_playlist_with_map_and_byte_ranges():
+    text = '''#EXTM3U
+#EXT-X-MAP:URI="init.mp4",BYTERANGE="720@0"
+#EXTINF:4.0,
+#EXT-X-BYTERANGE:1000@720
+media.mp4
+#EXTINF:4.0,
+#EXT-X-BYTERANGE:500
+media.mp4
+#EXT-X-ENDLIST
+'''
+    playlist = parse_hls_media(text, 'https://cdn/v/index.m3u8')
+    assert playlist.container == CONTAINER_MP4
+    assert playlist.init.byte_range == (0, 720)
+    assert [(s.url, s.byte_range) for s in playlist.segments] == [
+        ('https://cdn/v/media.mp4', (720, 1000)),
+        ('https://cdn/v/media.mp4', (1720, 500)),
+    ]
+    assert parse_hls_media('#EXTINF:4,\nseg0.ts\n', 'https://cdn/v/index.m3u8').container == CONTAINER_TS
+    with pytest.raises(SegmentError):
+        parse_hls_media('#EXT-X-KEY:METHOD=AES-128,URI="key"\n#EXTINF:4,\nseg0.ts\n', 'https://cdn/v/index.m3u8')
+
+
+def test_dash_picks_the_best_video_and_the_audio_track():
+    video, audio = parse_dash(MPD, 'https://cdn/v/manifest.mpd')
+    assert video.init.url == 'https://cdn/v/v720/init.mp4'
+    assert [s.url for s in video.segments] == [f'https://cdn/v/v720/{n:03d}.m4s' for n in range(3)]
+    assert (audio.name, len(audio.segments), audio.segments[0].url) == ('audio', 3, 'https://cdn/v/a/1.m4s')
+
+
+def test_dash_honours_the_resolver_height_and_the_quality_strategy():
+    video, _ = parse_dash(MPD, 'https://cdn/v/manifest.mpd', height=360)
+    assert video.init.url == 'https://cdn/v/v360/init.mp4'
+    # 2 Mbit/s for 10 s are 2.5 MB, over the limit; 500 kbit/s are 625 kB
+    strategy = QualityStrategy(QUALITY_MAX_BYTES, max_bytes=10**6)
+    video, _ = parse_dash(MPD, 'https://cdn/v/manifest.mpd', strategy=strategy)
+    assert video.init.url == 'https://cdn/v/v360/init.mp4'
+
+
+@pytest.mark.timeout(5)
+def test_single_file_dash_representation_is_fetched_in_byte_ranges(tmp_path):
+    body = bytes(range(256)) * 10000
+    routes = {
+        '/v/manifest.mpd': lambda h: (200, {}, SINGLE_FILE_MPD.encode()),
+        '/v/v720.mp4': lambda h: ranged(h, body),
+    }
+    path = str(tmp_path / 'video.mp4')
+    with LocalHttpServer(routes) as server:
+        make_downloader(segment_range_mb=1).download(MediaStream(server.url('/v/manifest.mpd'), MEDIA_DASH, height=720), path)
+
+    assert open(path, 'rb').read() == body
+    ranges = sorted(headers['Range'] for _, request_path, headers in server.requests if request_path == '/v/v720.mp4')
+    assert ranges == ['bytes=0-0', 'bytes=0-1048575', 'bytes=1048576-2097151', 'bytes=2097152-2559999']
+
+
+def test_segments_are_fetched_in_parallel_and_written_in_order(tmp_path):
+    downloader = make_downloader()
+    path = str(tmp_path / 'video.mp4')
+    ahead = []
+    with SegmentServer(count=24) as server:
+        def progress(text):
+            with server.lock:
+                ahead.append(len(server.requested))
+
+        stream = MediaStream(server.url('/v/index.m3u8?sig=abc'), MEDIA_HLS)
+        downloader.download(stream, path, progress=progress)
+
+    assert open(path, 'rb').read() == server.expected()
+    assert 1 < server.peak <= 4
+    # After the init segment and `written` segments are on disk, at most `segment_buffer` more were requested
+    assert all(requested - (written - 1) <= 6 for written, requested in enumerate(ahead, start=1))
+    assert server.connections <= 5
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['video.mp4']
+
+
+def test_interrupted_download_resumes_at_the_first_missing_segment(tmp_path):
+    downloader = make_downloader(segment_retries=2)
+    path = str(tmp_path / 'video.mp4')
+    with SegmentServer(count=12, delay=0) as server:
+        stream = MediaStream(server.url('/v/index.m3u8'), MEDIA_HLS)
+        server.failures[7] = 404
+        with pytest.raises(OSError):
+            downloader.download(stream, path)
+        assert (tmp_path / 'video.mp4.part.segments.json').exists()
+
+        server.requested.clear()
+        server.failures[9] = 503
+        downloader.download(stream, path)
+
+    assert sorted(server.requested) == [7, 8, 9, 9, 10, 11]
+    assert open(path, 'rb').read() == server.expected()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['video.mp4']
+
+
+def test_segment_cancelled_during_a_retry_is_fetched_again_on_resume(tmp_path):
+    downloader = make_downloader(segment_workers=1, segment_buffer=1, segment_retries=3)
+    path = str(tmp_path / 'video.mp4')
+    cancelled = threading.Event()
+    with SegmentServer(count=6, delay=0) as server:
+        stream = MediaStream(server.url('/v/index.m3u8'), MEDIA_HLS)
+        server.failures[3] = 503
+        fail = server.segment
+        server.segment = lambda index: (cancelled.set() if index == 3 else None) or fail(index)
+        with pytest.raises(DownloadCancelled):
+            downloader.download(stream, path, cancelled=cancelled)
+
+        server.segment = fail
+        server.requested.clear()
+        downloader.download(stream, path)
+
+    assert sorted(server.requested) == [3, 4, 5]
+    assert open(path, 'rb').read() == server.expected()
+
+
+def test_engine_downloads_manifests_with_the_segment_downloader(tmp_path):
+    engine = HttpDownloadEngine(Settings(segment_workers=2, segment_buffer=3), CaptureLogger())
+    with SegmentServer(count=5, delay=0) as server:
+        master = f'#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=1,RESOLUTION=1280x720\n{server.url("/v/index.m3u8")}\n'
+        server.routes['/master.m3u8'] = lambda h: (200, {}, master.encode())
+        path = engine.download(MediaStream(server.url('/master.m3u8'), MEDIA_HLS), str(tmp_path / 'clip.mp4'))
+
+    assert open(path, 'rb').read() == server.expected()
@@ -0,0 +1,96 @@
+import os
+
+from .factory import CLIAppTestFactory
+from .fakes.capture_logger import CaptureLogger
+from ...app.extractor import VideoDTO
+from ...app.settings import Settings
+from ...app.skiplist import Skiplist, video_key
+
+
+def make_skiplist(tmp_path, text):
+    path = tmp_path / 'skiplist.txt'
+    path.write_text(text)
+    settings = Settings(skiplist_path=str(path), skiplist_reload_sec=0)
+    return Skiplist(settings, CaptureLogger()), path
+
+
+def rewrite(path, text):
+    # Make sure the change is visible even on file systems with coarse timestamps
+    stat = os.stat(path)
+    path.write_text(text)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_video_key_accepts_urls_and_bare_ids():
+    assert video_key('https://vkvideo.ru/video-180058315_456239188') == '-180058315_456239188'
+    assert video_key('video42_7') == '42_7'
+    assert video_key('https://vkvideo.ru/@club1/all') is None
+
+
+def test_rules_match_ids_owners_and_titles(tmp_path):
+    skiplist, _ = make_skiplist(tmp_path, '\n'.join([
+        '# comment',
+        'https://vkvideo.ru/video-1_1',
+        'video-1_2',
+        'owner:-2',
+        'title:^trailer\\b',
+        'title:[unclosed',
+        'not a rule',
+    ]))
+
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-1_1', 'A'))
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-1_2', 'B'))
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-2_99', 'Any video of owner -2'))
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-3_1', 'Trailer of something'))
+    assert not skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-3_2', 'Full movie, not a trailer'))
+    # Built-in rules from Settings.skiplist still apply
+    assert skiplist.is_skipped(VideoDTO(Settings.skiplist[0], 'Built-in'))
+
+
+def test_patterns_that_cannot_be_joined_are_searched_on_their_own(tmp_path):
+    # An inline global flag is only valid at the start of the whole expression, and \1 would
+    # point at another pattern's group once joined
+    skiplist, _ = make_skiplist(tmp_path, 'title:(?i)teaser\ntitle:(\\w+) \\1\ntitle:^trailer\\b\n')
+
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-3_1', 'TEASER 2'))
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-3_2', 'bye bye'))
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-3_3', 'Trailer'))
+    assert not skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-3_4', 'Full movie'))
+    assert skiplist.title_regex.pattern == '(?:^trailer\\b)'
+
+
+def test_changed_file_is_applied_incrementally(tmp_path):
+    skiplist, path = make_skiplist(tmp_path, 'video-1_1\ntitle:^trailer\n')
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-1_1', 'A'))
+    title_regex = skiplist.title_regex
+
+    rewrite(path, 'video-1_2\ntitle:^trailer\n')
+    assert not skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-1_1', 'A'))
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-1_2', 'B'))
+    assert skiplist.title_regex is title_regex
+
+    rewrite(path, 'video-1_2\ntitle:^teaser\n')
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-5_5', 'Teaser'))
+    assert not skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-5_6', 'Trailer'))
+    assert skiplist.title_regex is not title_regex
+
+
+def test_removing_one_of_two_rules_for_the_same_video_or_owner_keeps_it_skipped(tmp_path):
+    skiplist, path = make_skiplist(tmp_path, 'https://vkvideo.ru/video-1_1\nvideo-1_1\nowner: -2\nowner:-2\n')
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-1_1', 'A'))
+
+    rewrite(path, 'video-1_1\nowner:-2\n')
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-1_1', 'A'))
+    assert skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-2_9', 'B'))
+
+    rewrite(path, '')
+    assert not skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-1_1', 'A'))
+    assert not skiplist.is_skipped(VideoDTO('https://vkvideo.ru/video-2_9', 'B'))
+
+
+def test_cli_filter_uses_skiplist_file(tmp_path):
+    skiplist, _ = make_skiplist(tmp_path, 'owner:-7\n')
+    app = CLIAppTestFactory.create_cli_app(settings=skiplist.settings)
+    app.skiplist = skiplist
+    videos = [VideoDTO('https://vkvideo.ru/video-7_1', 'Skipped'), VideoDTO('https://vkvideo.ru/video-8_1', 'Kept')]
+    assert app.filter(videos) == [videos[1]]
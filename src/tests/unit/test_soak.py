@@ -0,0 +1,34 @@
+import os
+
+from ..soak.harness import Sample, SoakRun, growth, over_limits
+
+
+def samples(**metrics):
+    """Samples where each given metric follows its list of values and the others stay flat."""
+    count = len(next(iter(metrics.values())))
+    base = dict(rss_mb=40.0, fds=5, threads=2, pages=0, objects=30000)
+    return [Sample(cycle=index, **dict(base, **{name: values[index] for name, values in metrics.items()})) for index in range(count)]
+
+
+def test_growth_compares_the_medians_of_both_ends():
+    # One slow collection at the start and a download in flight at the end are not growth
+    flat = samples(objects=[30000, 39000, 30000, 30000, 30000, 30000, 30100, 30000], pages=[0, 0, 0, 0, 0, 0, 1, 0])
+    assert over_limits(growth(flat, window=3)) == []
+
+
+def test_steady_growth_fails_the_run():
+    leaking = samples(pages=[0, 5, 10, 15, 20, 25], rss_mb=[40, 44, 48, 52, 56, 60])
+    grown = growth(leaking, window=2)
+    assert grown['pages'] == 20 and grown['rss_mb'] == 16
+    assert over_limits(grown) == ['pages grew by 20 (limit 0)']
+    assert over_limits(grown, {'rss_mb': 10}) == ['rss_mb grew by 16 (limit 10)']
+
+
+def test_download_cycles_leave_no_pages_open(tmp_path):
+    # The downloads page opened to follow each transfer used to stay open until the browser was relaunched
+    run = SoakRun(str(tmp_path), videos=3)
+    result = run.run(cycles=20, sample_every=5)
+    assert [s.cycle for s in result] == [0, 5, 10, 15, 20]
+    assert [s.pages for s in result] == [0] * 5
+    assert os.listdir(run.downloads) == []
+    assert over_limits(growth(result[1:], window=2)) == []
@@ -0,0 +1,133 @@
+import errno
+import json
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from .fakes.capture_logger import CaptureLogger
+from .fakes.writing_downloader import videos
+from ...app.downloader import Downloader, target_path
+from ...app.settings import Settings
+from ...app import staging as staging_module
+from ...app.staging import STAGED, STORED, StagingArea, StagingError, move_file
+
+
+class StagingDownloader(Downloader):
+    """Writes the video where download_video saves it instead of downloading"""
+    size = 1000
+
+    def _download_via_network(self, lifecycle, url, path, progress=None, cancelled=None, egress=None):
+        with open(path, 'wb') as f:
+            f.write(b'x' * self.size)
+        return Path(path)
+
+
+def make_settings(tmp_path, **overrides):
+    values = dict(
+        download_engine='network',
+        use_browser_server=False,
+        staging_dir=str(tmp_path / 'scratch'),
+        staging_min_free_mb=0,
+        staging_dest_min_free_mb=0,
+    )
+    values.update(overrides)
+    return Settings(**values)
+
+
+def read_manifest(staging):
+    with open(staging.manifest_path) as f:
+        return {entry['path']: entry for entry in json.load(f)['files']}
+
+
+def test_downloads_land_in_staging_and_are_moved_to_the_destination(tmp_path):
+    settings = make_settings(tmp_path)
+    stored = []
+    staging = StagingArea(settings, CaptureLogger(), on_stored=stored.append)
+    downloader = StagingDownloader(CaptureLogger(), settings, staging=staging)
+    destination = tmp_path / 'nas'
+    batch = videos(3)
+
+    downloader.download_videos(batch, str(destination))
+    left = staging.wait()
+    downloader.close()
+
+    paths = [target_path(video.title, str(destination)) for video in batch]
+    assert left == []
+    assert staging._reserved == {}
+    assert sorted(stored) == sorted(paths)
+    assert all(os.path.getsize(path) == 1000 for path in paths)
+    assert {entry['state'] for entry in read_manifest(staging).values()} == {STORED}
+    assert not os.listdir(os.path.dirname(staging.path_for(paths[0])))
+    # Staged bytes count against the run budget as soon as the download finished
+    assert downloader.budget.bytes == 3000
+
+
+def test_files_stay_staged_without_space_at_the_destination_and_are_moved_by_the_next_run(tmp_path):
+    settings = make_settings(tmp_path, staging_dest_min_free_mb=2**40)
+    staging = StagingArea(settings, CaptureLogger())
+    final = str(tmp_path / 'nas' / 'video.mp4')
+    staged = staging.path_for(final)
+    os.makedirs(os.path.dirname(staged))
+    with open(staged, 'wb') as f:
+        f.write(b'x' * 10)
+
+    staging.submit(staged, final)
+    left = staging.wait()
+
+    assert [entry.state for entry in left] == [STAGED]
+    assert 'MB free' in read_manifest(staging)[final]['error']
+    assert staging.pending(final) is not None
+    assert not os.path.exists(final)
+
+    settings.staging_dest_min_free_mb = 0
+    next_run = StagingArea(settings, CaptureLogger())
+    assert next_run.resume() == 1
+    assert next_run.wait() == []
+    assert open(final, 'rb').read() == b'x' * 10
+    assert read_manifest(next_run)[final]['state'] == STORED
+
+
+def test_downloads_wait_for_scratch_space_and_fail_if_nothing_frees_it(tmp_path):
+    staging = StagingArea(make_settings(tmp_path, staging_min_free_mb=2**40), CaptureLogger())
+    with pytest.raises(StagingError):
+        staging.reserve(str(tmp_path / 'scratch' / 'video.mp4'))
+
+
+def test_reservations_of_downloads_in_flight_count_against_the_free_space(tmp_path, monkeypatch):
+    monkeypatch.setattr(staging_module, 'free_bytes', lambda path: 1000 * 2**20)
+    staging = StagingArea(make_settings(tmp_path, staging_min_free_mb=100), CaptureLogger())
+    staging.reserve('first.mp4', 600 * 2**20)
+    # Unknown sizes reserve staging_min_free_mb
+    staging.reserve('second.mp4')
+
+    started = threading.Event()
+    waiting = threading.Thread(target=lambda: (staging.reserve('third.mp4', 600 * 2**20), started.set()))
+    waiting.start()
+    assert not started.wait(0.1)
+
+    staging.release('first.mp4')
+    assert started.wait(0.5)
+    waiting.join()
+    with pytest.raises(StagingError):
+        StagingArea(make_settings(tmp_path), CaptureLogger()).reserve('huge.mp4', 2000 * 2**20)
+
+
+def test_moves_across_filesystems_copy_through_a_partial_file(tmp_path, monkeypatch):
+    source = tmp_path / 'scratch.mp4'
+    source.write_bytes(b'video')
+    target = tmp_path / 'nas.mp4'
+    replace = os.replace
+
+    def cross_device(src, dst):
+        if src == str(source):
+            raise OSError(errno.EXDEV, 'Invalid cross-device link')
+        assert src == str(target) + '.part'
+        replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', cross_device)
+    move_file(str(source), str(target))
+
+    assert target.read_bytes() == b'video'
+    assert not source.exists() and not os.path.exists(str(target) + '.part')
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+from ...app.factory import Factory
+from ...app.lazy import Lazy
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+HEAVY_MODULES = ['playwright', 'bs4', 'yaml']
+
+
+def test_entry_point_does_not_import_heavy_dependencies():
+    code = (
+        "import sys\n"
+        "import src.app.main\n"
+        "from src.app.factory import Factory\n"
+        "Factory.create_cli_app().create_parser()\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '', f"Heavy modules imported at startup: {result.stdout.strip()}"
+
+
+def test_factory_defers_component_construction():
+    app = Factory.create_cli_app()
+    assert isinstance(app.extractor, Lazy) and not app.extractor.is_created
+    assert isinstance(app.downloader, Lazy) and not app.downloader.is_created
+    app.create_parser()
+    assert not app.extractor.is_created
+
+
+def test_lazy_constructs_once_on_first_use():
+    calls = []
+
+    class Target:
+        value = 42
+
+    def factory():
+        calls.append(1)
+        return Target()
+
+    lazy = Lazy(factory)
+    assert calls == []
+    assert lazy.value == 42
+    lazy.value = 7
+    assert lazy.get().value == 7
+    assert len(calls) == 1
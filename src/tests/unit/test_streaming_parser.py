@@ -0,0 +1,58 @@
+import glob
+import os
+import re
+
+import pytest
+from bs4 import BeautifulSoup
+
+from .fakes.capture_logger import CaptureLogger
+from ...app.browser import Browser
+from ...app.extractor import Extractor
+from ...app.settings import Settings
+from ...app.streaming_parser import iter_file_chunks, iter_video_links_from_chunks
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(__file__), 'recordings')
+RECORDINGS = sorted(glob.glob(os.path.join(RECORDINGS_DIR, '*.html')))
+
+
+def soup_links(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return [(link.get('href'), link.get_text(strip=True)) for link in soup.find_all('a', href=re.compile(r'^/video-'))]
+
+
+@pytest.mark.parametrize('path', RECORDINGS)
+@pytest.mark.parametrize('chunk_size', [1000, 65536])
+def test_streaming_matches_soup_on_recordings(path, chunk_size):
+    with open(path, encoding='utf-8') as f:
+        expected = soup_links(f.read())
+    assert list(iter_video_links_from_chunks(iter_file_chunks(path, chunk_size))) == expected
+
+
+def test_nested_and_unclosed_anchors_match_soup():
+    html = ('<a href="/video-1_1"> outer <a href="/other">in</a><b>bold</b></a>'
+            '<a href="/video-1_2">x<a href="/video-1_3">y</a>z</a><a href="/video-1_4">tail')
+    assert list(iter_video_links_from_chunks([html])) == soup_links(html)
+
+
+def test_links_are_yielded_before_input_is_exhausted():
+    consumed = []
+
+    def chunks():
+        for i in range(3):
+            consumed.append(i)
+            yield f'<a href="/video-1_{i}">Video {i}</a>'
+
+    links = iter_video_links_from_chunks(chunks())
+    assert next(links) == ('/video-1_0', 'Video 0')
+    assert consumed == [0]
+
+
+def test_extractor_streaming_parser_matches_soup(tmp_path):
+    url = 'https://vkvideo.ru/@club180058315/all'
+    results = []
+    for parser in ('soup', 'streaming'):
+        settings = Settings(cache_dir=RECORDINGS_DIR, link_cache_dir=str(tmp_path), html_parser=parser)
+        extractor = Extractor(settings=settings, logger=CaptureLogger(), browser=Browser(settings, record_replay=True))
+        results.append(extractor.extract_video_links(url))
+    assert results[0] == results[1]
+    assert len(results[0]) > 0
@@ -0,0 +1,102 @@
+import json
+import time
+
+from .factory import CLIAppTestFactory
+from .fakes.capture_logger import CaptureLogger
+from ...app.browser import Browser
+from ...app.settings import Settings
+from ...app.timing_history import TimingHistory, percentile
+
+CHANNEL = 'https://vkvideo.ru/@club1/all'
+
+
+def make_history(tmp_path, **overrides):
+    settings = Settings(timing_history_path=str(tmp_path / 'timings.json'), **overrides)
+    return TimingHistory(settings, CaptureLogger())
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 21)]
+    assert percentile(values, 95) == 19
+    assert percentile(values, 100) == 20
+    assert percentile([3.0], 95) == 3
+
+
+def test_global_timeouts_apply_until_enough_samples(tmp_path):
+    history = make_history(tmp_path, timing_min_samples=3)
+    history.record(CHANNEL, 2, 4, 100)
+    history.record(CHANNEL, 3, 6, 120)
+    timeouts = history.timeouts(CHANNEL)
+    assert not timeouts.learned
+    assert (timeouts.load_timeout_sec, timeouts.scroll_budget_sec) == (120, 20)
+
+    history.record(CHANNEL, 4, 8, 130)
+    timeouts = history.timeouts(CHANNEL)
+    assert timeouts.learned and timeouts.samples == 3
+    assert timeouts.load_timeout_sec == 4 * 1.5 + 5
+    assert timeouts.scroll_budget_sec == 8 * 1.5 + 5
+
+
+def test_history_is_bounded_and_timeouts_capped(tmp_path):
+    history = make_history(tmp_path, timing_history_size=5, timing_min_samples=1, timing_max_sec=60)
+    for i in range(8):
+        history.record(CHANNEL, 1, 100 + i, 10)
+    with open(history.path) as f:
+        samples = json.load(f)[CHANNEL]
+    assert [s['scroll_sec'] for s in samples] == [103, 104, 105, 106, 107]
+    assert history.timeouts(CHANNEL).scroll_budget_sec == 60
+
+
+class FakePage:
+    """Page whose item count grows on the first polls and then stays put; scrolling takes scroll_sec"""
+    def __init__(self, counts, scroll_sec=0.0):
+        self.counts = list(counts)
+        self.scroll_sec = scroll_sec
+        self.goto_timeout = None
+
+    def goto(self, url, timeout=None, wait_until=None):
+        self.goto_timeout = timeout
+
+    def evaluate(self, script):
+        if 'querySelectorAll' in script and 'length' in script:
+            return self.counts.pop(0) if len(self.counts) > 1 else self.counts[0]
+        if 'scrollBy' in script:
+            time.sleep(self.scroll_sec)
+        return None
+
+    def wait_for_timeout(self, ms):
+        time.sleep(ms / 1000)
+
+    def content(self):
+        return '<html></html>'
+
+
+def test_browser_uses_learned_timeouts_and_records_observations(tmp_path):
+    history = make_history(tmp_path, timing_min_samples=1, timing_margin_factor=1, timing_margin_sec=0.2)
+    history.record(CHANNEL, 1, 0.1, 3)
+    browser = Browser(history.settings, timing_history=history)
+    browser.settle_poll_ms = 50
+
+    timeouts = history.timeouts(CHANNEL)
+    page = FakePage([1, 2, 3], scroll_sec=0.3)
+    assert browser._load_page(page, CHANNEL, timeouts) == '<html></html>'
+
+    assert page.goto_timeout == 1.2 * 1000
+    samples = history.load()[CHANNEL]
+    assert len(samples) == 2
+    assert samples[-1]['items'] == 3
+    # Only the wait after scrolling is recorded, as that is what the scroll budget bounds
+    assert 0 < samples[-1]['scroll_sec'] < timeouts.scroll_budget_sec
+
+
+def test_cli_reports_timings(tmp_path, capsys):
+    history = make_history(tmp_path, timing_min_samples=1)
+    history.record(CHANNEL, 2, 4, 100)
+    app = CLIAppTestFactory.create_cli_app(settings=history.settings)
+
+    app.run(['timings'])
+
+    out = capsys.readouterr().out
+    assert CHANNEL in out
+    assert 'items 100' in out
+    assert 'scroll budget 11.0s (learned)' in out
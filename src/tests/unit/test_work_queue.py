@@ -0,0 +1,211 @@
+import multiprocessing
+import os
+import time
+
+from .fakes.capture_logger import CaptureLogger
+from ...app.downloader import Downloader, DownloadCancelled, target_path
+from ...app.extractor import Extractor, VideoDTO
+from ...app.queue_worker import QueueWorker
+from ...app.settings import Settings
+from ...app.work_queue import JOB_DOWNLOAD, JOB_EXTRACT, STATE_DONE, STATE_FAILED, STATE_LEASED, STATE_PENDING, WorkQueue
+
+PAGES = ['https://vkvideo.ru/@club1/all', 'https://vkvideo.ru/@club2/all']
+VIDEOS_PER_PAGE = 10
+
+
+class PageExtractor(Extractor):
+    """Extractor listing `videos_per_page` videos per page, with an in-memory link cache"""
+    videos_per_page = VIDEOS_PER_PAGE
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = {}
+
+    def load_cached_links(self, url):
+        return self.cache.get(url)
+
+    def extract_video_links(self, url):
+        page = url.split('@club')[1].split('/')[0]
+        return [
+            VideoDTO(f'https://vkvideo.ru/video-{page}_{i}', f'video-{page}-{i}')
+            for i in range(self.videos_per_page)
+        ]
+
+    def extract_video_links_cached(self, url):
+        if url not in self.cache:
+            self.cache[url] = self.extract_video_links(url)
+        return self.cache[url]
+
+
+class ExclusiveFileDownloader(Downloader):
+    """Downloader creating an empty file; a second download of the same video fails"""
+    def download_video(self, url, desired_filename, low_res=False, destination_folder=None, progress=None, cancelled=None):
+        with open(target_path(desired_filename, destination_folder), 'x'):
+            pass
+
+
+def make_settings(**overrides):
+    return Settings(queue_poll_sec=0.01, **overrides)
+
+
+def run_worker(queue_path, destination, worker_id):
+    settings = make_settings()
+    logger = CaptureLogger()
+    worker = QueueWorker(
+        WorkQueue(queue_path, settings, logger),
+        PageExtractor(settings=settings, logger=logger),
+        ExclusiveFileDownloader(logger=logger, settings=settings),
+        logger,
+        settings,
+        worker_id=worker_id
+    )
+    worker.enqueue_pages(PAGES, destination)
+    worker.run()
+    failed = worker.queue.counts().get(STATE_FAILED, 0)
+    os._exit(1 if failed else 0)
+
+
+def test_enqueue_is_idempotent(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.sqlite'), make_settings())
+    assert queue.enqueue(JOB_EXTRACT, 'a')
+    assert not queue.enqueue(JOB_EXTRACT, 'a')
+    assert queue.enqueue(JOB_DOWNLOAD, 'a')
+    assert queue.counts() == {'pending': 2}
+
+
+def test_claimed_job_is_not_claimed_twice(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.sqlite'), make_settings())
+    queue.enqueue(JOB_DOWNLOAD, 'a', {'title': 'A'})
+    job = queue.claim('w1')
+    assert job.key == 'a' and job.payload == {'title': 'A'} and job.attempts == 1
+    assert queue.claim('w2') is None
+    assert queue.complete(job, 'w1')
+    assert queue.counts() == {STATE_DONE: 1}
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.sqlite'), make_settings())
+    queue.enqueue(JOB_DOWNLOAD, 'a')
+    crashed = queue.claim('w1', lease_sec=0.05)
+    time.sleep(0.06)
+    reclaimed = queue.claim('w2')
+    assert reclaimed.id == crashed.id and reclaimed.attempts == 2
+    assert not queue.complete(crashed, 'w1'), "A worker that lost its lease must not complete the job"
+    assert queue.complete(reclaimed, 'w2')
+
+
+def test_lease_keeper_renews_lease(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.sqlite'), make_settings())
+    queue.enqueue(JOB_DOWNLOAD, 'a')
+    job = queue.claim('w1', lease_sec=0.09)
+    with queue.lease(job, 'w1', lease_sec=0.09) as keeper:
+        time.sleep(0.2)
+        assert queue.claim('w2') is None
+    assert not keeper.lost
+    assert queue.complete(job, 'w1')
+
+
+def test_failed_job_is_retried_until_max_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.sqlite'), make_settings(queue_max_attempts=2))
+    queue.enqueue(JOB_DOWNLOAD, 'a')
+    queue.fail(queue.claim('w1'), 'w1', 'boom')
+    queue.fail(queue.claim('w1'), 'w1', 'boom')
+    assert queue.claim('w1') is None
+    assert queue.counts() == {STATE_FAILED: 1}
+
+
+def test_job_that_keeps_losing_its_worker_fails_after_max_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.sqlite'), make_settings(queue_max_attempts=2))
+    queue.enqueue(JOB_DOWNLOAD, 'a')
+    queue.claim('w1', lease_sec=0.01)
+    time.sleep(0.02)
+    queue.claim('w2', lease_sec=0.01)
+    time.sleep(0.02)
+    assert queue.claim('w3') is None
+    assert queue.counts() == {STATE_FAILED: 1}
+
+
+def make_worker(tmp_path, downloader_class=ExclusiveFileDownloader, **overrides):
+    settings = make_settings(**overrides)
+    logger = CaptureLogger()
+    return QueueWorker(
+        WorkQueue(str(tmp_path / 'q.sqlite'), settings, logger),
+        PageExtractor(settings=settings, logger=logger),
+        downloader_class(logger=logger, settings=settings),
+        logger,
+        settings,
+        worker_id='w1'
+    )
+
+
+def test_next_run_lists_the_pages_again_and_downloads_only_new_videos(tmp_path):
+    worker = make_worker(tmp_path)
+    worker.enqueue_pages(PAGES[:1], str(tmp_path))
+    worker.run()
+
+    # A new video is uploaded; the next run (e.g. from cron) uses the same queue and link cache
+    worker.extractor.videos_per_page += 1
+    worker.enqueue_pages(PAGES[:1], str(tmp_path))
+    worker.run()
+
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.mp4')]) == VIDEOS_PER_PAGE + 1
+    assert worker.queue.counts() == {STATE_DONE: VIDEOS_PER_PAGE + 2}, "No video is downloaded twice"
+
+
+def test_download_is_cancelled_when_the_lease_is_lost(tmp_path):
+    class StolenDownloader(Downloader):
+        """Has its job taken over by another worker, then waits to be cancelled"""
+        def download_video(self, url, desired_filename, low_res=False, destination_folder=None, progress=None, cancelled=None):
+            queue.renew(job, 'w1')
+            queue._connection().execute('UPDATE jobs SET owner = ?', ('w2',))
+            assert cancelled.wait(0.5)
+            raise DownloadCancelled(f'Download of {desired_filename} was cancelled')
+
+    worker = make_worker(tmp_path, StolenDownloader, queue_lease_sec=0.06)
+    queue = worker.queue
+    queue.enqueue(JOB_DOWNLOAD, 'https://vkvideo.ru/video-1_1', {'title': 'A', 'destination': str(tmp_path)})
+    job = queue.claim('w1')
+    worker.process(job)
+
+    assert queue.counts() == {STATE_LEASED: 1}, "The reclaiming worker keeps the job"
+    assert any('reclaimed' in message for message in worker.logger.captured_logs['warning'])
+
+
+def test_queue_downloads_stay_within_the_run_budget(tmp_path):
+    worker = make_worker(tmp_path, max_run_videos=2)
+    for i in range(4):
+        worker.queue.enqueue(JOB_DOWNLOAD, f'https://vkvideo.ru/video-1_{i}', {'title': f'v{i}', 'destination': str(tmp_path)})
+    worker.downloader.budget.start()
+    worker.run()
+
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.mp4')) == ['v0.mp4', 'v1.mp4']
+    assert worker.queue.counts() == {STATE_DONE: 2, STATE_PENDING: 2}
+
+
+def test_job_deferred_by_the_budget_goes_back_to_the_queue(tmp_path):
+    worker = make_worker(tmp_path)
+    worker.queue.enqueue(JOB_DOWNLOAD, 'https://vkvideo.ru/video-1_1', {'title': 'A', 'destination': str(tmp_path)})
+    worker.downloader.budget.request_stop('stop requested by SIGTERM')
+    worker.process(worker.queue.claim('w1'))
+
+    assert worker.queue.counts() == {STATE_PENDING: 1}
+    assert worker.queue.claim('w2').attempts == 1, "A deferred job keeps its attempts"
+
+
+def test_several_processes_process_disjoint_work(tmp_path):
+    queue_path = str(tmp_path / 'q.sqlite')
+    destination = tmp_path / 'videos'
+    destination.mkdir()
+    context = multiprocessing.get_context('fork')
+    workers = [
+        context.Process(target=run_worker, args=(queue_path, str(destination), f'worker-{i}'))
+        for i in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert [worker.exitcode for worker in workers] == [0] * 4, "No job should fail, i.e. no video downloaded twice"
+    assert len(os.listdir(destination)) == len(PAGES) * VIDEOS_PER_PAGE
+    assert WorkQueue(queue_path, make_settings()).counts() == {STATE_DONE: len(PAGES) * (VIDEOS_PER_PAGE + 1)}